@@ -0,0 +1,303 @@
+# AdminModes.py - Card reader and certification modes for PortalBox ESP32
+import time
+
+from Background import run_in_background
+
+class AdminModes:
+    """
+    The admin workflows as resumable coroutines
+
+    Each mode is a generator that is resumed once per main loop iteration by
+    step(). Wherever the old code slept or polled in a loop, the generator
+    yields instead: a number is the time in ms before it wants to run again,
+    None asks to run on the next iteration. Keys arrive as the "*"/"#" press
+    passed to step(), so a press is seen as soon as the main loop picks it up,
+    and the timers, display, LEDs and the rest of the main loop keep running
+    while an admin works through a mode.
+    """
+
+    # How long an admin has to take their card off before the mode moves on
+    REMOVE_CARD_TIMEOUT_MS = 10000
+
+    # Trainee cards in one batch enrollment
+    MAX_BATCH = 32
+
+    # LCD text for the enrollment results other than "success"
+    RESULT_TEXT = {
+        "already_authorized": "Already Auth",
+        "not_user_card": "Not User Card",
+        "failed": "Failed",
+    }
+
+    def __init__(self, service):
+        """
+        Initialize the admin modes
+
+        Args:
+            service: The PortalBoxApplication, for the box, display, database and PIN entry
+        """
+        self.service = service
+        self.box = service.box
+        self.display = service.display
+
+        # The running mode's generator and the time it resumes at
+        self.flow = None
+        self.flow_name = ""
+        self.resume_at = 0
+
+        # Key passed to the current step(), taken by the generators
+        self.key = None
+
+    @property
+    def active(self):
+        """True while a mode is running"""
+        return self.flow is not None
+
+    def start_card_reader(self, old_card_id):
+        """Start the card reader mode, showing the id of each card presented"""
+        self._start("card reader", self._card_reader(old_card_id))
+
+    def start_certification(self):
+        """Start the certification mode, enrolling a batch of trainee cards with one admin card"""
+        self._start("certification", self._certification())
+
+    def _start(self, name, flow):
+        """Replace the running mode with a new one"""
+        self.stop()
+        print(f"Starting {name} mode")
+        self.flow = flow
+        self.flow_name = name
+        self.resume_at = time.ticks_ms()
+
+    def stop(self):
+        """End the running mode where it is"""
+        if self.flow is not None:
+            self.flow.close()
+            self.flow = None
+
+    def step(self, key=None):
+        """
+        Resume the running mode if it is due
+
+        Args:
+            key: "*" or "#" if one was pressed since the last step, else None
+
+        Returns:
+            True while the mode is still running
+        """
+        if self.flow is None:
+            return False
+        if key is not None:
+            self.key = key
+
+        if time.ticks_diff(time.ticks_ms(), self.resume_at) < 0:
+            return True
+        try:
+            wait_ms = next(self.flow)
+        except StopIteration:
+            self.flow = None
+            return False
+        except Exception as e:
+            print(f"Error in {self.flow_name} mode: {e}")
+            self.display.display_two_line_message("Error", "Exiting Mode", "unauth_color")
+            self.flow = None
+            return False
+        self.resume_at = time.ticks_add(time.ticks_ms(), wait_ms or 0)
+        return True
+
+    def _take_key(self, key):
+        """Check for a press of key, consuming it"""
+        if self.key == key:
+            self.key = None
+            return True
+        self.key = None
+        return False
+
+    def _exit(self, mode_name):
+        """Leave a mode: show the exit message, then the idle screen"""
+        print(f"Exiting {mode_name}")
+        self.display.display_two_line_message("Exiting", mode_name, "sleep_color")
+        yield 1000
+        self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
+
+    def _wait_for_key(self, key):
+        """Wait until key is pressed"""
+        while not self._take_key(key):
+            yield 100
+
+    def _in_background(self, func, *args):
+        """
+        Run a blocking call on a second thread, the generator's value is its
+        result; without _thread it runs inline
+
+        The call's exceptions are passed on.
+        """
+        outcome = []
+
+        def task():
+            try:
+                outcome.append((True, func(*args)))
+            except Exception as e:
+                outcome.append((False, e))
+
+        run_in_background(f"{self.flow_name} request", task)
+        while not outcome:
+            yield 100
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+    def _verify_pin(self, card_id, is_authorized):
+        """Run the PIN entry for a card, the generator's value is the result"""
+        if not self.service.pin_required(is_authorized):
+            return False
+        pin_entry = self.service.pin_entry
+        pin_entry.start(card_id)
+        try:
+            while True:
+                result = pin_entry.step()
+                if result is not None:
+                    return result
+                yield None
+        finally:
+            # The mode was stopped while the PIN was being typed
+            if pin_entry.active:
+                pin_entry.cancel()
+
+    def _card_reader(self, old_card_id):
+        """Card reader mode, until * is pressed"""
+        self.key = None
+        while True:
+            # Check for exit command (* key)
+            if self._take_key('*'):
+                yield from self._exit("Card Reader Mode")
+                return
+
+            card_id = self.box.read_RFID_card()
+
+            # Handle animation and display
+            if card_id == -1 and old_card_id == -1:
+                # No card detected, show animation
+                self.display.animate_scanning("Card ID Reader")
+            elif card_id != old_card_id and card_id != -1:
+                # New card detected, display ID
+                self.display.display_two_line_message("Card ID:", f"{card_id}", "admin_mode")
+
+            old_card_id = card_id
+            yield 100
+
+    def _certification(self):
+        """
+        Certification mode: one admin card with its PIN, then any number of
+        trainee cards queued locally and authorized together when # is pressed
+        """
+        service = self.service
+        self.key = None
+
+        # Step 1: Waiting for an admin or trainer card
+        self.display.display_two_line_message("Admin Mode", "Scan Admin Card", "admin_mode")
+        while True:
+            if self._take_key('#'):
+                yield from self._exit("Admin Mode")
+                return
+
+            # Show scanning animation
+            self.display.animate_scanning("Scan Admin Card")
+            card_id = self.box.read_RFID_card()
+            if card_id != -1:
+                try:
+                    details = service.db.get_card_details(card_id, service.equipment_type_id)
+                    service.pins.remember(card_id, details)
+                except Exception as e:
+                    print(f"Error processing admin card: {e}")
+                    self.display.display_two_line_message("Card Error", "Try Again", "unauth_color")
+                    self.box.beep_once('error')
+                    yield 1000
+                    continue
+
+                verified = yield from self._verify_pin(card_id, details["user_is_authorized"])
+                if details["user_authority_level"] >= 3 and verified:  # Admin or trainer level
+                    admin_card_id = card_id
+                    self.display.display_two_line_message("Admin Verified", "Remove Card", "auth_color")
+                    self.box.beep_once('success')
+                    yield 1000
+
+                    # Wait for the admin to remove their card
+                    self.display.display_two_line_message("Admin Mode", "Remove Card", "process_color")
+                    deadline = time.ticks_add(time.ticks_ms(), self.REMOVE_CARD_TIMEOUT_MS)
+                    while (self.box.read_RFID_card() != -1
+                           and time.ticks_diff(deadline, time.ticks_ms()) > 0):
+                        yield 200
+                    break
+
+                # Not an admin card
+                self.display.display_two_line_message("Not Admin Card", "Need Admin Card", "unauth_color")
+                self.box.beep_once('error')
+                yield 1000
+                self.display.display_two_line_message("Admin Mode", "Scan Admin Card", "admin_mode")
+            yield 100
+
+        # Step 2: Queue trainee cards back to back, on the enrollment reader if
+        # the box has one; nothing goes to the backend until # is pressed
+        queue = []
+        last_card = -1
+        self._show_batch(queue)
+        while not self._take_key('#'):
+            card_id = self.box.read_RFID_card(self.box.enroll_reader)
+            if card_id != last_card:
+                # One entry per time a card is presented
+                if card_id == -1:
+                    self._show_batch(queue)
+                elif card_id == admin_card_id:
+                    self.display.display_two_line_message("Admin Card", "Scan Trainee", "unauth_color")
+                    self.box.beep_once('warning')
+                elif card_id in queue:
+                    self.display.display_two_line_message("Already Queued", f"Card {card_id}", "process_color")
+                    self.box.beep_once('warning')
+                elif len(queue) >= self.MAX_BATCH:
+                    self.display.display_two_line_message("Batch Full", "Press # to Save", "unauth_color")
+                    self.box.beep_once('error')
+                else:
+                    queue.append(card_id)
+                    self.display.display_two_line_message(f"Queued: {len(queue)}", f"Card {card_id}", "auth_color")
+                    self.box.beep_once('success')
+                last_card = card_id
+            yield 100
+
+        if not queue:
+            yield from self._exit("Admin Mode")
+            return
+
+        # Step 3: Commit the batch on a second thread, the main loop keeps running
+        self.display.display_two_line_message("Enrolling", f"{len(queue)} cards...", "process_color")
+        results = yield from self._in_background(service.update_user_authorizations, queue)
+
+        enrolled = 0
+        failed = 0
+        for card_id in queue:
+            if results[card_id] == "success":
+                enrolled += 1
+            elif results[card_id] != "already_authorized":
+                failed += 1
+        print(f"Batch enrollment results: {results}")
+        self.display.display_two_line_message(f"Enrolled: {enrolled}/{len(queue)}", f"Failed: {failed}",
+                                              "auth_color" if failed == 0 else "unauth_color")
+        self.box.beep_once('success' if failed == 0 else 'warning')
+        yield 2000
+
+        # Every card that was not newly enrolled, with the reason
+        for card_id in queue:
+            result = results[card_id]
+            if result != "success":
+                self.display.display_two_line_message(f"Card {card_id}", self.RESULT_TEXT.get(result, "Failed"),
+                                                      "process_color" if result == "already_authorized" else "unauth_color")
+                yield 1500
+
+        self.display.display_message("Press # to Exit", "process_color")
+        yield from self._wait_for_key('#')
+        yield from self._exit("Admin Mode")
+
+    def _show_batch(self, queue):
+        """Prompt for the next trainee card"""
+        self.display.display_two_line_message("Scan Trainee", f"Queued:{len(queue)} #=Save", "process_color")
@@ -0,0 +1,31 @@
+# Background.py for MicroPython on ESP32
+# Runs blocking calls (HTTP requests) on a second thread, or inline without _thread
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+# Stack for the background thread, the HTTP requests need more than the default
+TASK_STACK_SIZE = 16 * 1024
+
+def run_in_background(name, func, *args):
+    """
+    Start func(*args) on a second thread, running it inline if there is none
+
+    Args:
+        name: What runs, for the message when it has to run inline
+        func: Function to run, it must catch its own exceptions
+
+    Returns:
+        True if it runs on a thread, False if it already ran inline
+    """
+    if _thread is not None:
+        try:
+            _thread.stack_size(TASK_STACK_SIZE)
+            _thread.start_new_thread(func, args)
+            return True
+        except Exception as e:
+            print(f"{name} runs inline, no thread: {e}")
+    func(*args)
+    return False
@@ -0,0 +1,284 @@
+# BootSequence.py for MicroPython on ESP32
+# Runs and times the boot phases, overlapping the ones that wait on the network,
+# and keeps the timelines of the last boots in flash
+
+import json
+import os
+import time
+
+from Background import run_in_background
+
+# Flash file holding the timelines of the last boots, oldest first
+BOOT_LOG_FILE = "boot_log.json"
+
+# Reset causes by machine constant name
+RESET_CAUSES = ("PWRON_RESET", "HARD_RESET", "WDT_RESET", "DEEPSLEEP_RESET", "SOFT_RESET")
+
+def reset_cause_name():
+    """Get the name of the machine.reset_cause() of this boot"""
+    try:
+        import machine
+        cause = machine.reset_cause()
+        for name in RESET_CAUSES:
+            if getattr(machine, name, None) == cause:
+                return name
+        return str(cause)
+    except Exception:
+        return "unknown"
+
+def load_boot_log(path=BOOT_LOG_FILE):
+    """
+    Read the stored boot timelines
+
+    Returns:
+        List of timelines, oldest first, empty if there are none
+    """
+    try:
+        with open(path, 'r') as f:
+            timelines = json.load(f)
+        if isinstance(timelines, list):
+            return timelines
+    except (OSError, ValueError):
+        pass
+    return []
+
+def print_boot_log(path=BOOT_LOG_FILE):
+    """Print the stored boot timelines, for reading them over the serial REPL"""
+    timelines = load_boot_log(path)
+    if not timelines:
+        print("No boot timelines stored")
+    for number, timeline in enumerate(timelines):
+        print(f"==== Boot {number + 1} of {len(timelines)}, reset cause {timeline['reset']}"
+              f"{'' if timeline.get('reported') else ', not reported'} ====")
+        print_timeline(timeline["phases"], timeline["ready"])
+
+def print_timeline(phases, ready_ms):
+    """Print phase records [name, start ms, duration ms, ok] and the ready time"""
+    for name, start, duration, ok in phases:
+        state = "" if ok else "  FAILED"
+        if duration < 0:
+            state = "  running"
+        print(f"{name:>16}: {start:6d} +{max(duration, 0):6d}{state}")
+    print(f"{'ready':>16}: {ready_ms if ready_ms >= 0 else 'never'}")
+
+_boot_sequence = None
+
+def get_boot_sequence():
+    """
+    Get the timeline of this boot, created on first use
+
+    boot.py, the Service and PortalBox all add to the same one.
+    """
+    global _boot_sequence
+    if _boot_sequence is None:
+        _boot_sequence = BootSequence()
+    return _boot_sequence
+
+class BootSequence:
+    """
+    Boot orchestrator and phase timer
+
+    Blocking phases go through run(), which times them. Calls whose result
+    the boot does not wait for (recording the IP, logging the start) go
+    through start_task() and run on a second thread while the box already
+    serves cards; without _thread they run inline, as before.
+
+    All times are ticks_ms since reset, so the report also shows the time
+    spent in the ROM, boot.py and the imports before the first phase. (After
+    a soft reset the ticks keep counting from the last hard reset.)
+
+    The timeline of each boot, with its reset cause, goes into a ring of the
+    last max_boots timelines in flash. It is written when the box is ready,
+    when a phase fails and at persisted checkpoints, so a boot that hangs or
+    loses power still leaves its timeline behind. Once the boot is done the
+    timelines not yet sent go to the backend in one request.
+    """
+
+    def __init__(self, path=BOOT_LOG_FILE, max_boots=8):
+        """
+        Start timing the boot
+
+        Args:
+            path: Flash file of the timeline ring
+            max_boots: Timelines kept in the ring
+        """
+        self.path = path
+        self.max_boots = max_boots
+        self.reset_cause = reset_cause_name()
+
+        # Phase records: [name, start ms, duration ms or -1 while running, ok]
+        self.phases = []
+        self.ready_ms = -1
+        self.finished = False
+
+        # The stored timelines, loaded on the first save; this boot's is the last once saved
+        self.ring = None
+        self.saved = False
+
+    def now(self):
+        """Milliseconds since reset"""
+        return time.ticks_ms()
+
+    def _begin(self, name):
+        """Add a running phase record"""
+        record = [name, self.now(), -1, False]
+        self.phases.append(record)
+        return record
+
+    def _end(self, record, ok):
+        """Close a phase record, the duration last as it marks the record finished"""
+        record[3] = ok
+        record[2] = time.ticks_diff(self.now(), record[1])
+
+    def mark(self, name, persist=False):
+        """
+        Record a checkpoint, a phase without duration
+
+        Args:
+            name: Checkpoint name for the report
+            persist: Write the timeline to flash right away, for checkpoints
+                a hanging boot should leave behind
+        """
+        self.phases.append([name, self.now(), 0, True])
+        if persist:
+            self.save()
+
+    def run(self, name, func, *args):
+        """
+        Run a boot phase now, timing it
+
+        Args:
+            name: Phase name for the report
+            func: Function doing the phase, its exceptions are passed on
+
+        Returns:
+            Whatever func returns
+        """
+        record = self._begin(name)
+        try:
+            result = func(*args)
+        except Exception:
+            self._end(record, False)
+            self.save()
+            raise
+        self._end(record, True)
+        return result
+
+    def start_task(self, name, func, *args):
+        """
+        Run a boot phase in the background, timing it
+
+        Failures are printed and recorded, never raised.
+
+        Args:
+            name: Phase name for the report
+            func: Function doing the phase
+        """
+        record = self._begin(name)
+        run_in_background(f"Boot task {name}", self._run_task, record, func, args)
+
+    def _run_task(self, record, func, args):
+        """Body of a background phase"""
+        ok = False
+        try:
+            func(*args)
+            ok = True
+        except Exception as e:
+            print(f"Boot task {record[0]} failed: {e}")
+        self._end(record, ok)
+
+    def mark_ready(self):
+        """Record the moment the box is ready to serve cards"""
+        self.ready_ms = self.now()
+        print(f"Boot: ready after {self.ready_ms} ms, reset cause {self.reset_cause}")
+        self.save()
+
+    def done(self):
+        """True once the box is ready and every background phase has finished"""
+        if self.ready_ms < 0:
+            return False
+        # Each record is only written by the thread running its phase
+        for record in self.phases:
+            if record[2] < 0:
+                return False
+        return True
+
+    def service(self, report_func=None):
+        """
+        Finish the boot once it is done: print the report, store the final
+        timeline and send the unreported timelines. Call it from the main loop.
+
+        Args:
+            report_func: Function taking a list of timelines and returning
+                True if the backend took them, None to only store them
+        """
+        if self.finished or not self.done():
+            return
+        self.finished = True
+        self.report()
+        self.save()
+        if report_func is None:
+            return
+        run_in_background("Boot report", self._send, report_func)
+
+    def timeline(self):
+        """This boot's timeline as stored in the ring"""
+        return {
+            "reset": self.reset_cause,
+            "ready": self.ready_ms,
+            "phases": [list(record) for record in self.phases],
+            "reported": False,
+        }
+
+    def save(self):
+        """Store this boot's timeline in the flash ring, replacing its earlier version"""
+        try:
+            if self.ring is None:
+                self.ring = load_boot_log(self.path)
+            if self.saved:
+                self.ring[-1] = self.timeline()
+            else:
+                self.ring.append(self.timeline())
+                self.saved = True
+            while len(self.ring) > self.max_boots:
+                self.ring.pop(0)
+            self._write_ring()
+        except Exception as e:
+            print(f"Error saving boot timeline: {e}")
+
+    def _write_ring(self):
+        """Write the ring to flash, replacing the old file in one step"""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.ring, f)
+        os.rename(temp_path, self.path)
+
+    def _send(self, report_func):
+        """Send the unreported timelines in one call, marking them reported if it worked"""
+        pending = []
+        for timeline in self.ring:
+            if not timeline.get("reported"):
+                pending.append(timeline)
+        if not pending:
+            return
+        try:
+            ok = report_func([{"reset": t["reset"], "ready": t["ready"], "phases": t["phases"]}
+                              for t in pending])
+        except Exception as e:
+            print(f"Error reporting boot timelines: {e}")
+            ok = False
+        if not ok:
+            print("Boot timelines not reported, trying again next boot")
+            return
+        for timeline in pending:
+            timeline["reported"] = True
+        try:
+            self._write_ring()
+        except OSError as e:
+            print(f"Error saving boot timeline: {e}")
+
+    def report(self):
+        """Print the phase timings"""
+        print(f"---- Boot phases (ms since reset, {self.reset_cause}) ----")
+        print_timeline(self.phases, self.ready_ms)
+        print("--------------------------------------")
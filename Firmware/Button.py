@@ -2,6 +2,8 @@
 from machine import Pin
 import time
 
+from Debouncer import Debouncer, EVENT_RELEASE
+
 class KeypadButton:
     """Handles keypad button "1" input with debouncing and edge detection"""
     
@@ -17,9 +19,14 @@ class KeypadButton:
         self.row = Pin(row_pin, Pin.OUT, value=0)  # Row pin as output, initially LOW
         self.col = Pin(col_pin, Pin.IN, Pin.PULL_DOWN)  # Column pin as input with pull-down
         
-        self.last_state = False
-        self.last_check = time.ticks_ms()
-        self.debounce_ms = 50  # Debounce time in milliseconds
+        # Shared debounce engine, the key is sampled on every was_pressed() call
+        self.debouncer = Debouncer(1, self._on_event)
+        self.pressed_latch = False
+    
+    def _on_event(self, code):
+        """Debouncer sink, latches presses"""
+        if not code & EVENT_RELEASE:
+            self.pressed_latch = True
     
     def is_pressed(self):
         """
@@ -43,24 +50,12 @@ class KeypadButton:
     def was_pressed(self):
         """
         Check if "1" key has been pressed since the last call
-        Implements debouncing and rising edge detection
+        Samples the key and reports each debounced press once
         
         Returns:
             True if "1" key was pressed, False otherwise
         """
-        current_state = self.is_pressed()
-        current_time = time.ticks_ms()
-        
-        # Only check if enough time has passed (debounce)
-        if time.ticks_diff(current_time, self.last_check) > self.debounce_ms:
-            # Detect rising edge (button press)
-            if current_state and not self.last_state:
-                self.last_state = current_state
-                self.last_check = current_time
-                return True
-            
-            # Update state for next check
-            self.last_state = current_state
-            self.last_check = current_time
-        
-        return False
\ No newline at end of file
+        self.debouncer.update(1 if self.is_pressed() else 0)
+        pressed = self.pressed_latch
+        self.pressed_latch = False
+        return pressed
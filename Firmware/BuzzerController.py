@@ -2,12 +2,33 @@
 # Controls the buzzer peripheral
 
 from machine import Pin, PWM # type: ignore
+from array import array
 import time
 
+# RTTTL note frequencies in Hz for octave 4, index by semitone from C
+NOTE_FREQS_OCTAVE_4 = (262, 277, 294, 311, 330, 349, 370, 392, 415, 440, 466, 494)
+NOTE_SEMITONES = {"c": 0, "d": 2, "e": 4, "f": 5, "g": 7, "a": 9, "b": 11}
+
 class BuzzerController:
     """
     BuzzerController for managing buzzer sounds on the ESP32
+    
+    Besides the repeating beep pattern there is a tone sequencer: a list of
+    (frequency, duration) events in preallocated arrays that update() steps
+    through by deadline, so playing a sound never blocks. A frequency of 0
+    is a rest.
     """
+    
+    # Size of the sequencer's event arrays, longer songs are cut off
+    MAX_EVENTS = 64
+    
+    # Built-in sounds as (frequency Hz, duration ms) events
+    PATTERNS = {
+        'success': ((1000, 100), (1500, 100)),
+        'error':   ((500, 250), (0, 50), (400, 250)),
+        'warning': ((750, 150), (0, 50), (750, 150)),
+        'alert':   ((900, 100), (0, 50), (900, 100), (0, 50), (900, 100)),
+    }
     def __init__(self, pin=6, settings=None, enabled=True):
         """
         Initialize the buzzer controller
@@ -63,38 +84,110 @@ class BuzzerController:
         self.beep_interval = 0
         self.last_toggle_time = 0
         self.beep_state = False  # False = off, True = on
+        self._busy = False       # Set while the main loop changes the pattern
+        
+        # Tone sequencer
+        self.seq_freq = array('H', [0] * self.MAX_EVENTS)
+        self.seq_dur = array('H', [0] * self.MAX_EVENTS)
+        self.seq_len = 0
+        self.seq_index = 0
+        self.seq_next = 0
+        
+        # Built-in sounds compiled to event arrays once
+        self.compiled_patterns = {}
+        for name, events in self.PATTERNS.items():
+            self.compiled_patterns[name] = (
+                array('H', [e[0] for e in events]),
+                array('H', [e[1] for e in events]),
+            )
         
     def update(self):
         """
-        Updates the beeper state, should be called in the main loop
+        Updates the beeper state, called from the effects timer or the main loop
+        
+        The on/off state is derived from the time since the pattern started,
+        so beeps keep their timing however late this is called. Safe to call
+        from a timer callback: it allocates nothing and skips a pattern that
+        is being changed.
         """
-        if not self.enabled or self.current_beep is None:
+        if not self.enabled or self._busy:
             return
-            
-        current_time = time.ticks_ms()
+        if self.seq_len:
+            self._update_sequence()
+            return
+        if self.current_beep is None:
+            return
+        self._busy = True
+        
+        elapsed = time.ticks_diff(time.ticks_ms(), self.beep_start_time)
         
         # Check if the entire beep sequence is done
-        if time.ticks_diff(current_time, self.beep_start_time) >= self.beep_duration:
+        if elapsed >= self.beep_duration:
             self.stop_buzzer()
+            self.beep_state = False
             self.current_beep = None
+        else:
+            # Even half cycles are on, odd ones are off
+            on = (elapsed // self.beep_interval) % 2 == 0
+            if on != self.beep_state:
+                self.beep_state = on
+                if on:
+                    self.start_buzzer(self.current_beep)
+                else:
+                    self.stop_buzzer()
+        self._busy = False
+    
+    def _update_sequence(self):
+        """Start the next sequencer event once the current one has run its time"""
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.seq_next) < 0:
             return
-            
-        # Check if we need to toggle the beep state
-        if time.ticks_diff(current_time, self.last_toggle_time) >= self.beep_interval:
-            self.last_toggle_time = current_time
-            
-            if self.beep_state:
-                # Turn off
-                self.stop_buzzer()
-                self.beep_state = False
+        self._busy = True
+        index = self.seq_index
+        if index >= self.seq_len:
+            # Done, a beep pattern underneath picks up again on the next update
+            self.seq_len = 0
+            self.stop_buzzer()
+            self.beep_state = False
+        else:
+            freq = self.seq_freq[index]
+            if freq:
+                self.start_buzzer(freq)
             else:
-                # Turn on
-                self.start_buzzer(self.current_beep)
-                self.beep_state = True
+                self.stop_buzzer()
+            # Chain deadlines so a late update does not stretch the sequence
+            self.seq_next = time.ticks_add(self.seq_next, self.seq_dur[index])
+            if time.ticks_diff(now, self.seq_next) > 0:
+                self.seq_next = now
+            self.seq_index = index + 1
+        self._busy = False
+    
+    def _start_sequence(self, count):
+        """Start playing the first count events of the sequencer arrays"""
+        self.seq_index = 0
+        self.seq_next = time.ticks_ms()
+        self.seq_len = count
+        self._busy = False
+        self.update()
+    
+    def play_pattern(self, name):
+        """
+        Play a built-in sound without blocking
+        
+        :param name: Name from PATTERNS, unknown names play 'success'
+        """
+        if not self.enabled:
+            return
+        freqs, durs = self.compiled_patterns.get(name, self.compiled_patterns['success'])
+        self._busy = True
+        n = len(freqs)
+        self.seq_freq[:n] = freqs
+        self.seq_dur[:n] = durs
+        self._start_sequence(n)
     
     def buzz_tone(self, freq=1000, length=0.2):
         """
-        Play a single tone
+        Play a single tone without blocking
         
         :param freq: Frequency in Hz
         :param length: Duration in seconds
@@ -102,9 +195,14 @@ class BuzzerController:
         if not self.enabled:
             return
             
-        self.start_buzzer(freq)
-        time.sleep(length)
-        self.stop_buzzer()
+        self._busy = True
+        self.seq_freq[0] = int(freq)
+        self.seq_dur[0] = int(length * 1000)
+        self._start_sequence(1)
+    
+    def is_playing(self):
+        """Check whether the sequencer is playing"""
+        return self.seq_len > 0
     
     def beep(self, freq=1000, duration=2.0, beeps=10):
         """
@@ -117,18 +215,20 @@ class BuzzerController:
         if not self.enabled:
             return
             
+        self._busy = True
         self.current_beep = freq
         self.beep_start_time = time.ticks_ms()
         self.beep_duration = int(duration * 1000)  # Convert to ms
         self.beep_count = beeps
         
         # Calculate interval between toggles (half cycle)
-        self.beep_interval = int(self.beep_duration / (2 * beeps))
+        self.beep_interval = max(1, int(self.beep_duration / (2 * beeps)))
         self.last_toggle_time = self.beep_start_time
         self.beep_state = True
         
         # Start the first beep
         self.start_buzzer(freq)
+        self._busy = False
     
     def stop(self, stop_beeping=True):
         """
@@ -136,18 +236,146 @@ class BuzzerController:
         
         :param stop_beeping: Whether to stop an ongoing beep pattern
         """
+        self._busy = True
         if stop_beeping:
             self.current_beep = None
+            self.seq_len = 0
             
         self.stop_buzzer()
+        self.beep_state = False
+        self._busy = False
     
     def play_song(self, file_name):
         """
-        Play a song from a file (not implemented in this version)
+        Play an RTTTL song from a file without blocking
+        
+        The file is read in small chunks and parsed straight into the
+        sequencer arrays, so the song is never held in memory as text.
+        
+        :param file_name: File containing an RTTTL song, "name:d=4,o=5,b=120:8c6,8e6,..."
+        """
+        if not self.enabled:
+            return
+        try:
+            with open(file_name, 'r') as f:
+                count = self.load_rtttl(f)
+        except OSError as e:
+            print(f"Song file error: {e}")
+            return
+        except ValueError as e:
+            print(f"Song parse error in {file_name}: {e}")
+            return
+        print(f"Playing {file_name}, {count} notes")
+        self._start_sequence(count)
+    
+    def load_rtttl(self, stream):
+        """
+        Parse an RTTTL song into the sequencer arrays
+        
+        :param stream: Object with read(n) returning str, e.g. an open file
+        :return: Number of events loaded, notes beyond MAX_EVENTS are dropped
+        """
+        # Stop the sequencer before its arrays are overwritten
+        self.seq_len = 0
+        self.stop_buzzer()
         
-        :param file_name: File containing notes and durations
+        default_duration = 4
+        default_octave = 6
+        bpm = 63
+        count = 0
+        section = 0
+        for token, separator in self._rtttl_tokens(stream):
+            if section == 1 and token:
+                # Defaults section: d=4,o=5,b=120
+                key, _, value = token.partition('=')
+                key = key.strip().lower()
+                if key == 'd':
+                    default_duration = int(value)
+                elif key == 'o':
+                    default_octave = int(value)
+                elif key == 'b':
+                    bpm = int(value)
+            elif section == 2 and token and count < self.MAX_EVENTS:
+                freq, ms = self._parse_note(token, default_duration, default_octave, bpm)
+                self.seq_freq[count] = freq
+                self.seq_dur[count] = ms
+                count += 1
+            if separator == ':':
+                section += 1
+        
+        if section < 2:
+            raise ValueError("missing ':' sections")
+        return count
+    
+    @staticmethod
+    def _rtttl_tokens(stream, chunk_size=32):
+        """Yield (token, separator) pairs from the stream, split on ',' and ':'"""
+        token = ''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            for ch in chunk:
+                if ch == ',' or ch == ':':
+                    yield token.strip(), ch
+                    token = ''
+                else:
+                    token += ch
+        if token.strip():
+            yield token.strip(), ''
+    
+    @staticmethod
+    def _parse_note(token, default_duration, default_octave, bpm):
         """
-        print(f"Song playback not implemented: {file_name}")
+        Parse one RTTTL note such as "8c#6." or "4p"
+        
+        :return: (frequency Hz, duration ms), frequency 0 for a pause
+        """
+        token = token.lower()
+        i = 0
+        n = len(token)
+        while i < n and token[i].isdigit():
+            i += 1
+        duration = int(token[:i]) if i else default_duration
+        if i >= n:
+            raise ValueError(f"bad note '{token}'")
+        
+        letter = token[i]
+        i += 1
+        semitone = -1
+        if letter in NOTE_SEMITONES:
+            semitone = NOTE_SEMITONES[letter]
+        elif letter != 'p':
+            raise ValueError(f"bad note '{token}'")
+        if i < n and token[i] == '#':
+            semitone += 1
+            i += 1
+        
+        dotted = False
+        if i < n and token[i] == '.':
+            dotted = True
+            i += 1
+        octave = default_octave
+        if i < n and token[i].isdigit():
+            octave = int(token[i])
+            i += 1
+        if i < n and token[i] == '.':
+            dotted = True
+        
+        # A whole note lasts four beats
+        ms = 240000 // (bpm * duration)
+        if dotted:
+            ms += ms // 2
+        
+        if semitone < 0:
+            return 0, ms
+        octave += semitone // 12
+        freq = NOTE_FREQS_OCTAVE_4[semitone % 12]
+        if octave >= 4:
+            freq <<= octave - 4
+        else:
+            freq >>= 4 - octave
+        return freq, ms
     
     def start_buzzer(self, freq=1000):
         """
@@ -4,6 +4,11 @@ import time
 import socket
 import gc
 
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
 # Enum for card types
 class CardType:
     INVALID_CARD = -1
@@ -34,6 +39,10 @@ class Database:
         self.api_path = f"/api/{settings['api']}"
         self.api_token = settings['bearer_token']
         print(self.api_token)
+
+        # One request at a time: the boot tasks, the boot report and batch
+        # enrollment send theirs from a second thread
+        self._lock = _thread.allocate_lock() if _thread is not None else None
         
         # State variables needed for authorization logic
         self.requires_training = True
@@ -50,6 +59,33 @@ class Database:
         Returns:
             dict, str, or None: Parsed JSON response, text response, or None if request failed
         """
+        return self._api_request(method, params)[1]
+
+    def _api_request(self, method, params=None):
+        """
+        Makes an HTTP request to the API, keeping the HTTP status.
+
+        Args:
+            method (str): HTTP method (GET, POST, PUT)
+            params (dict): Dictionary of query parameters
+
+        Returns:
+            tuple: (HTTP status code, 0 if no response arrived; the result
+            of _make_api_request)
+        """
+        if self._lock is None:
+            return self._send_api_request(method, params)
+        self._lock.acquire()
+        try:
+            return self._send_api_request(method, params)
+        finally:
+            self._lock.release()
+
+    def _send_api_request(self, method, params):
+        """
+        Body of _api_request, called with the request lock held
+        """
+        status_code = 0
         try:
             # Construct the query string
             query_string = ""
@@ -123,38 +159,38 @@ class Database:
             # Free memory - important for microcontrollers
             gc.collect()
 
-            # Check if body is empty
-            if not body.strip():
-                print("Warning: Empty response body")
-                return None
-
             # Check HTTP status code
             status_line = headers.split('\r\n')[0]
             status_code = int(status_line.split(' ')[1]) if len(status_line.split(' ')) > 1 else 0
+
+            # Check if body is empty
+            if not body.strip():
+                print("Warning: Empty response body")
+                return status_code, None
             
             if status_code >= 400:
                 print(f"HTTP Error: {status_code}")
-                return None
+                return status_code, None
 
             # Try to parse as JSON first
             try:
                 json_body = json.loads(body)
-                return json_body
+                return status_code, json_body
             except ValueError:
                 # If not JSON, check if it's a successful text response
                 if "success" in body.lower() or "completed" in body.lower():
                     print("Received success message:", body.strip())
-                    return True
+                    return status_code, True
                 elif body.strip().isdigit():
                     # Handle numeric responses
-                    return int(body.strip())
+                    return status_code, int(body.strip())
                 else:
                     print("Non-JSON response:", body.strip())
-                    return body.strip()
+                    return status_code, body.strip()
 
         except Exception as e:
             print(f"API request failed: {e}")
-            return None
+            return status_code, None
             
     # Helper method to get equipment type name
     def get_equipment_type_name(self, equipment_type_id):
@@ -354,6 +390,8 @@ class Database:
             "user_is_authorized": true/false //Whether or not the user is authorized for this equipment
             "card_type": CardType //The type of card
             "user_authority_level": int //Returns if the user is a normal user, trainer, or admin
+            "pin": the plaintext PIN, -1 if none, None if the lookup failed //Taken out by PinVerifier.remember
+            "pin_hash": (salt hex, iterations, digest hex) or None //PIN record, if the backend delivers one
         }
         '''
         print(f"Getting card details for card ID {card_id}")
@@ -371,7 +409,8 @@ class Database:
             "user_is_authorized": False,
             "card_type": CardType.INVALID_CARD,
             "user_authority_level": 0,
-            "pin": -1
+            "pin": None,
+            "pin_hash": None
         }
         
         if response is None:
@@ -400,11 +439,29 @@ class Database:
             "user_is_authorized": self.is_user_authorized_for_equipment_type(response_details),
             "card_type": card_type,
             "user_authority_level": int(user_role),
-            "pin": pin
+            "pin": pin,
+            "pin_hash": self._parse_pin_hash(response_details)
         }
             
         return details
 
+    def _parse_pin_hash(self, response_details):
+        '''
+        Get a PIN record delivered by the backend, see PinVerifier for the scheme
+
+        @return a tuple (salt hex, iterations, digest hex), or None if the
+            response holds no complete record
+        '''
+        try:
+            salt = response_details.get("pin_salt")
+            digest = response_details.get("pin_hash")
+            iterations = int(response_details.get("pin_iterations") or 0)
+            if salt and digest and iterations > 0:
+                return (str(salt), iterations, str(digest))
+        except (ValueError, TypeError) as e:
+            print(f"Invalid PIN record in response: {e}")
+        return None
+
     def is_user_authorized_for_equipment_type(self, card_details):
         '''
         Check if card holder is authorized for the equipment type
@@ -546,4 +603,117 @@ class Database:
             except (ValueError, TypeError):
                 return False
         else:
-            return False
\ No newline at end of file
+            return False
+
+    def add_user_authorizations(self, card_ids, equipment_type_id):
+        '''
+        Adds an authorization for one equipment type to several users in one request
+
+        Sent as mode "add_authorizations" with the card IDs comma separated.
+        The backend answers with one entry per card:
+        [{"card_id": int, "result": "success" | "already_authorized" |
+        "not_user_card" | "failed"}]. The backend does not have this endpoint
+        yet (HardwareTests/EnrollmentServerStub.py is a stand-in for it); while
+        it rejects the mode, each card is checked and sent on its own by
+        _add_user_authorization_checked() instead. When the backend cannot be
+        reached at all every card fails, without a request per card.
+
+        @param card_ids: The IDs of the users' cards
+        @param equipment_type_id: The ID of the equipment type to authorize
+        @return: dictionary of card ID to result, with an entry for every card
+        '''
+        print(f"Adding authorization for {len(card_ids)} cards on equipment type {equipment_type_id}")
+
+        params = {
+            "mode": "add_authorizations",
+            "card_ids": ",".join([str(card_id) for card_id in card_ids]),
+            "equipment_type_id": equipment_type_id
+        }
+
+        status_code, response = self._api_request("POST", params)
+
+        results = {}
+        if isinstance(response, list):
+            for entry in response:
+                try:
+                    results[int(entry["card_id"])] = str(entry.get("result", "failed"))
+                except (KeyError, ValueError, TypeError):
+                    print(f"Invalid entry in add_authorizations response: {entry}")
+        elif self._mode_rejected(status_code, response):
+            print("Bulk authorization unavailable, authorizing one card at a time")
+            for card_id in card_ids:
+                results[card_id] = self._add_user_authorization_checked(card_id, equipment_type_id)
+        else:
+            print(f"Bulk authorization failed (status {status_code}), no card authorized")
+
+        for card_id in card_ids:
+            if card_id not in results:
+                results[card_id] = "failed"
+        return results
+
+    def _mode_rejected(self, status_code, response):
+        '''
+        Check whether a request failed because the backend does not know its mode
+
+        @return: True for a 404 or an "unknown mode" answer, False for transport
+            failures and every other error
+        '''
+        if status_code == 404:
+            return True
+        return isinstance(response, str) and "unknown mode" in response.lower()
+
+    def _add_user_authorization_checked(self, card_id, equipment_type_id):
+        '''
+        Authorizes one card after checking it is a user card without the authorization
+
+        @return: the card's result as add_user_authorizations reports it
+        '''
+        details = self.get_card_details(card_id, equipment_type_id)
+        if details["card_type"] == CardType.INVALID_CARD:
+            return "failed"
+        if details["card_type"] != CardType.USER_CARD:
+            return "not_user_card"
+        if details["user_is_authorized"]:
+            return "already_authorized"
+        return "success" if self.add_user_authorization(card_id, equipment_type_id) else "failed"
+
+    def log_boot_timelines(self, equipment_id, timelines):
+        '''
+        Reports the timelines of the last boots in one request
+
+        Sent as mode "log_boot_timelines" with the timelines as URL encoded
+        JSON: [{"reset": reset cause, "ready": ms since reset or -1,
+        "phases": [[name, start ms, duration ms, ok], ...]}, ...]
+
+        @param equipment_id: The ID of the equipment
+        @param timelines: The timelines, oldest first
+        @return: True if the backend took them, False otherwise
+        '''
+        print(f"Reporting {len(timelines)} boot timelines")
+
+        params = {
+            "mode": "log_boot_timelines",
+            "equipment_id": equipment_id,
+            "timelines": self._url_encode(json.dumps(timelines))
+        }
+
+        response = self._make_api_request("POST", params)
+
+        # Any non-None response is considered success
+        return response is not None
+
+    def _url_encode(self, text):
+        '''
+        Percent-encode a query parameter value
+
+        @param text: The value
+        @return: The value with every byte outside the unreserved set encoded
+        '''
+        encoded = []
+        for byte in text.encode():
+            char = chr(byte)
+            if 48 <= byte <= 57 or 65 <= byte <= 90 or 97 <= byte <= 122 or char in "-_.~":
+                encoded.append(char)
+            else:
+                encoded.append('%{:02X}'.format(byte))
+        return "".join(encoded)
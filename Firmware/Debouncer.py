@@ -0,0 +1,190 @@
+# Debouncer.py for MicroPython on ESP32
+# Per-key debounce, auto-repeat and chord detection for up to 30 keys
+
+import time
+
+# Event flags, or'ed with the key index (or the chord index for EVENT_CHORD)
+EVENT_RELEASE = 0x80
+EVENT_REPEAT = 0x40
+EVENT_CHORD = 0x20
+EVENT_INDEX_MASK = 0x1F
+
+# Bit planes of the per-key sample counters, counters go up to 2**COUNTER_BITS - 1
+COUNTER_BITS = 3
+
+class Debouncer:
+    """
+    Debounce engine shared by the keypad, the single button and PIN entry
+
+    The raw state of all keys is passed in as one bit mask per sample. Each
+    key has a small counter of consecutive samples that disagree with its
+    debounced state, and the key only changes state once the counter reaches
+    the press or release threshold. The counters are stored bit-sliced
+    ("vertical counters"): one int per counter bit holding that bit for
+    every key, so a sample updates all keys with a handful of integer
+    operations and no lists.
+
+    A key that stays down starts repeating after repeat_delay_ms, every
+    repeat_ms. Registered chords (sets of keys) are reported once when
+    exactly their keys are down together.
+
+    Events are passed to the sink function as one int code, see the
+    EVENT_* flags.
+    """
+
+    def __init__(self, num_keys, sink, press_samples=2, release_samples=3,
+                 repeat_mask=0, repeat_delay_ms=600, repeat_ms=150):
+        """
+        Initialize the debouncer
+
+        Args:
+            num_keys: Number of keys, at most 30
+            sink: Function called with each event code, must not allocate
+                when used from a timer
+            press_samples: Samples a key must read down before it is pressed
+            release_samples: Samples a key must read up before it is released
+            repeat_mask: Bit mask of the keys that auto-repeat
+            repeat_delay_ms: Time a key is held before it starts repeating
+            repeat_ms: Time between repeats
+        """
+        max_count = (1 << COUNTER_BITS) - 1
+        if not 0 < num_keys <= 30:
+            raise ValueError("Debouncer supports 1 to 30 keys")
+        if not (0 < press_samples <= max_count and 0 < release_samples <= max_count):
+            raise ValueError(f"Sample thresholds must be between 1 and {max_count}")
+
+        self.num_keys = num_keys
+        self.all_keys = (1 << num_keys) - 1
+        self.sink = sink
+        self.press_samples = press_samples
+        self.release_samples = release_samples
+        self.repeat_mask = repeat_mask
+        self.repeat_delay_ms = repeat_delay_ms
+        self.repeat_ms = repeat_ms
+
+        # Debounced state and the counter bit planes
+        self.state = 0
+        self.count0 = 0
+        self.count1 = 0
+        self.count2 = 0
+
+        # The most recently pressed repeating key, -1 for none
+        self.repeat_key = -1
+        self.repeat_next = 0
+
+        # Chord masks, and the chord currently held
+        self.chords = []
+        self.chord_active = -1
+
+    def add_chord(self, mask):
+        """
+        Register a chord
+
+        Args:
+            mask: Bit mask of the keys that make up the chord
+
+        Returns:
+            Chord index used in its EVENT_CHORD events
+        """
+        if len(self.chords) > EVENT_INDEX_MASK:
+            raise ValueError("Too many chords")
+        self.chords.append(mask)
+        return len(self.chords) - 1
+
+    def _counters_equal(self, value):
+        """Bit mask of the keys whose counter equals value"""
+        eq = self.all_keys
+        eq &= self.count0 if value & 1 else ~self.count0
+        eq &= self.count1 if value & 2 else ~self.count1
+        eq &= self.count2 if value & 4 else ~self.count2
+        return eq
+
+    def busy(self):
+        """Check whether a key is down or still settling, i.e. sampling must go on"""
+        return bool(self.state or self.count0 or self.count1 or self.count2)
+
+    def update(self, raw, now=None):
+        """
+        Feed one sample of the raw key state
+
+        Args:
+            raw: Bit mask of the keys that read down in this sample
+            now: ticks_ms of the sample, read if not given
+
+        Returns:
+            Bit mask of the keys that changed state
+        """
+        raw &= self.all_keys
+        diff = raw ^ self.state
+
+        # Counters of the keys that agree with their state restart at 0,
+        # the others count one more disagreeing sample
+        c0 = self.count0 & diff
+        c1 = self.count1 & diff
+        c2 = self.count2 & diff
+        carry = diff
+        self.count0 = c0 ^ carry
+        carry &= c0
+        self.count1 = c1 ^ carry
+        carry &= c1
+        self.count2 = c2 ^ carry
+
+        toggled = ((self._counters_equal(self.press_samples) & raw)
+                   | (self._counters_equal(self.release_samples) & ~raw & self.all_keys))
+        if now is None:
+            now = time.ticks_ms()
+
+        if toggled:
+            self.state ^= toggled
+            keep = ~toggled
+            self.count0 &= keep
+            self.count1 &= keep
+            self.count2 &= keep
+
+            index = 0
+            bits = toggled
+            while bits:
+                if bits & 1:
+                    if self.state & (1 << index):
+                        self.sink(index)
+                        if self.repeat_mask & (1 << index):
+                            self.repeat_key = index
+                            self.repeat_next = time.ticks_add(now, self.repeat_delay_ms)
+                    else:
+                        self.sink(index | EVENT_RELEASE)
+                        if index == self.repeat_key:
+                            self.repeat_key = -1
+                bits >>= 1
+                index += 1
+
+            self._check_chords()
+
+        # Auto-repeat of the last pressed key while it is held
+        if self.repeat_key >= 0 and time.ticks_diff(now, self.repeat_next) >= 0:
+            self.sink(self.repeat_key | EVENT_REPEAT)
+            self.repeat_next = time.ticks_add(self.repeat_next, self.repeat_ms)
+            if time.ticks_diff(now, self.repeat_next) >= 0:
+                # Sampling stalled, do not burst the missed repeats
+                self.repeat_next = time.ticks_add(now, self.repeat_ms)
+
+        return toggled
+
+    def _check_chords(self):
+        """Report a chord once when exactly its keys are down"""
+        state = self.state
+        for index in range(len(self.chords)):
+            if self.chords[index] == state:
+                if self.chord_active != index:
+                    self.chord_active = index
+                    self.sink(index | EVENT_CHORD)
+                return
+        self.chord_active = -1
+
+    def reset(self):
+        """Forget all key state, e.g. after the keys were unobservable for a while"""
+        self.state = 0
+        self.count0 = 0
+        self.count1 = 0
+        self.count2 = 0
+        self.repeat_key = -1
+        self.chord_active = -1
@@ -1,11 +1,29 @@
 # DisplayController.py - Enhanced UI handling for PortalBox
 import time
 
+from ScreenTemplates import ScreenTemplates
+
 class DisplayController:
     """
     Manages enhanced LCD and LED display features for the PortalBox
     Coordinates messaging, colors, and visual feedback
     """
+    
+    # Progress bar: cells on the bottom line, each split into 5 pixel columns
+    # drawn with custom characters holding 1 to 5 filled columns
+    PROGRESS_CELLS = 10
+    PROGRESS_STEPS = PROGRESS_CELLS * 5
+    PROGRESS_GLYPH_SLOT = 1     # Slots 1-5, slot 0 is avoided as it is a NUL byte
+    PROGRESS_GLYPHS = (
+        (0x10, 0x10, 0x10, 0x10, 0x10, 0x10, 0x10, 0x10),
+        (0x18, 0x18, 0x18, 0x18, 0x18, 0x18, 0x18, 0x18),
+        (0x1C, 0x1C, 0x1C, 0x1C, 0x1C, 0x1C, 0x1C, 0x1C),
+        (0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E, 0x1E),
+        (0x1F, 0x1F, 0x1F, 0x1F, 0x1F, 0x1F, 0x1F, 0x1F),
+    )
+    # Shown instead of the bar while the LED ring shows the progress
+    COUNTDOWN_LABEL = b"Time left "
+    
     def __init__(self, portal_box):
         """
         Initialize with reference to the PortalBox hardware abstraction
@@ -18,26 +36,25 @@ class DisplayController:
         self.last_color = ""
         self.grace_start_time = 0
         self.grace_total_time = 0
-        self.progress_chars = ['-', '=', '=', '#']
+        self.grace_title = "Insert Card"
+        self.grace_color = "process_color"
+        # Bottom line of the progress display, rebuilt in place on each step
+        self.progress_line = bytearray(b' ' * 16)
+        self.progress_step = -1
+        self.progress_seconds = -1
+        self.glyphs_loaded = False
+        self.led_countdown = False
         self.animation_frame = 0
         self.animation_last_update = 0
-        # Color shortcuts
-        self.colors = {
-            "unauth_color": (0, 0, 255),
-            "auth_color": (255, 0, 0),
-            "sleep_color": (0, 255, 0),
-            "process_color": (255, 0, 255),
-            "admin_mode": (255, 255, 0),
-            "proxy_color": (32, 0, 223),
-            "training_color": (0, 128, 128),
-        }
+        # Fixed screens, pre-encoded once for the display width
+        self.templates = ScreenTemplates(getattr(self.box.lcd, 'cols', 16))
     
     def set_color(self, color_name):
         """
         Sets both LCD and DotStar LEDs to the same color
         
         Args:
-            color_name: String name of color from self.colors
+            color_name: String name of a color in the box's palette
         """
         try:
             if color_name == self.last_color:
@@ -47,13 +64,13 @@ class DisplayController:
             self.box.setScreenColor(color_name)
             
             # Use existing dotstar if available
-            if hasattr(self.box, 'dotstar'):
-                color = self.colors.get(color_name.lower(), (0, 0, 255))# Default to blue
-                if color_name.lower()=="sleep_color":
+            if getattr(self.box, 'dotstar', None):
+                if color_name == "sleep_color":
                     self.box.dotstar.rainbow_cycle(1000)
+                    # The strip no longer shows a palette color
+                    self.box.led_color = None
                 else:
-                    self.box.dotstar.fill(color)
-                self.box.dotstar.show()
+                    self.box.set_led_color(color_name)
         except Exception as e:
             print(f"Color setting error: {e}")
     
@@ -71,23 +88,37 @@ class DisplayController:
                 
             self.last_message = message
             
-            # Truncate if too long or center if shorter than display
-            if len(message) > 16:
-                display_text = message[:16]
-            else:
-                padding = (16 - len(message)) // 2
-                display_text = " " * padding + message + " " * padding
-                # If odd length, add one more space at the end
-                if len(display_text) < 16:
-                    display_text += " "
-            
-            self.box.lcd_print(display_text)
+            # Centered and encoded once per distinct message
+            self.box.lcd.render(self.templates.message(message), self.templates.blank)
             
             if color:
                 self.set_color(color)
         except Exception as e:
             print(f"Display message error: {e}")
     
+    def show_screen(self, name):
+        """
+        Show a precomputed screen from the template registry
+        
+        Args:
+            name: FSM state or screen name
+            
+        Returns:
+            True if a template exists for the name
+        """
+        screen = self.templates.get(name)
+        if screen is None:
+            return False
+        try:
+            if screen is not self.last_message:
+                self.last_message = screen
+                self.box.lcd.render(screen[0], screen[1])
+            if screen[2]:
+                self.set_color(screen[2])
+        except Exception as e:
+            print(f"Screen display error: {e}")
+        return True
+    
     def display_two_line_message(self, line1, line2, color=None):
         """
         Display a two-line message on the LCD
@@ -104,26 +135,8 @@ class DisplayController:
                 
             self.last_message = composite_message
             
-            # Truncate lines to fit display
-            if len(line1) > 16:
-                line1 = line1[:16]
-            if len(line2) > 16:
-                line2 = line2[:16]
-            
-            # Clear and print each line directly
-            self.box.lcd.clear()
-            time.sleep(0.01)  # Short delay to allow clear to complete
-            
-            # Print first line
-            self.box.lcd.set_cursor(1, 1)
-            time.sleep(0.01)  # Short delay to ensure cursor position
-            self.box.lcd.print(line1)
-            time.sleep(0.01)  # Short delay between lines
-            
-            # Print second line
-            self.box.lcd.set_cursor(1, 2)
-            time.sleep(0.01)  # Short delay to ensure cursor position
-            self.box.lcd.print(line2)
+            # Only the characters that changed are sent, in one write
+            self.box.lcd.render(line1, line2)
             
             if color:
                 self.set_color(color)
@@ -149,41 +162,99 @@ class DisplayController:
             print(f"Error getting user: {e}")
             self.display_two_line_message("Welcome", "Machine On", "auth_color")
     
-    def start_grace_timer(self, total_seconds):
+    def start_grace_timer(self, total_seconds, title="Insert Card", color="process_color"):
         """
         Start tracking grace period for progress display
         
         Args:
             total_seconds: Total grace period in seconds
+            title: Text shown on the top line above the progress bar
+            color: Color name used while the countdown is showing
         """
         try:
-            self.grace_start_time = time.time()
+            self.grace_start_time = time.ticks_ms()
             self.grace_total_time = total_seconds
+            self.grace_title = title
+            self.grace_color = color
+            # Force the first update to draw the whole countdown
+            self.progress_step = -1
+            self.progress_seconds = -1
+            # With "countdown": "leds" the ring shows the progress and the LCD
+            # only the seconds, with "lcd" the LCD draws the bar itself
+            display_settings = getattr(self.box, 'settings', {}).get("display", {})
+            self.led_countdown = (display_settings.get("countdown", "leds") != "lcd"
+                                  and bool(getattr(self.box, 'dotstar', None)))
+            if not self.led_countdown:
+                self.load_progress_glyphs()
         except Exception as e:
             print(f"Grace timer error: {e}")
     
+    def load_progress_glyphs(self):
+        """Write the partial block characters into the LCD's CGRAM, once"""
+        if self.glyphs_loaded:
+            return
+        for i, bitmap in enumerate(self.PROGRESS_GLYPHS):
+            self.box.lcd.create_char(self.PROGRESS_GLYPH_SLOT + i, bitmap)
+        self.glyphs_loaded = True
+    
     def update_grace_display(self):
         """
         Update the LCD with grace period countdown progress bar
+        
+        The bar fills in steps of one pixel column. Nothing is sent unless the
+        step or the seconds shown changed, and then only the changed cells go
+        out through the LCD's diff render. When the LEDs show the countdown
+        ring, the LCD only shows the seconds left.
+        
         Returns remaining seconds
         """
         try:
             if self.grace_total_time <= 0:
                 return 0
             
-            elapsed = time.time() - self.grace_start_time
-            remaining = max(0, self.grace_total_time - elapsed)
+            total_ms = int(self.grace_total_time * 1000)
+            elapsed_ms = time.ticks_diff(time.ticks_ms(), self.grace_start_time)
+            remaining_ms = max(0, total_ms - elapsed_ms)
+            
+            step = min(self.PROGRESS_STEPS, (total_ms - remaining_ms) * self.PROGRESS_STEPS // total_ms)
+            if self.led_countdown:
+                step = 0
+            seconds = min(99, (remaining_ms + 999) // 1000)
+            if step == self.progress_step and seconds == self.progress_seconds:
+                return remaining_ms / 1000
+            
+            line = self.progress_line
+            if self.led_countdown:
+                line[0:self.PROGRESS_CELLS] = self.COUNTDOWN_LABEL
+            else:
+                full, part = divmod(step, 5)
+                for i in range(self.PROGRESS_CELLS):
+                    if i < full:
+                        line[i] = self.PROGRESS_GLYPH_SLOT + 4
+                    elif i == full and part:
+                        line[i] = self.PROGRESS_GLYPH_SLOT + part - 1
+                    else:
+                        line[i] = 0x20
             
-            # Create a simpler progress indicator
-            progress_percent = (self.grace_total_time - remaining) / self.grace_total_time
-            filled_chars = int(10 * progress_percent)
-            progress_bar = "[" + "#" * filled_chars + "-" * (10 - filled_chars) + "]"
+            # Seconds right aligned after the bar: " 99s"
+            cell = self.PROGRESS_CELLS
+            line[cell] = 0x20
+            line[cell + 1] = 0x30 + seconds // 10 if seconds >= 10 else 0x20
+            line[cell + 2] = 0x30 + seconds % 10
+            line[cell + 3] = ord('s')
             
-            # Format as "Insert Card" on first line, progress bar and timer on second
-            time_str = f"{int(remaining)}s"
-            self.display_two_line_message("Insert Card", progress_bar + " " + time_str, "process_color")
+            if self.progress_step < 0:
+                self.set_color(self.grace_color)
+                if self.led_countdown:
+                    # After the color, which would replace the ring
+                    self.box.start_led_countdown(remaining_ms / 1000)
+            self.box.lcd.render(self.grace_title, line)
+            # The screen no longer shows the last message
+            self.last_message = ""
             
-            return remaining
+            self.progress_step = step
+            self.progress_seconds = seconds
+            return remaining_ms / 1000
         except Exception as e:
             print(f"Grace display update error: {e}")
             return 0
@@ -191,7 +262,7 @@ class DisplayController:
     def display_idle_instructions(self):
         """Display instructions in idle mode"""
         try:
-            self.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
+            self.show_screen("IdleNoCard")
         except Exception as e:
             print(f"Idle instructions error: {e}")
     
@@ -206,7 +277,7 @@ class DisplayController:
     def display_unauthorized(self):
         """Display unauthorized message"""
         try:
-            self.display_two_line_message("Unauthorized", "Access Denied", "unauth_color")
+            self.show_screen("IdleUnauthCard")
         except Exception as e:
             print(f"Unauthorized display error: {e}")
     
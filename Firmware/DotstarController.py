@@ -20,6 +20,38 @@ MAGENTA = (255, 0, 255)
 ORANGE = (255, 165, 0)
 PURPLE = (128, 0, 128)
 
+# Animation modes
+ANIM_NONE = 0
+ANIM_WIPE = 1
+ANIM_BLINK = 2
+ANIM_PULSE = 3
+ANIM_RAINBOW = 4
+ANIM_COUNTDOWN = 5
+
+def _build_wheel():
+    """
+    Build the rainbow color wheel lookup table
+    
+    Returns:
+        bytearray with 3 bytes (r, g, b) for each of the 256 wheel positions
+    """
+    wheel = bytearray(256 * 3)
+    for pos in range(256):
+        if pos < 85:
+            r, g, b = 255 - pos * 3, pos * 3, 0
+        elif pos < 170:
+            p = pos - 85
+            r, g, b = 0, 255 - p * 3, p * 3
+        else:
+            p = pos - 170
+            r, g, b = p * 3, 0, 255 - p * 3
+        wheel[3 * pos] = r
+        wheel[3 * pos + 1] = g
+        wheel[3 * pos + 2] = b
+    return wheel
+
+WHEEL = _build_wheel()
+
 class DotStar:
     """
     Class to control DotStar LED strips/arrays via SPI
@@ -28,8 +60,18 @@ class DotStar:
     - Start frame: 4 bytes of 0x00
     - LED frames: 4 bytes per LED (0xE0 + brightness, blue, green, red)
     - End frame: 4 bytes of 0xFF (or (n/2) / 16 bytes of 0x00 for SK9822)
+    
+    Animations are scheduled on frames: the frame to show is derived from
+    the time since the animation started, so update_animations() never
+    blocks and never falls behind when it is called late. Only frames that
+    differ from what the strip shows are sent.
     """
     
+    # Shortest time between two animation frames
+    FRAME_MS = 20
+    # Time between two pulse brightness steps
+    PULSE_STEP_MS = 50
+    
     def __init__(self, spi_bus=1, data_pin=13, clock_pin=12, num_leds=15, brightness=16):
         """
         Initialize the DotStar controller
@@ -42,8 +84,17 @@ class DotStar:
             brightness: Default brightness level (0-31)
         """
         self.num_leds = num_leds
-        self.brightness = brightness
-        self.leds = [(0, 0, 0)] * num_leds  # Initialize all LEDs as off
+        self.brightness = brightness & 0x1F
+        
+        # The whole SPI transfer lives in one preallocated buffer: start frame,
+        # 4 bytes per LED, then the SK9822 compatible end frame. Pixels and
+        # brightness are written in place and show() sends it in one write.
+        end_frame_length = (num_leds // 16) + 1
+        self.frame = bytearray(4 + 4 * num_leds + end_frame_length)
+        self.frame_mv = memoryview(self.frame)
+        self.pixels = self.frame_mv[4:4 + 4 * num_leds]
+        for i in range(num_leds):
+            self.pixels[4 * i] = 0xE0 | self.brightness
         
         print("Starting.........")
         # Configure SPI bus
@@ -58,64 +109,123 @@ class DotStar:
         
         print("Made SPI Bus for Dotstars")
         
-        # Initialize state variables for animations
-        self.is_pulsing = False
-        self.pulse_color = BLACK
-        self.pulse_rising = False
-        self.pulse_brightness = brightness
+        # Animation state, one animation runs at a time
+        self.anim_mode = ANIM_NONE
+        self.anim_color = BLACK
+        self.anim_start = 0
+        self.anim_next = 0
+        self.anim_step_ms = self.FRAME_MS
+        self.anim_steps = 0          # Steps until the animation ends, 0 for endless
+        self.anim_last_step = -1
+        self.blink_on = False
+        self.rainbow_steps = 256
+        self.rainbow_offset = -1
+        self._busy = False           # Set while the frame buffer is being changed
+        
+        # Wheel position of each LED at the start of the rainbow
+        self.rainbow_offsets = bytearray([(i * 256 // num_leds) & 0xFF for i in range(num_leds)])
+        
+        # Pulse brightness, down from the maximum to the minimum and back up
         self.pulse_min_brightness = 1
         self.pulse_max_brightness = 31
         self.pulse_step = 2
+        down = list(range(self.pulse_max_brightness, self.pulse_min_brightness - 1, -self.pulse_step))
+        self.pulse_table = bytearray(down + down[-2:0:-1])
         
-        self.is_blinking = False
-        self.blink_color = BLACK
-        self.blink_duration = 0
-        self.blink_count = 0
-        self.blink_last_toggle = 0
-        self.blink_state = False
+        # Countdown ring, one complete frame per step, allocated on first use
+        self.countdown_frames = None
         
-        self.is_wiping = False
-        self.wipe_color = BLACK
-        self.wipe_position = 0
-        self.wipe_last_update = 0
-        self.wipe_duration = 0
+        # Frame statistics
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        self.frame_time_max_us = 0
+        self.frame_time_total_us = 0
         
         # Clear the LEDs on startup
         self.fill(BLACK)
         self.show()
     
-    def _write_bytes(self, data):
-        """Write bytes to the SPI bus"""
-        self.spi.write(bytearray(data))
+    def _claim(self):
+        """Take the frame buffer from the timer: a direct write replaces any running animation"""
+        self._busy = True
+        self.anim_mode = ANIM_NONE
     
     def show(self):
-        """Update the LED strip with current colors"""
-        # Start frame - 4 bytes of 0
-        self._write_bytes([0x00, 0x00, 0x00, 0x00])
-        
-        # LED frames - 4 bytes per LED
-        for r, g, b in self.leds:
-            # Format: [0xE0 + brightness, blue, green, red]
-            self._write_bytes([0xE0 | self.brightness, b, g, r])
-            
-        # End frame - SK9822 compatible
-        # For SK9822, need at least (num_leds / 16) + 1 bytes of 0x00
-        end_frame_length = (self.num_leds // 16) + 1
-        self._write_bytes([0x00] * end_frame_length)
+        """Update the LED strip with current colors, in a single SPI write"""
+        self._claim()
+        self.spi.write(self.frame)
+        self._busy = False
+    
+    def show_frame(self, frame, color=None):
+        """
+        Send a precomputed frame, such as one from the Palette
+        
+        Args:
+            frame: Complete frame (start, LED and end frames) of the same length
+            color: Unused, the pixels are taken from the frame
+        """
+        if len(frame) != len(self.frame):
+            raise ValueError("Frame size does not match the strip")
+        # A static frame replaces any running animation
+        self._claim()
+        self.frame[:] = frame
+        if frame[4] & 0x1F != self.brightness:
+            # Brightness changed since the frame was built
+            self._write_brightness()
+        self.spi.write(self.frame)
+        self._busy = False
     
     def fill(self, color):
         """Fill the entire strip with a single color"""
-        self.leds = [color] * self.num_leds
+        self._claim()
+        self._fill(color)
+        self._busy = False
+    
+    def _fill(self, color):
+        """Fill the frame buffer with one color, for the owner of the buffer"""
+        pixels = self.pixels
+        pixels[1] = color[2]
+        pixels[2] = color[1]
+        pixels[3] = color[0]
+        # Copy the first LED over the rest, doubling the filled part each time
+        filled = 4
+        total = 4 * self.num_leds
+        while filled < total:
+            n = min(filled, total - filled)
+            pixels[filled:filled + n] = pixels[0:n]
+            filled += n
     
     def set_pixel(self, index, color):
         """Set a specific pixel to a color"""
+        self._claim()
+        self._set_pixel(index, color)
+        self._busy = False
+    
+    def _set_pixel(self, index, color):
+        """Set one pixel in the frame buffer, for the owner of the buffer"""
         if 0 <= index < self.num_leds:
-            self.leds[index] = color
+            offset = 4 * index
+            self.pixels[offset + 1] = color[2]
+            self.pixels[offset + 2] = color[1]
+            self.pixels[offset + 3] = color[0]
+    
+    def get_pixel(self, index):
+        """Get the color of a pixel as an RGB tuple"""
+        offset = 4 * index
+        return (self.pixels[offset + 3], self.pixels[offset + 2], self.pixels[offset + 1])
     
     def set_brightness(self, brightness):
         """Set the global brightness level (0-31)"""
-        if 0 <= brightness <= 31:
+        if 0 <= brightness <= 31 and brightness != self.brightness:
             self.brightness = brightness
+            self._write_brightness()
+    
+    def _write_brightness(self):
+        """Write the global brightness into every LED frame"""
+        header = 0xE0 | self.brightness
+        pixels = self.pixels
+        for offset in range(0, 4 * self.num_leds, 4):
+            pixels[offset] = header
     
     def color_wipe(self, color, duration_ms=1000):
         """
@@ -125,22 +235,8 @@ class DotStar:
             color: RGB tuple (r, g, b)
             duration_ms: Total duration of the wipe in milliseconds
         """
-        self.is_pulsing = False
-        self.is_blinking = False
-        self.is_wiping = True
-        self.wipe_color = color
-        self.wipe_position = 0
-        self.wipe_duration = duration_ms
-        self.wipe_last_update = time.ticks_ms()
-        
-        # Calculate time per LED
-        self.wipe_step_ms = duration_ms // self.num_leds
-        if self.wipe_step_ms < 10:
-            self.wipe_step_ms = 10  # Minimum 10ms per LED for smooth animation
-        
-        # Set the first LED
-        self.set_pixel(0, color)
-        self.show()
+        # Minimum 10ms per LED for smooth animation
+        self._start(ANIM_WIPE, color, max(10, duration_ms // self.num_leds), self.num_leds)
     
     def blink(self, color, duration_ms=1000, count=5):
         """
@@ -151,24 +247,9 @@ class DotStar:
             duration_ms: Total duration of all blinks in milliseconds
             count: Number of blinks (on-off cycles)
         """
-        self.is_pulsing = False
-        self.is_wiping = False
-        self.is_blinking = True
-        self.blink_color = color
-        self.blink_count = count * 2  # Each count is one on-off cycle (2 states)
-        self.blink_duration = duration_ms
-        
-        # Calculate time per blink state
-        self.blink_step_ms = duration_ms // (count * 2)
-        if self.blink_step_ms < 50:
-            self.blink_step_ms = 50  # Minimum 50ms per state for visible blinking
-        
-        self.blink_state = True
-        self.blink_last_toggle = time.ticks_ms()
-        
-        # Set initial state (on)
-        self.fill(color)
-        self.show()
+        # Each count is one on-off cycle (2 states), minimum 50ms per state for visible blinking
+        self.blink_on = False
+        self._start(ANIM_BLINK, color, max(50, duration_ms // (count * 2)), count * 2)
     
     def pulse(self, color):
         """
@@ -177,118 +258,219 @@ class DotStar:
         Args:
             color: RGB tuple (r, g, b)
         """
-        self.is_blinking = False
-        self.is_wiping = False
-        self.is_pulsing = True
-        self.pulse_color = color
-        self.pulse_rising = False  # Start by decreasing brightness
-        self.pulse_brightness = self.brightness
-        
-        # Set the color
-        self.fill(color)
-        self.show()
-    
-    def update_animations(self):
-        """Update any running animations - call this in your main loop"""
-        current_time = time.ticks_ms()
-        
-        if self.is_wiping:
-            # Check if it's time to update the wipe
-            if time.ticks_diff(current_time, self.wipe_last_update) >= self.wipe_step_ms:
-                self.wipe_position += 1
-                
-                if self.wipe_position < self.num_leds:
-                    self.set_pixel(self.wipe_position, self.wipe_color)
-                    self.show()
-                    self.wipe_last_update = current_time
-                else:
-                    self.is_wiping = False
-        
-        if self.is_blinking:
-            # Check if it's time to toggle the blink state
-            if time.ticks_diff(current_time, self.blink_last_toggle) >= self.blink_step_ms:
-                self.blink_count -= 1
-                self.blink_state = not self.blink_state
-                
-                if self.blink_count > 0:
-                    if self.blink_state:
-                        self.fill(self.blink_color)
-                    else:
-                        self.fill(BLACK)
-                    self.show()
-                    self.blink_last_toggle = current_time
-                else:
-                    self.is_blinking = False
-                    self.fill(BLACK)
-                    self.show()
-        
-        if self.is_pulsing:
-            # Update pulse every 50ms
-            if time.ticks_diff(current_time, getattr(self, 'pulse_last_update', 0)) >= 50:
-                if self.pulse_rising:
-                    self.pulse_brightness += self.pulse_step
-                    if self.pulse_brightness >= self.pulse_max_brightness:
-                        self.pulse_brightness = self.pulse_max_brightness
-                        self.pulse_rising = False
-                else:
-                    self.pulse_brightness -= self.pulse_step
-                    if self.pulse_brightness <= self.pulse_min_brightness:
-                        self.pulse_brightness = self.pulse_min_brightness
-                        self.pulse_rising = True
-                
-                self.brightness = self.pulse_brightness
-                self.show()
-                self.pulse_last_update = current_time
+        # The first step paints the color, so the timer never sees a half filled strip
+        self._start(ANIM_PULSE, color, self.PULSE_STEP_MS, 0)
     
-    def rainbow_cycle(self, duration_ms=1000):
+    def rainbow_cycle(self, duration_ms=1000, cycles=1):
         """
-        Display a cycling rainbow pattern
+        Start a cycling rainbow pattern
         
         Args:
             duration_ms: Duration of one full cycle in milliseconds
+            cycles: Number of cycles before the rainbow stops, 0 to run until
+                another animation or color replaces it
         """
-        self.is_pulsing = False
-        self.is_blinking = False
-        self.is_wiping = False
+        step_ms = max(self.FRAME_MS, duration_ms // 256)
+        self.rainbow_steps = max(1, duration_ms // step_ms)
+        self.rainbow_offset = -1
+        self._start(ANIM_RAINBOW, BLACK, step_ms, self.rainbow_steps * cycles)
+    
+    def countdown(self, duration_ms, start_color, end_color):
+        """
+        Start a draining ring showing the time left
         
-        step_time = duration_ms // 256
+        The strip starts full and loses one LED every duration_ms / num_leds,
+        the lit LEDs shading from start_color towards end_color as time runs
+        out. All frames are computed here, each step only copies one frame.
         
-        for j in range(256):
-            for i in range(self.num_leds):
-                # Calculate color based on position and cycle
-                pos = (i * 256 // self.num_leds + j) % 256
-                self.set_pixel(i, self._wheel(pos))
-            self.show()
-            time.sleep_ms(step_time)
+        Args:
+            duration_ms: Time until the ring is empty
+            start_color: RGB tuple with the full time left
+            end_color: RGB tuple close to the end
+        """
+        # The frames are rewritten below, a running countdown must not read them
+        self._claim()
+        n = self.num_leds
+        size = len(self.frame)
+        if self.countdown_frames is None:
+            self.countdown_frames = bytearray(size * (n + 1))
+            self.countdown_mv = memoryview(self.countdown_frames)
+        frames = self.countdown_frames
+        header = 0xE0 | self.brightness
+        for step in range(n + 1):
+            lit = n - step
+            base = step * size
+            # Color by the fraction left: start_color when full, end_color with one LED left
+            t = step * 256 // n
+            r = start_color[0] + (end_color[0] - start_color[0]) * t // 256
+            g = start_color[1] + (end_color[1] - start_color[1]) * t // 256
+            b = start_color[2] + (end_color[2] - start_color[2]) * t // 256
+            for i in range(size):
+                frames[base + i] = 0
+            for i in range(n):
+                offset = base + 4 + 4 * i
+                frames[offset] = header
+                if i < lit:
+                    frames[offset + 1] = b
+                    frames[offset + 2] = g
+                    frames[offset + 3] = r
+        
+        self._start(ANIM_COUNTDOWN, start_color, max(1, duration_ms // n), n + 1)
     
-    def _wheel(self, pos):
+    def _start(self, mode, color, step_ms, steps):
+        """Start an animation and show its first frame"""
+        self._busy = True
+        self.anim_mode = mode
+        self.anim_color = color
+        self.anim_step_ms = step_ms
+        self.anim_steps = steps
+        self.anim_last_step = -1
+        self.anim_start = time.ticks_ms()
+        self.anim_next = self.anim_start
+        self._busy = False
+        self.update_animations()
+    
+    def update_animations(self):
         """
-        Color wheel helper for rainbow effects
+        Show the current frame of the running animation if it is due
         
-        Args:
-            pos: Position on wheel (0-255)
+        Call this regularly, from the effects timer or the main loop. Frames
+        whose time has passed without a call are skipped, not replayed.
+        Safe to call from a timer callback: it allocates nothing and skips
+        the tick while the main loop is changing the frame buffer.
         
         Returns:
-            RGB tuple
+            True if a frame was sent to the strip
         """
-        # Convert wheel position to RGB color
-        if pos < 85:
-            return (255 - pos * 3, pos * 3, 0)
-        elif pos < 170:
-            pos -= 85
-            return (0, 255 - pos * 3, pos * 3)
-        else:
-            pos -= 170
-            return (pos * 3, 0, 255 - pos * 3)
+        if self.anim_mode == ANIM_NONE or self._busy:
+            return False
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.anim_next) < 0:
+            return False
+        self._busy = True
+        
+        start_us = time.ticks_us()
+        step = time.ticks_diff(now, self.anim_start) // self.anim_step_ms
+        finished = self.anim_steps and step >= self.anim_steps
+        if finished:
+            step = self.anim_steps - 1
+        
+        shown = False
+        if step != self.anim_last_step:
+            if self.anim_last_step >= 0 and step > self.anim_last_step + 1:
+                self.frames_dropped += step - self.anim_last_step - 1
+            if self._render_step(step):
+                self.spi.write(self.frame)
+                shown = True
+            self.anim_last_step = step
+        
+        if finished:
+            if self.anim_mode == ANIM_BLINK:
+                # Blinking ends with the strip off
+                self._fill(BLACK)
+                self.spi.write(self.frame)
+                shown = True
+            self.anim_mode = ANIM_NONE
+        self.anim_next = time.ticks_add(self.anim_start, (step + 1) * self.anim_step_ms)
+        
+        self._busy = False
+        
+        if shown:
+            frame_us = time.ticks_diff(time.ticks_us(), start_us)
+            self.frames_shown += 1
+            self.frame_time_total_us += frame_us
+            if frame_us > self.frame_time_max_us:
+                self.frame_time_max_us = frame_us
+        return shown
+    
+    def _render_step(self, step):
+        """
+        Write the frame for an animation step into the frame buffer
+        
+        Returns:
+            True if the frame differs from what the strip shows
+        """
+        mode = self.anim_mode
+        if mode == ANIM_WIPE:
+            # Fill every LED up to this step, including skipped ones
+            for i in range(self.anim_last_step + 1, step + 1):
+                self._set_pixel(i, self.anim_color)
+            return True
+        
+        if mode == ANIM_BLINK:
+            on = step % 2 == 0
+            if on == self.blink_on:
+                return False
+            self.blink_on = on
+            self._fill(self.anim_color if on else BLACK)
+            return True
+        
+        if mode == ANIM_PULSE:
+            brightness = self.pulse_table[step % len(self.pulse_table)]
+            if self.anim_last_step < 0:
+                # First step: the color, then the brightness
+                self._fill(self.anim_color)
+                self.set_brightness(brightness)
+                return True
+            if brightness == self.brightness:
+                return False
+            self.set_brightness(brightness)
+            return True
+        
+        if mode == ANIM_COUNTDOWN:
+            size = len(self.frame)
+            self.frame_mv[:] = self.countdown_mv[step * size:(step + 1) * size]
+            return True
+        
+        if mode == ANIM_RAINBOW:
+            offset = (step * 256 // self.rainbow_steps) & 0xFF
+            if offset == self.rainbow_offset:
+                return False
+            self.rainbow_offset = offset
+            pixels = self.pixels
+            offsets = self.rainbow_offsets
+            for i in range(self.num_leds):
+                w = 3 * ((offsets[i] + offset) & 0xFF)
+                pixels[4 * i + 1] = WHEEL[w + 2]
+                pixels[4 * i + 2] = WHEEL[w + 1]
+                pixels[4 * i + 3] = WHEEL[w]
+            return True
+        
+        return False
+    
+    def is_animating(self):
+        """Check whether an animation is running"""
+        return self.anim_mode != ANIM_NONE
     
     def stop_animations(self):
         """Stop all animations"""
-        self.is_pulsing = False
-        self.is_blinking = False
-        self.is_wiping = False
+        self.anim_mode = ANIM_NONE
+    
+    def get_animation_stats(self):
+        """
+        Get animation frame statistics
+        
+        Returns:
+            Dictionary with the frames shown and dropped, and the time spent
+            rendering and sending a frame
+        """
+        return {
+            "frames_shown": self.frames_shown,
+            "frames_dropped": self.frames_dropped,
+            "frame_time_max_us": self.frame_time_max_us,
+            "frame_time_avg_us": self.frame_time_total_us // self.frames_shown if self.frames_shown else 0,
+        }
+    
+    def reset_animation_stats(self):
+        """Reset the animation frame statistics"""
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        self.frame_time_max_us = 0
+        self.frame_time_total_us = 0
 
     def cleanup(self):
         """Turn off all LEDs and release resources"""
+        self.stop_animations()
         self.fill(BLACK)
         self.show()
         # No need to explicitly close SPI in MicroPython
\ No newline at end of file
@@ -0,0 +1,48 @@
+# GpioScan.py for MicroPython on ESP32-C6
+# Native matrix scan used by Keypad's "viper" scan mode
+#
+# Kept in its own module because a firmware built without the native
+# emitter rejects the whole file at import time; Keypad catches that and
+# falls back to the mem32 or Pin scan.
+
+import micropython
+
+@micropython.viper
+def scan_matrix(row_masks: ptr32, num_rows: int, col_masks: ptr32, num_cols: int, all_rows: int) -> int:
+    """
+    Scan a matrix with active low rows and pulled up columns
+
+    Args:
+        row_masks: array('I') with the GPIO bit of each row
+        num_rows: Number of rows
+        col_masks: array('I') with the GPIO bit of each column
+        num_cols: Number of columns
+        all_rows: GPIO bits of all rows
+
+    Returns:
+        Bit mask of the keys that are down, row * num_cols + column
+    """
+    # Keypad.GPIO_BASE, indexed by the word offsets of Keypad.GPIO_OUT_W1TS (2),
+    # GPIO_OUT_W1TC (3) and GPIO_IN (15); viper needs them as literals
+    gpio = ptr32(0x60091000)
+    gpio[2] = all_rows
+    mask = 0
+    bit = 1
+    r = 0
+    while r < num_rows:
+        row = row_masks[r]
+        gpio[3] = row
+        # The first read lets the row settle, the second is used
+        sample = gpio[15]
+        sample = gpio[15]
+        c = 0
+        while c < num_cols:
+            if not (sample & col_masks[c]):
+                mask |= bit
+            bit <<= 1
+            c += 1
+        gpio[2] = row
+        r += 1
+    # Back to idle: every row low so any key pulls its column down
+    gpio[3] = all_rows
+    return mask
@@ -1,31 +1,361 @@
 import time
-import machine 
+import machine
 from machine import Pin
 import array
 
-# Keypad configuration for a 3x4 matrix
-cols = [Pin(x, Pin.IN, Pin.PULL_UP) for x in (22, 15, 20)]  # MicroPython pin numbers
-rows = [Pin(x, Pin.OUT) for x in (23, 18, 19, 21)]
+from Debouncer import Debouncer, EVENT_RELEASE, EVENT_REPEAT, EVENT_CHORD, EVENT_INDEX_MASK
+
+# Keypad configuration for a 3x4 matrix, MicroPython pin numbers
+DEFAULT_COL_PINS = (22, 15, 20)
+DEFAULT_ROW_PINS = (23, 18, 19, 21)
 
 # Define the key map (rows x columns)
 keys = ((1, 2, 3), (4, 5, 6), (7, 8, 9), ('*', 0, '#'))
 
+# ESP32-C6 GPIO registers used by the register scan modes, see the Technical
+# Reference Manual, GPIO chapter
+GPIO_BASE = 0x60091000
+GPIO_OUT_W1TS = 0x0008  # Write 1 to set output bits
+GPIO_OUT_W1TC = 0x000C  # Write 1 to clear output bits
+GPIO_IN = 0x003C        # Input level of GPIO 0-31
+
+# Scan modes: Pin objects (any chip), mem32 register access or the native
+# routine in GpioScan (ESP32-C6 only); "auto" picks the fastest available
+SCAN_MODES = ("pin", "mem32", "viper")
+
+# Event codes in the ring: key index (row * columns + column) with the
+# Debouncer EVENT_* flags, EVENT_CHORD codes carry the chord index instead
+NO_EVENT = -1
+
+class Keypad:
+    """
+    Interrupt driven 3x4 matrix keypad
+
+    While idle all rows are driven low and every column has a pin change
+    interrupt, so nothing is scanned until a key moves. From then on
+    service() samples the matrix every sample_ms and feeds the samples to a
+    Debouncer, until every key is released and settled again. The press,
+    release, repeat and chord events go into a fixed ring buffer. Consumers
+    read the events with get_event(), or the debounced state with is_held()
+    and pressed_keys().
+
+    service() runs from one place only: the effects timer when it runs, else
+    the main loop. The ring is single producer, single consumer: service()
+    only moves ring_head, get_event() and clear_events() only move ring_tail,
+    so neither side has a read-modify-write of shared state.
+    """
+
+    def __init__(self, row_pins=DEFAULT_ROW_PINS, col_pins=DEFAULT_COL_PINS, keymap=keys,
+                 ring_size=16, sample_ms=5, press_samples=2, release_samples=3,
+                 scan_mode="auto"):
+        """
+        Initialize the keypad
+
+        Args:
+            row_pins: GPIO numbers of the row lines (driven)
+            col_pins: GPIO numbers of the column lines (read, pulled up)
+            keymap: Key per row and column
+            ring_size: Number of events the ring holds before dropping new ones
+            sample_ms: Minimum time between two samples of the matrix
+            press_samples: Samples a key must read down before it is pressed
+            release_samples: Samples a key must read up before it is released
+            scan_mode: One of SCAN_MODES, or "auto"
+        """
+        self.rows = [Pin(x, Pin.OUT, value=0) for x in row_pins]
+        self.cols = [Pin(x, Pin.IN, Pin.PULL_UP) for x in col_pins]
+        self.num_cols = len(self.cols)
+        self.keymap = [key for row in keymap for key in row]
+        self.sample_ms = sample_ms
+
+        # Debounced state, one bit per key index
+        self.state = 0
+        self.debouncer = Debouncer(len(self.keymap), self._push, press_samples, release_samples)
+
+        # Event ring, one slot stays free to tell full from empty. ring_head is
+        # the next slot service() writes, ring_tail the next one get_event() reads
+        self.ring = bytearray(ring_size + 1)
+        self.ring_head = 0
+        self.ring_tail = 0
+        self.dropped_events = 0
+
+        # Set by the pin interrupt, cleared by service()
+        self.pending = True
+        self.last_sample = time.ticks_ms()
+        self.scanning = False
+        self.scan_count = 0
+        # Set while a timer calls service(), then nothing else may
+        self.timer_driven = False
+
+        # Register scan data, GPIO bits of the rows and columns
+        self.row_masks = array.array('I', [1 << x for x in row_pins])
+        self.col_masks = array.array('I', [1 << x for x in col_pins])
+        self.all_rows = 0
+        for bit in self.row_masks:
+            self.all_rows |= bit
+        self.set_scan_mode(scan_mode, tuple(row_pins) + tuple(col_pins))
+
+        self.irq_enabled = False
+        try:
+            for col in self.cols:
+                col.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self._on_edge)
+            self.irq_enabled = True
+        except Exception as e:
+            print(f"Keypad interrupts unavailable, polling instead: {e}")
+
+    def set_scan_mode(self, scan_mode, pins=None):
+        """
+        Choose how scan() reads the matrix
+
+        The register modes set and clear the rows with single writes and read
+        all columns with one load per row, instead of a Pin call per row
+        and key. They need an ESP32-C6 and every pin below 32.
+
+        Args:
+            scan_mode: One of SCAN_MODES, or "auto" for the fastest one available
+            pins: GPIO numbers of all rows and columns, to check the register modes
+
+        Returns:
+            The scan mode in use
+        """
+        registers_ok = _is_esp32c6()
+        if pins is not None:
+            registers_ok = registers_ok and max(pins) < 32
+
+        if scan_mode == "auto":
+            modes = ("viper", "mem32", "pin")
+        else:
+            if scan_mode not in SCAN_MODES:
+                raise ValueError(f"Unknown keypad scan mode: {scan_mode}")
+            modes = (scan_mode, "pin")
+
+        for mode in modes:
+            if mode == "viper" and registers_ok:
+                try:
+                    from GpioScan import scan_matrix
+                except (ImportError, SyntaxError) as e:
+                    print(f"Keypad viper scan unavailable: {e}")
+                    continue
+                self._scan_viper_fn = scan_matrix
+                self._scan_fn = self._scan_viper
+            elif mode == "mem32" and registers_ok:
+                self._scan_fn = self._scan_mem32
+            elif mode == "pin":
+                self._scan_fn = self._scan_pins
+            else:
+                print(f"Keypad {mode} scan needs an ESP32-C6 and pins below 32")
+                continue
+            self.scan_mode = mode
+            return mode
+
+    def key_mask(self, key_list):
+        """Get the bit mask of a list of keys"""
+        mask = 0
+        for key in key_list:
+            mask |= 1 << self.keymap.index(key)
+        return mask
+
+    def set_repeat(self, key_list, delay_ms=600, repeat_ms=150):
+        """
+        Let keys auto-repeat while held
+
+        Args:
+            key_list: Keys that repeat, the others never do
+            delay_ms: Time a key is held before it starts repeating
+            repeat_ms: Time between repeats
+        """
+        self.debouncer.repeat_mask = self.key_mask(key_list)
+        self.debouncer.repeat_delay_ms = delay_ms
+        self.debouncer.repeat_ms = repeat_ms
+
+    def add_chord(self, key_list):
+        """
+        Register keys that are reported as one EVENT_CHORD event when held together
+
+        Returns:
+            The chord index carried by its events
+        """
+        return self.debouncer.add_chord(self.key_mask(key_list))
+
+    def _on_edge(self, pin):
+        """Column pin change interrupt, must not allocate"""
+        if not self.scanning:
+            self.pending = True
+
+    def scan(self):
+        """
+        Scan the whole matrix once, leaving the rows in the idle state
+
+        Returns:
+            Bit mask of the keys that are down
+        """
+        self.scanning = True
+        mask = self._scan_fn()
+        self.scanning = False
+        self.scan_count += 1
+        return mask
+
+    def _scan_pins(self):
+        """Scan through the Pin objects"""
+        rows = self.rows
+        cols = self.cols
+        for row in rows:
+            row.value(1)
+        mask = 0
+        bit = 1
+        for row in rows:
+            row.value(0)  # Drive the row low (active)
+            for col in cols:
+                if col.value() == 0:  # If the column is low, the key is pressed
+                    mask |= bit
+                bit <<= 1
+            row.value(1)  # Drive the row high (inactive)
+        # Back to idle: every row low so any key pulls its column down
+        for row in rows:
+            row.value(0)
+        return mask
+
+    def _scan_mem32(self):
+        """Scan through the GPIO registers, one write per row edge and one read per row"""
+        mem32 = machine.mem32
+        w1ts = GPIO_BASE + GPIO_OUT_W1TS
+        w1tc = GPIO_BASE + GPIO_OUT_W1TC
+        gpio_in = GPIO_BASE + GPIO_IN
+        col_masks = self.col_masks
+        mem32[w1ts] = self.all_rows
+        mask = 0
+        bit = 1
+        for row in self.row_masks:
+            mem32[w1tc] = row
+            sample = mem32[gpio_in]  # Lets the row settle, like the viper scan
+            sample = mem32[gpio_in]
+            for col in col_masks:
+                if not sample & col:
+                    mask |= bit
+                bit <<= 1
+            mem32[w1ts] = row
+        mem32[w1tc] = self.all_rows
+        return mask
+
+    def _scan_viper(self):
+        """Scan with the native routine from GpioScan"""
+        return self._scan_viper_fn(self.row_masks, len(self.row_masks),
+                                   self.col_masks, len(self.col_masks), self.all_rows)
+
+    def service(self):
+        """
+        Sample the matrix while a key is moving or down, queueing events
+
+        Cheap when nothing happened. Call it from the timer, or from the main
+        loop when there is no timer, never from both.
+
+        Returns:
+            True if the matrix was scanned
+        """
+        if self.scanning:
+            # Called from the timer while the main loop is scanning
+            return False
+        if self.irq_enabled and not self.pending and not self.debouncer.busy():
+            return False
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_sample) < self.sample_ms:
+            return False
+        self.pending = False
+        self.last_sample = now
+
+        self.debouncer.update(self.scan(), now)
+        self.state = self.debouncer.state
+        return True
+
+    def _push(self, code):
+        """Add an event to the ring, dropping it if the ring is full"""
+        head = self.ring_head
+        next_head = (head + 1) % len(self.ring)
+        if next_head == self.ring_tail:
+            self.dropped_events += 1
+            return
+        self.ring[head] = code
+        # Published last, once the slot holds the event
+        self.ring_head = next_head
+
+    def get_event(self):
+        """
+        Take the oldest event from the ring
+
+        Returns:
+            Event code (key index, with EVENT_RELEASE set for a release),
+            or NO_EVENT if the ring is empty
+        """
+        tail = self.ring_tail
+        if tail == self.ring_head:
+            return NO_EVENT
+        code = self.ring[tail]
+        self.ring_tail = (tail + 1) % len(self.ring)
+        return code
+
+    def event_key(self, code):
+        """Get the key of an event code, None for a chord event"""
+        if code & EVENT_CHORD:
+            return None
+        return self.keymap[code & EVENT_INDEX_MASK]
+
+    def clear_events(self):
+        """Drop all queued events"""
+        self.ring_tail = self.ring_head
+
+    def is_held(self, key):
+        """Check whether a key is down, from the debounced state of the last service()"""
+        return bool(self.state & (1 << self.keymap.index(key)))
+
+    def pressed_keys(self):
+        """
+        Get the keys that are down, from the debounced state of the last service()
+
+        Returns:
+            List of keys, like scan_keypad()
+        """
+        pressed = []
+        state = self.state
+        index = 0
+        while state:
+            if state & 1:
+                pressed.append(self.keymap[index])
+            state >>= 1
+            index += 1
+        return pressed
+
+def _is_esp32c6():
+    """Check whether the firmware runs on an ESP32-C6, whose GPIO registers the fast scans use"""
+    try:
+        import os
+        return "ESP32C6" in os.uname().machine.replace("-", "").upper()
+    except Exception:
+        return False
+
+_keypad = None
+
+def get_keypad(row_pins=DEFAULT_ROW_PINS, col_pins=DEFAULT_COL_PINS, scan_mode="auto"):
+    """
+    Get the shared keypad, created with the given pins and scan mode on first use
+
+    Returns:
+        The Keypad instance
+    """
+    global _keypad
+    if _keypad is None:
+        _keypad = Keypad(row_pins, col_pins, scan_mode=scan_mode)
+    return _keypad
+
 # Function to scan the keypad
 def scan_keypad():
-    # Create an empty array to store pressed keys
-    pressed_keys = []
-    
-    for row_num, row in enumerate(rows):
-        row.value(0)  # Drive the row low (active)
-        for col_num, col in enumerate(cols):
-            if col.value() == 0:  # If the column is low, it means the key is pressed
-                pressed_keys.append(keys[row_num][col_num])
-        row.value(1)  # Drive the row high (inactive)
-
-    return pressed_keys
+    """Get the keys currently down, from the shared interrupt driven keypad"""
+    keypad = get_keypad()
+    if not keypad.timer_driven:
+        # Standalone use (calibration, tests): sample here, nothing else does
+        keypad.service()
+    return keypad.pressed_keys()
 
 # while True:
 #     pressed_keys = scan_keypad()
 #     if pressed_keys:
 #         print("Pressed:", pressed_keys)
-#     time.sleep(0.1)     
\ No newline at end of file
+#     time.sleep(0.1)
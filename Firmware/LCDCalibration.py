@@ -0,0 +1,191 @@
+# LCDCalibration.py - Measures the pacing the RGB LCD actually needs
+#
+# The LCD is write-only, so every step shows a test pattern and the operator
+# answers on the keypad: '#' if the top line reads exactly as printed on the
+# serial console, '*' if it is garbled or missing. Each command class is
+# bisected down from the current (known good) gap, and the result is saved to
+# lcd_pacing.json, which RGBLCD loads at boot.
+import time
+import json
+
+from Keypad import scan_keypad
+from RGBLCD import RGBLCD
+
+# Gap resolution of the search and the safety margin added to the result
+RESOLUTION_MS = 2
+MARGIN_PERCENT = 25
+MARGIN_MIN_MS = 2
+
+# Command classes to calibrate, see exercise() for the commands used
+CLASSES = ("clear", "cursor", "color", "other", "text")
+
+# Baud rates tried from fastest to slowest
+BAUD_RATES = (115200, 57600, 38400, 19200)
+
+ANSWER_TIMEOUT_MS = 15000
+
+# Load configuration for pins
+def load_config(config_file_path="config.json"):
+    try:
+        with open(config_file_path, 'r') as f:
+            config = json.load(f)
+            print("Loaded configuration")
+            return config
+    except Exception as e:
+        print(f"Error loading config: {e}")
+        return {
+            "pins": {
+                "LCD_TX": 5
+            }
+        }
+
+def wait_answer(timeout_ms=ANSWER_TIMEOUT_MS):
+    """
+    Wait for the operator to press '#' (good) or '*' (bad)
+
+    Returns:
+        True for '#', False for '*' or no answer before the timeout
+    """
+    start = time.ticks_ms()
+    while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+        keys = scan_keypad()
+        if '#' in keys or '*' in keys:
+            answer = '#' in keys
+            # Wait for release so one press is one answer
+            while scan_keypad():
+                time.sleep_ms(20)
+            return answer
+        time.sleep_ms(20)
+    return False
+
+def exercise(lcd, cls, label):
+    """
+    Send a burst of commands of one class ending with label on the top line
+
+    Args:
+        lcd: RGBLCD instance
+        cls: Command class being tested
+        label: Text the top line must show afterwards
+    """
+    for i in range(8):
+        if cls == "clear":
+            lcd.clear()
+            lcd.print("x" * 16)
+            lcd.home()
+        elif cls == "cursor":
+            lcd.set_cursor(1 + (i * 5) % 16, 1 + i % 2)
+            lcd.print("%d" % i)
+        elif cls == "color":
+            lcd.set_rgb_color(255 if i % 2 else 0, 128, 255 if i % 2 else 0)
+        elif cls == "other":
+            lcd.autoscroll_off()
+            lcd.autoscroll_on()
+        else:
+            lcd.invalidate()
+            lcd.render("%016d" % i, "%016d" % (i * 7))
+
+    # Final pattern: the label on the top line, written with the gap under test
+    lcd.clear()
+    lcd.print(label)
+    lcd.set_rgb_color(255, 255, 255)
+    lcd.flush()
+
+def prompt(lcd, safe_pacing, text):
+    """Write the question on the bottom line with known good pacing"""
+    tested = dict(lcd.pacing)
+    lcd.set_pacing(safe_pacing)
+    lcd.print_at(text, 1, 2)
+    lcd.flush()
+    lcd.set_pacing(tested)
+
+def calibrate_class(lcd, cls, safe_pacing):
+    """
+    Bisect the smallest gap for one command class that the operator accepts
+
+    Returns:
+        The gap in ms including the safety margin
+    """
+    good = max(safe_pacing[cls], RESOLUTION_MS)
+    bad = -1
+    while good - bad > RESOLUTION_MS:
+        gap = (good + bad + 1) // 2
+        lcd.set_pacing({cls: gap})
+        label = "%-6s %4dms" % (cls, gap)
+        print(f"Testing {cls} with {gap}ms, top line must read '{label}'")
+        exercise(lcd, cls, label)
+        prompt(lcd, safe_pacing, "#=good *=bad")
+        if wait_answer():
+            good = gap
+        else:
+            bad = gap
+
+    result = good + max(MARGIN_MIN_MS, good * MARGIN_PERCENT // 100)
+    lcd.set_pacing({cls: result})
+    print(f"Calibrated {cls}: {good}ms measured, {result}ms with margin")
+    return result
+
+def calibrate_baud(lcd, safe_pacing):
+    """
+    Try faster baud rates, falling back to the current one on a bad answer
+
+    Returns:
+        The baud rate in use afterwards
+    """
+    start_baud = lcd.baud_rate
+    for baud in BAUD_RATES:
+        if baud <= start_baud:
+            break
+        print(f"Trying {baud} baud")
+        lcd.set_baud_rate(baud)
+        label = "baud %d" % baud
+        exercise(lcd, "text", label)
+        prompt(lcd, safe_pacing, "#=good *=bad")
+        if wait_answer():
+            print(f"Display accepted {baud} baud")
+            return baud
+        # Not readable: if the display did switch it hears this at the new
+        # rate, if it did not it is still at the old one anyway
+        lcd.set_baud_rate(start_baud)
+        lcd.clear()
+    return lcd.baud_rate
+
+def main(try_baud=False):
+    """
+    Run the calibration
+
+    Args:
+        try_baud: Also try switching the display to a faster baud rate
+    """
+    print("Starting LCD pacing calibration")
+    config = load_config()
+    lcd_tx_pin = config["pins"].get("LCD_TX", 5)
+    lcd = RGBLCD(uart_id=1, tx_pin=lcd_tx_pin, baud_rate=9600, cols=16, rows=2)
+    lcd.flush()
+
+    # Known good pacing, used for the prompts and as the search start
+    safe_pacing = dict(lcd.pacing)
+    # Baud rate lcd_pacing.json holds, the display has to be back at it unless saved
+    start_baud = lcd.baud_rate
+
+    try:
+        if try_baud:
+            calibrate_baud(lcd, safe_pacing)
+        for cls in CLASSES:
+            calibrate_class(lcd, cls, safe_pacing)
+
+        # The init sequence uses the slowest measured class
+        lcd.pacing["init"] = max(lcd.pacing[cls] for cls in CLASSES)
+        lcd.save_pacing()
+        lcd.render("Calibration done", "Saved")
+        lcd.flush()
+    except KeyboardInterrupt:
+        print("Calibration aborted, pacing not saved")
+        if lcd.baud_rate != start_baud:
+            # The display keeps the faster rate in its EEPROM, switch it back
+            # so it matches the rate the next boot loads
+            print(f"Switching the display back to {start_baud} baud")
+            lcd.set_baud_rate(start_baud)
+            lcd.flush()
+
+if __name__ == "__main__":
+    main()
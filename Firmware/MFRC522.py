@@ -1,9 +1,52 @@
+import time
+from array import array
+
+
 class MFRC522:
 
 	OK = 0
 	NOTAGERR = 1
 	ERR = 2
 
+	# Indices into the read-quality counter array
+	STAT_REQA = 0
+	STAT_REQA_OK = 1
+	STAT_TRANSCEIVE = 2
+	STAT_TIMEOUT = 3
+	STAT_NOTAG = 4
+	STAT_CRC_ERR = 5
+	STAT_COLL_ERR = 6
+	STAT_PARITY_ERR = 7
+	STAT_PROTO_ERR = 8
+	STAT_OVERFLOW_ERR = 9
+	STAT_BCC_ERR = 10
+	STAT_COUNT = 11
+
+	STAT_NAMES = (
+		"reqa", "reqa_ok", "transceive", "timeout", "no_tag", "crc_err",
+		"coll_err", "parity_err", "proto_err", "overflow_err", "bcc_err",
+	)
+
+	# Histogram of received bytes per transceive: one bucket per count from 0
+	# to 17, the last one for 18 or more (a block read is 16 bytes + CRC)
+	BYTES_BUCKETS = 19
+
+	# Result of the bounded register wait
+	WAIT_OK = 0
+	WAIT_TIMEOUT = 1
+	WAIT_ERROR = 2
+
+	# Chip timer: f = 13.56 MHz / (2 * prescaler + 1), expires after reload + 1 ticks
+	T_PRESCALER = 0xD3E
+	T_RELOAD = 30
+	TIMER_US = ((T_RELOAD + 1) * (2 * T_PRESCALER + 1) * 1000) // 13560
+
+	# Software backstop on top of the chip timer, and the poll backoff range
+	WAIT_MARGIN_US = 5000
+	CRC_TIMEOUT_US = 2000
+	BACKOFF_MIN_US = 20
+	BACKOFF_MAX_US = 1000
+
 	REQIDL = 0x26
 	REQALL = 0x52
 	AUTHENT1A = 0x60
@@ -13,25 +56,51 @@ class MFRC522:
 
 		self.spi = spi
 		self.cs = cs
+
+		# Fixed-size read-quality statistics, see get_stats()
+		self.stats = array('L', [0] * self.STAT_COUNT)
+		self.bytes_hist = array('L', [0] * self.BYTES_BUCKETS)
+		self.last_reqa_us = 0
+		self.last_reqa_interval_us = 0
+		self.interval_min_us = 0
+		self.interval_max_us = 0
+		self.jitter_sum_us = 0
+		self.jitter_max_us = 0
+		self.jitter_count = 0
+		self.wait_max_us = 0
+
+		# Preallocated SPI and receive buffers
+		self._wbuf = bytearray(2)
+		self._rbuf = bytearray(1)
+		self._cmd_buf = bytearray(2)
+		self.recv_buf = bytearray(16)
+		self.recv_len = 0
+		self.recv_bits = 0
+		self.irq_val = 0
+
 		self.cs.value(1)
 		self.spi.init()
 		self.init()
 
 	def _wreg(self, reg, val):
 
+		buf = self._wbuf
+		buf[0] = (reg << 1) & 0x7e
+		buf[1] = val & 0xff
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & ((reg << 1) & 0x7e)))
-		self.spi.write(b'%c' % int(0xff & val))
+		self.spi.write(buf)
 		self.cs.value(1)
 
 	def _rreg(self, reg):
 
+		buf = self._rbuf
+		buf[0] = ((reg << 1) & 0x7e) | 0x80
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & (((reg << 1) & 0x7e) | 0x80)))
-		val = self.spi.read(1)
+		self.spi.write(buf)
+		self.spi.readinto(buf)
 		self.cs.value(1)
 
-		return val[0]
+		return buf[0]
 
 	def _sflags(self, reg, mask):
 		self._wreg(reg, self._rreg(reg) | mask)
@@ -41,8 +110,18 @@ class MFRC522:
 
 	def _tocard(self, cmd, send):
 
+		stat = self._transceive(cmd, send, len(send))
 		recv = []
-		bits = irq_en = wait_irq = n = 0
+		for i in range(self.recv_len):
+			recv.append(self.recv_buf[i])
+		return stat, recv, self.recv_bits
+
+	def _transceive(self, cmd, send, nsend):
+
+		# Same as _tocard, but the answer is left in recv_buf / recv_len /
+		# recv_bits so polling does not allocate a list and tuple per call
+		self.recv_len = 0
+		self.recv_bits = bits = irq_en = wait_irq = 0
 		stat = self.ERR
 
 		if cmd == 0x0E:
@@ -57,28 +136,32 @@ class MFRC522:
 		self._sflags(0x0A, 0x80)
 		self._wreg(0x01, 0x00)
 
-		for c in send:
-			self._wreg(0x09, c)
+		for i in range(nsend):
+			self._wreg(0x09, send[i])
 		self._wreg(0x01, cmd)
 
 		if cmd == 0x0C:
 			self._sflags(0x0D, 0x80)
 
-		i = 2000
-		while True:
-			n = self._rreg(0x04)
-			i -= 1
-			if ~((i != 0) and ~(n & 0x01) and ~(n & wait_irq)):
-				break
+		# The chip timer (TimerIRq, bit 0) starts at the end of transmission
+		# and bounds the wait for the card, the deadline only catches a dead chip
+		result = self._wait_irq(0x04, wait_irq | 0x01, self.TIMER_US + self.WAIT_MARGIN_US)
+		n = self.irq_val
 
 		self._cflags(0x0D, 0x80)
 
-		if i:
-			if (self._rreg(0x06) & 0x1B) == 0x00:
+		stats = self.stats
+		if cmd == 0x0C:
+			stats[self.STAT_TRANSCEIVE] += 1
+
+		if result == self.WAIT_OK:
+			err = self._rreg(0x06)
+			if (err & 0x1B) == 0x00:
 				stat = self.OK
 
 				if n & irq_en & 0x01:
 					stat = self.NOTAGERR
+					stats[self.STAT_NOTAG] += 1
 				elif cmd == 0x0C:
 					n = self._rreg(0x0A)
 					lbits = self._rreg(0x0C) & 0x07
@@ -87,17 +170,96 @@ class MFRC522:
 					else:
 						bits = n * 8
 
+					# n is the FIFO level here, the bytes the card sent
+					self.bytes_hist[min(n, self.BYTES_BUCKETS - 1)] += 1
+
 					if n == 0:
 						n = 1
 					elif n > 16:
 						n = 16
 
-					for _ in range(n):
-						recv.append(self._rreg(0x09))
+					recv = self.recv_buf
+					for i in range(n):
+						recv[i] = self._rreg(0x09)
+					self.recv_len = n
+					self.recv_bits = bits
 			else:
 				stat = self.ERR
+				self._count_errors(err)
+
+			# The CRC error bit is not part of the fatal mask above
+			if err & 0x04:
+				stats[self.STAT_CRC_ERR] += 1
+		else:
+			# Abort the pending command so the chip is idle for the next one
+			self._wreg(0x01, 0x00)
+			stats[self.STAT_TIMEOUT] += 1
 
-		return stat, recv, bits
+		return stat
+
+	def _wait_irq(self, reg, mask, timeout_us):
+
+		# Poll reg until any bit of mask is set, backing off exponentially
+		# between reads so a slow card does not cost a read per microsecond.
+		# The last register value is left in irq_val
+		start = time.ticks_us()
+		deadline = time.ticks_add(start, timeout_us)
+		delay = self.BACKOFF_MIN_US
+		result = self.WAIT_TIMEOUT
+		self.irq_val = 0
+
+		while True:
+			try:
+				self.irq_val = self._rreg(reg)
+			except OSError:
+				result = self.WAIT_ERROR
+				break
+			if self.irq_val & mask:
+				result = self.WAIT_OK
+				break
+			now = time.ticks_us()
+			if time.ticks_diff(deadline, now) <= 0:
+				break
+			time.sleep_us(min(delay, time.ticks_diff(deadline, now)))
+			if delay < self.BACKOFF_MAX_US:
+				delay <<= 1
+
+		waited = time.ticks_diff(time.ticks_us(), start)
+		if waited > self.wait_max_us:
+			self.wait_max_us = waited
+
+		return result
+
+	def _count_errors(self, err):
+
+		stats = self.stats
+		if err & 0x01:
+			stats[self.STAT_PROTO_ERR] += 1
+		if err & 0x02:
+			stats[self.STAT_PARITY_ERR] += 1
+		if err & 0x08:
+			stats[self.STAT_COLL_ERR] += 1
+		if err & 0x10:
+			stats[self.STAT_OVERFLOW_ERR] += 1
+
+	def _track_interval(self):
+
+		now = time.ticks_us()
+		if self.last_reqa_us:
+			interval = time.ticks_diff(now, self.last_reqa_us)
+			if self.interval_min_us == 0 or interval < self.interval_min_us:
+				self.interval_min_us = interval
+			if interval > self.interval_max_us:
+				self.interval_max_us = interval
+
+			if self.last_reqa_interval_us:
+				jitter = abs(interval - self.last_reqa_interval_us)
+				self.jitter_sum_us += jitter
+				self.jitter_count += 1
+				if jitter > self.jitter_max_us:
+					self.jitter_max_us = jitter
+			self.last_reqa_interval_us = interval
+		self.last_reqa_us = now
 
 	def _crc(self, data):
 
@@ -109,22 +271,20 @@ class MFRC522:
 
 		self._wreg(0x01, 0x03)
 
-		i = 0xFF
-		while True:
-			n = self._rreg(0x05)
-			i -= 1
-			if not ((i != 0) and not (n & 0x04)):
-				break
+		result = self._wait_irq(0x05, 0x04, self.CRC_TIMEOUT_US)
+		if result != self.WAIT_OK:
+			self._wreg(0x01, 0x00)
+			self.stats[self.STAT_TIMEOUT] += 1
 
 		return [self._rreg(0x22), self._rreg(0x21)]
 
 	def init(self):
 
 		self.reset()
-		self._wreg(0x2A, 0x8D)
-		self._wreg(0x2B, 0x3E)
-		self._wreg(0x2D, 30)
-		self._wreg(0x2C, 0)
+		self._wreg(0x2A, 0x80 | (self.T_PRESCALER >> 8))
+		self._wreg(0x2B, self.T_PRESCALER & 0xFF)
+		self._wreg(0x2D, self.T_RELOAD & 0xFF)
+		self._wreg(0x2C, self.T_RELOAD >> 8)
 		self._wreg(0x15, 0x40)
 		self._wreg(0x11, 0x3D)
 		self.antenna_on()
@@ -141,32 +301,69 @@ class MFRC522:
 
 	def request(self, mode):
 
+		stat = self._request(mode)
+		return stat, self.recv_bits
+
+	def _request(self, mode):
+
+		self.stats[self.STAT_REQA] += 1
+		self._track_interval()
+
 		self._wreg(0x0D, 0x07)
-		(stat, recv, bits) = self._tocard(0x0C, [mode])
+		self._cmd_buf[0] = mode
+		stat = self._transceive(0x0C, self._cmd_buf, 1)
 
-		if (stat != self.OK) | (bits != 0x10):
+		if (stat != self.OK) | (self.recv_bits != 0x10):
 			stat = self.ERR
+		else:
+			self.stats[self.STAT_REQA_OK] += 1
 
-		return stat, bits
+		return stat
 
 	def anticoll(self):
 
+		stat = self._anticoll()
+		recv = []
+		for i in range(self.recv_len):
+			recv.append(self.recv_buf[i])
+		return stat, recv
+
+	def _anticoll(self):
+
 		ser_chk = 0
-		ser = [0x93, 0x20]
+		buf = self._cmd_buf
+		buf[0] = 0x93
+		buf[1] = 0x20
 
 		self._wreg(0x0D, 0x00)
-		(stat, recv, bits) = self._tocard(0x0C, ser)
+		stat = self._transceive(0x0C, buf, 2)
 
 		if stat == self.OK:
-			if len(recv) == 5:
+			recv = self.recv_buf
+			if self.recv_len == 5:
 				for i in range(4):
 					ser_chk = ser_chk ^ recv[i]
 				if ser_chk != recv[4]:
 					stat = self.ERR
+					self.stats[self.STAT_BCC_ERR] += 1
 			else:
 				stat = self.ERR
 
-		return stat, recv
+		return stat
+
+	def read_uid_into(self, uid):
+
+		# REQA + anticollision without allocating, the 4 UID bytes are
+		# copied into uid on success
+		if self._request(self.REQIDL) != self.OK:
+			return self.ERR
+		if self._anticoll() != self.OK:
+			return self.ERR
+
+		recv = self.recv_buf
+		for i in range(4):
+			uid[i] = recv[i]
+		return self.OK
 
 	def select_tag(self, ser):
 
@@ -206,3 +403,31 @@ class MFRC522:
 				stat = self.ERR
 
 		return stat
+
+	def get_stats(self):
+
+		stats = {}
+		for i in range(self.STAT_COUNT):
+			stats[self.STAT_NAMES[i]] = self.stats[i]
+		stats["bytes_hist"] = list(self.bytes_hist)
+		stats["interval_min_us"] = self.interval_min_us
+		stats["interval_max_us"] = self.interval_max_us
+		stats["jitter_max_us"] = self.jitter_max_us
+		stats["jitter_avg_us"] = (self.jitter_sum_us // self.jitter_count) if self.jitter_count else 0
+		stats["wait_max_us"] = self.wait_max_us
+		return stats
+
+	def reset_stats(self):
+
+		for i in range(self.STAT_COUNT):
+			self.stats[i] = 0
+		for i in range(self.BYTES_BUCKETS):
+			self.bytes_hist[i] = 0
+		self.last_reqa_us = 0
+		self.last_reqa_interval_us = 0
+		self.interval_min_us = 0
+		self.interval_max_us = 0
+		self.jitter_sum_us = 0
+		self.jitter_max_us = 0
+		self.jitter_count = 0
+		self.wait_max_us = 0
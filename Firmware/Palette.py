@@ -0,0 +1,112 @@
+# Palette.py - Named colors shared by the LCD backlight and the DotStar LEDs
+"""
+One color table for the whole box, built from the "display" section of
+config.json at boot.
+
+For every named color the palette precomputes the complete LCD
+SET_RGB_COLOR command and a complete DotStar frame for the strip, so a
+color change is a dictionary lookup and one write per device.
+
+The config colors are given in the channel order of the LED strip. The LCD
+backlight takes its channels in a different order (the config's
+"auth_color" [255, 0, 0] shows green on the LCD, like the LEDs), which
+LCD_CHANNEL_ORDER maps.
+"""
+
+# LCD command bytes, see RGBLCD
+LCD_CMD_PREFIX = 0xFE
+LCD_SET_RGB_COLOR = 0xD0
+
+class Palette:
+    """
+    Precomputed LCD and LED output for each named color
+    """
+
+    # Colors used when config.json does not define them, including the ones
+    # the firmware uses that are not part of the config
+    DEFAULT_COLORS = {
+        "auth_color": (255, 0, 0),
+        "unauth_color": (0, 0, 255),
+        "sleep_color": (0, 255, 0),
+        "proxy_color": (32, 0, 223),
+        "training_color": (0, 128, 128),
+        "process_color": (255, 0, 255),
+        "admin_mode": (255, 255, 0),
+        "orange": (32, 0, 223),
+        "white": (255, 255, 255),
+        "off": (0, 0, 0),
+    }
+
+    # Config channel index feeding the LCD's red, green and blue
+    LCD_CHANNEL_ORDER = (2, 0, 1)
+
+    def __init__(self, display_settings=None, num_leds=15, brightness=16):
+        """
+        Build the palette
+
+        Args:
+            display_settings: The "display" section of config.json, every
+                entry holding a 3 element list is taken as a color
+            num_leds: Number of LEDs in the DotStar strip
+            brightness: DotStar global brightness (0-31) baked into the frames
+        """
+        self.num_leds = num_leds
+        self.brightness = brightness
+        order = self.LCD_CHANNEL_ORDER
+        if display_settings and "lcd_channel_order" in display_settings:
+            order = tuple(display_settings["lcd_channel_order"])
+        self.lcd_order = order
+
+        colors = dict(self.DEFAULT_COLORS)
+        if display_settings:
+            for name, value in display_settings.items():
+                if name != "lcd_channel_order" and isinstance(value, (list, tuple)) and len(value) == 3:
+                    colors[name] = tuple(value)
+
+        self.colors = {}
+        for name, rgb in colors.items():
+            self.add(name, rgb)
+
+    def add(self, name, rgb):
+        """
+        Add or replace a named color
+
+        Args:
+            name: Color name
+            rgb: Color in config (LED) channel order
+
+        Returns:
+            The palette entry (rgb, LCD command bytes, DotStar frame)
+        """
+        rgb = (max(0, min(255, rgb[0])), max(0, min(255, rgb[1])), max(0, min(255, rgb[2])))
+        order = self.lcd_order
+        lcd_cmd = bytes((LCD_CMD_PREFIX, LCD_SET_RGB_COLOR, rgb[order[0]], rgb[order[1]], rgb[order[2]]))
+        entry = (rgb, lcd_cmd, self.led_frame(rgb))
+        self.colors[name] = entry
+        return entry
+
+    def get(self, name):
+        """
+        Look up a color
+
+        Args:
+            name: Color name
+
+        Returns:
+            The entry (rgb, LCD command bytes, DotStar frame), or None if unknown
+        """
+        return self.colors.get(name)
+
+    def led_frame(self, rgb):
+        """
+        Build a complete DotStar frame with every LED set to one color
+
+        Returns:
+            Start frame, one 4 byte LED frame per LED and the SK9822 end frame
+        """
+        end_frame_length = (self.num_leds // 16) + 1
+        frame = bytearray(4 + 4 * self.num_leds + end_frame_length)
+        led = bytes((0xE0 | self.brightness, rgb[2], rgb[1], rgb[0]))
+        for i in range(self.num_leds):
+            frame[4 + 4 * i:8 + 4 * i] = led
+        return bytes(frame)
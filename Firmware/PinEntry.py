@@ -0,0 +1,187 @@
+# PinEntry.py - Non-blocking PIN entry for PortalBox ESP32
+import time
+
+# Digits in a PIN
+PIN_LENGTH = 4
+
+class PinEntry:
+    """
+    PIN verification as a small state machine stepped by the main loop
+
+    start() shows the prompt and returns at once. Every step() takes the
+    digits queued by the keypad timer, checks the card through the RFID poll
+    scheduler's cached presence and advances the entry; it never sleeps.
+    Messages such as "Incorrect Pin" are phases with their own deadline
+    instead of sleeps, so the main loop, the grace display and the LED and
+    buzzer effects keep running while someone types.
+
+    The whole entry is abandoned when no digit arrives for timeout_ms.
+    """
+
+    # Phases
+    IDLE = 0
+    ENTERING = 1
+    MESSAGE = 2
+
+    def __init__(self, box, display, verifier, attempts=3, timeout_ms=30000):
+        """
+        Initialize PIN entry
+
+        Args:
+            box: The PortalBox, for keypad digits and card presence
+            display: The DisplayController showing the prompts
+            verifier: The PinVerifier holding the cards' PIN hashes
+            attempts: Attempts per card
+            timeout_ms: Time without a digit before the entry is given up
+        """
+        self.box = box
+        self.display = display
+        self.verifier = verifier
+        self.attempts_per_card = attempts
+        self.timeout_ms = timeout_ms
+
+        self.phase = self.IDLE
+        self.card_id = -1
+        self.entered = ""
+        self.attempts = 0
+        self.deadline = 0
+
+        # What follows the message on screen: the phase, and the result if done
+        self.message_until = 0
+        self.after_message = self.IDLE
+        self.result = False
+        self.closing_message = None
+
+    @property
+    def active(self):
+        """True while an entry is in progress, including its closing message"""
+        return self.phase != self.IDLE
+
+    def start(self, card_id):
+        """
+        Begin verifying the PIN of a card
+
+        Args:
+            card_id: The card, its PIN record must be in the verifier
+        """
+        self.entered = ""
+        self.attempts = self.attempts_per_card
+        self.card_id = card_id
+        if not self.verifier.has_pin(card_id):
+            print("No PIN available for this user, denying access")
+            self.display.display_two_line_message("Invalid PIN", "Access Denied", "unauth_color")
+            self._finish_after(1500, False)
+            return
+
+        self.display.display_two_line_message("Please Enter Pin", "Attempts:" + str(self.attempts), "sleep_color")
+        # Digits typed before the prompt do not count
+        self.box.clear_key_presses()
+        self._enter()
+
+    def cancel(self):
+        """Abandon the entry without a message"""
+        self.phase = self.IDLE
+        self.entered = ""
+
+    def step(self):
+        """
+        Advance the entry, call it on every main loop iteration
+
+        Returns:
+            None while the entry is in progress, then True if the PIN was
+            verified or False if it was not (wrong PIN, card removed, timeout)
+        """
+        if self.phase == self.IDLE:
+            return self.result
+
+        now = time.ticks_ms()
+        if self.phase == self.MESSAGE:
+            if time.ticks_diff(now, self.message_until) < 0:
+                return None
+            if self.after_message == self.IDLE:
+                self.phase = self.IDLE
+                if self.closing_message:
+                    self.display.display_message(self.closing_message, "unauth_color")
+                return self.result
+            self.display.display_two_line_message("Pin:", "Attempts:" + str(self.attempts), "sleep_color")
+            self._enter()
+            return None
+
+        # Check for card removal during PIN entry, from the cached presence
+        if self.box.read_RFID_card() == -1:
+            print("Card removed during PIN verification")
+            self.display.display_message("Card Removed", "unauth_color")
+            self._finish_after(1000, False)
+            return None
+
+        if time.ticks_diff(now, self.deadline) >= 0:
+            print("PIN entry timed out")
+            self.display.display_two_line_message("PIN Timeout", "Access Denied", "unauth_color")
+            self._finish_after(1500, False)
+            return None
+
+        # Take the digits queued since the last step, each press counts once
+        typed = False
+        while len(self.entered) < PIN_LENGTH:
+            key = self.box.get_key_press()
+            if key is None:
+                break
+            self.entered += str(key)
+            typed = True
+        if not typed:
+            return None
+
+        self.deadline = time.ticks_add(now, self.timeout_ms)
+        if len(self.entered) < PIN_LENGTH:
+            # Display PIN with masking
+            self.display.display_two_line_message(
+                "Pin:" + "*" * len(self.entered),
+                "Attempts:" + str(self.attempts),
+                "sleep_color"
+            )
+            return None
+
+        self._check()
+        return None
+
+    def _check(self):
+        """Compare a complete PIN and move on to the matching message"""
+        entered = self.entered
+        self.entered = ""
+        # Checked against the local hash, no network round trip
+        if self.verifier.verify(self.card_id, entered):
+            print("PIN verified successfully")
+            self.display.display_message("PIN Correct", "auth_color")
+            self._finish_after(500, True)
+            return
+
+        self.attempts -= 1
+        self.display.display_message("Incorrect Pin", "unauth_color")
+        if self.attempts > 0:
+            self._show_message(500, self.ENTERING)
+        else:
+            self._finish_after(1000, False, "Please Retry!")
+
+    def _enter(self):
+        """Wait for digits, with a fresh timeout"""
+        self.phase = self.ENTERING
+        self.deadline = time.ticks_add(time.ticks_ms(), self.timeout_ms)
+
+    def _show_message(self, duration_ms, then):
+        """Keep the current message up for duration_ms, then go to phase then"""
+        self.phase = self.MESSAGE
+        self.after_message = then
+        self.message_until = time.ticks_add(time.ticks_ms(), duration_ms)
+
+    def _finish_after(self, duration_ms, result, closing_message=None):
+        """
+        End the entry with result once the current message has been shown
+
+        Args:
+            duration_ms: Time the current message stays up
+            result: The result step() returns at the end
+            closing_message: Message left on screen at the end (optional)
+        """
+        self.result = result
+        self.closing_message = closing_message
+        self._show_message(duration_ms, self.IDLE)
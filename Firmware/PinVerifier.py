@@ -0,0 +1,186 @@
+# PinVerifier.py - Local PIN verification for PortalBox ESP32
+"""
+Salted, iterated PIN hashes of recently seen cards, kept in flash.
+
+A PIN is never stored or compared in plaintext. Its record is a random salt,
+an iteration count and the digest
+
+    digest = sha256(salt + pin)
+    repeated iterations - 1 times: digest = sha256(digest + salt)
+
+The backend may deliver records in this form itself ("pin_salt",
+"pin_iterations" and "pin_hash" as hex, see Database.get_card_details), otherwise
+the box hashes the plaintext PIN from the card lookup once and forgets it.
+Verification then needs no network round trip, and the digests are compared
+in constant time.
+"""
+
+import binascii
+import hashlib
+import json
+import os
+
+# Flash file holding the records
+PIN_STORE_FILE = "pins.json"
+
+class PinVerifier:
+    """
+    Flash-backed store of PIN hashes for the most recently seen cards
+    """
+
+    SALT_BYTES = 16
+
+    def __init__(self, path=PIN_STORE_FILE, max_cards=32, iterations=1000):
+        """
+        Load the store
+
+        Args:
+            path: JSON file holding the records
+            max_cards: Records kept, the least recently seen cards are dropped
+            iterations: Hash iterations for PINs hashed on the box
+        """
+        self.path = path
+        self.max_cards = max_cards
+        self.iterations = iterations
+
+        # card id (str) -> [salt hex, iterations, digest hex, last seen]
+        self.records = {}
+        self.seen_counter = 0
+        self.load()
+
+    def load(self):
+        """Read the records from flash, starting empty if there are none"""
+        try:
+            with open(self.path, 'r') as f:
+                self.records = json.load(f)
+            for record in self.records.values():
+                self.seen_counter = max(self.seen_counter, record[3])
+            print(f"Loaded {len(self.records)} PIN records from {self.path}")
+        except (OSError, ValueError, IndexError, TypeError):
+            self.records = {}
+
+    def save(self):
+        """Write the records to flash, replacing the old file in one step"""
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(self.records, f)
+            os.rename(temp_path, self.path)
+        except OSError as e:
+            print(f"Error saving PIN records: {e}")
+
+    def has_pin(self, card_id):
+        """Check whether a card has a PIN record"""
+        return str(card_id) in self.records
+
+    def remember(self, card_id, details):
+        """
+        Store the PIN of a card from its card details, removing the plaintext
+
+        Args:
+            card_id: The card id
+            details: Dictionary from Database.get_card_details, its "pin"
+                entry is removed
+
+        Returns:
+            True if the card has a PIN record
+        """
+        key = str(card_id)
+        pin = details.pop("pin", None)
+        delivered = details.get("pin_hash")
+
+        if delivered:
+            record = [delivered[0], delivered[1], delivered[2], 0]
+        elif pin is None or card_id <= 0:
+            # The backend could not be reached, keep any record we have
+            return key in self.records
+        elif pin == -1:
+            # The backend has no PIN for the card, a revoked PIN must stop working
+            self.forget(card_id)
+            return False
+        else:
+            pin = str(pin)
+            record = self.records.get(key)
+            if record and self.verify(card_id, pin):
+                # Unchanged PIN, no flash write
+                self._touch(record)
+                return True
+            salt = os.urandom(self.SALT_BYTES)
+            digest = self.hash_pin(pin, salt, self.iterations)
+            record = [binascii.hexlify(salt).decode(), self.iterations,
+                      binascii.hexlify(digest).decode(), 0]
+
+        old = self.records.get(key)
+        if old and old[:3] == record[:3]:
+            self._touch(old)
+            return True
+        self._touch(record)
+        self.records[key] = record
+        self._evict()
+        self.save()
+        return True
+
+    def forget(self, card_id):
+        """Drop the record of a card"""
+        if self.records.pop(str(card_id), None) is not None:
+            self.save()
+
+    def verify(self, card_id, pin):
+        """
+        Check a PIN against the card's record
+
+        Args:
+            card_id: The card id
+            pin: The entered PIN
+
+        Returns:
+            True if the PIN matches, False if not or the card has no record
+        """
+        record = self.records.get(str(card_id))
+        if not record:
+            return False
+        try:
+            salt = binascii.unhexlify(record[0])
+            expected = binascii.unhexlify(record[2])
+        except ValueError:
+            print(f"Corrupt PIN record for card {card_id}")
+            return False
+        digest = self.hash_pin(str(pin), salt, record[1])
+        return self.digests_equal(digest, expected)
+
+    @staticmethod
+    def hash_pin(pin, salt, iterations):
+        """
+        Salted, iterated SHA-256 of a PIN
+
+        Returns:
+            The 32 byte digest
+        """
+        digest = hashlib.sha256(salt + pin.encode()).digest()
+        for _ in range(iterations - 1):
+            digest = hashlib.sha256(digest + salt).digest()
+        return digest
+
+    @staticmethod
+    def digests_equal(a, b):
+        """Compare two digests in time independent of where they differ"""
+        if len(a) != len(b):
+            return False
+        diff = 0
+        for i in range(len(a)):
+            diff |= a[i] ^ b[i]
+        return diff == 0
+
+    def _touch(self, record):
+        """Mark a record as just seen"""
+        self.seen_counter += 1
+        record[3] = self.seen_counter
+
+    def _evict(self):
+        """Drop the least recently seen records beyond max_cards"""
+        while len(self.records) > self.max_cards:
+            oldest = None
+            for key, record in self.records.items():
+                if oldest is None or record[3] < self.records[oldest][3]:
+                    oldest = key
+            del self.records[oldest]
@@ -1,15 +1,19 @@
 # PortalBox.py for MicroPython on ESP32
 # Hardware abstraction layer for managing peripherals
 
-from machine import Pin, SoftSPI, I2C # type: ignore
+from machine import Pin, SoftSPI, I2C, Timer # type: ignore
 import time
 
 # Import local modules
-from Keypad import scan_keypad  # Use existing Keypad module
+from Keypad import get_keypad, NO_EVENT
+from Debouncer import Debouncer, EVENT_RELEASE, EVENT_CHORD
 from RGBLCD import RGBLCD
 from BuzzerController import BuzzerController
 from MFRC522 import MFRC522
 from DotstarController import DotStar
+from RFIDPollScheduler import RFIDPollScheduler
+from Palette import Palette
+from BootSequence import get_boot_sequence
 
 # Default pin definitions for ESP32 (will be overridden by config.json if present)
 DEFAULT_PIN_CONFIG = {
@@ -33,23 +37,42 @@ DEFAULT_PIN_CONFIG = {
     "KEYPAD_7": 18
 }
 
-# Define colors for LCD Screen
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
-MAGENTA = (255, 0, 255)
-CYAN = (0, 255, 255)
-WHITE = (255, 255, 255)
-LIGHTPURPLE=(204, 153, 255)
-ORANGE= (223, 32, 0)
-PURPLE= (128, 0, 128)
+def check_reader_config(readers):
+    """
+    Reject "rfid_readers" lists the firmware cannot serve
+
+    The FSM runs one piece of equipment, on reader 0. Besides it a box can
+    have one enrollment reader for certification mode; any other reader would
+    be polled with nobody acting on its cards.
+
+    Raises:
+        ValueError: With the reason, for a list with more than one equipment reader
+    """
+    if not readers:
+        raise ValueError("rfid_readers: at least one reader is required")
+    if readers[0].get("role") == "enroll":
+        raise ValueError("rfid_readers: reader 0 switches the equipment and cannot be the enrollment reader")
+    enroll_readers = 0
+    for index, reader in enumerate(readers[1:], 1):
+        if reader.get("role") == "enroll":
+            enroll_readers += 1
+        else:
+            raise ValueError(f"rfid_readers: reader {index} is a second equipment slot, "
+                             "only reader 0 switches equipment; give it \"role\": \"enroll\" or remove it")
+    if enroll_readers > 1:
+        raise ValueError("rfid_readers: only one reader can have \"role\": \"enroll\"")
 
 class PortalBox:
     '''
     Wrapper to manage peripherals on ESP32
     '''
+    
+    # Period of the timer advancing the buzzer and LED effects
+    EFFECTS_PERIOD_MS = 10
     def __init__(self, settings):
+        # Checkpoints of the init steps go into the boot timeline
+        boot = get_boot_sequence()
+        
         # Store service reference for later user info lookup
         self.service = None
         
@@ -77,13 +100,18 @@ class PortalBox:
         #Initialize the single button if the keypad is disabled
         if not self.keypadEnabled:
             self.singleButton=Pin(self.config["SINGLE_BUTTON"], Pin.IN, Pin.PULL_UP)
+            # Same debounce engine as the keypad, sampled by the effects timer
+            self.button_debouncer = Debouncer(1, self._on_single_button)
         else:
-            # Keypad configuration for a 3x4 matrix
-            self.cols = [Pin(x, Pin.IN, Pin.PULL_UP) for x in (self.config["KEYPAD_3"], self.config["KEYPAD_1"], self.config["KEYPAD_5"])]  # MicroPython pin numbers
-            self.rows = [Pin(x, Pin.OUT) for x in (self.config["KEYPAD_2"], self.config["KEYPAD_7"], self.config["KEYPAD_6"], self.config["KEYPAD_4"])]
-            # Define the key map (rows x columns)
-            self.keyBinds = ((1, 2, 3), (4, 5, 6), (7, 8, 9), ('*', 0, '#'))
+            # Keypad configuration for a 3x4 matrix, shared with Keypad.scan_keypad()
+            self.keypad = get_keypad(
+                row_pins=(self.config["KEYPAD_2"], self.config["KEYPAD_7"], self.config["KEYPAD_6"], self.config["KEYPAD_4"]),
+                col_pins=(self.config["KEYPAD_3"], self.config["KEYPAD_1"], self.config["KEYPAD_5"]),
+                scan_mode=settings["toggles"].get("keypad_scan", "auto"),
+            )
+            print(f"Keypad scan mode: {self.keypad.scan_mode}")
             
+        boot.mark("box_config")
         print("Initializing hardware with configuration:")
         for key, value in self.config.items():
             print(f"  {key}: {value}")
@@ -102,15 +130,39 @@ class PortalBox:
         self.interlock_pin = Pin(self.config["INTERLOCK_PIN"], Pin.OUT)
         self.relay_pin = Pin(self.config["RELAY_PIN"], Pin.OUT)
         
+        # RFID readers and the equipment slot (relay, interlock) each one switches.
+        # Without an "rfid_readers" list in config.json there is a single reader
+        # on RFID_SDA switching RELAY_PIN/INTERLOCK_PIN. A reader with
+        # "role": "enroll" has no equipment and is used by certification mode.
+        self.reader_config = settings.get("rfid_readers") or [{"sda": self.config["RFID_SDA"]}]
+        check_reader_config(self.reader_config)
+        self.equipment_slots = []
+        self.enroll_reader = 0
+        for index, reader in enumerate(self.reader_config):
+            if reader.get("role") == "enroll":
+                self.enroll_reader = index
+                self.equipment_slots.append(None)
+            elif reader.get("relay", self.config["RELAY_PIN"]) == self.config["RELAY_PIN"]:
+                self.equipment_slots.append((self.relay_pin, self.interlock_pin))
+            else:
+                relay = Pin(reader["relay"], Pin.OUT)
+                interlock = Pin(reader["interlock"], Pin.OUT) if "interlock" in reader else None
+                self.equipment_slots.append((relay, interlock))
+        
         # Variables for keypad state tracking
         self.last_key_state = False
-        self.last_keypad_check = time.ticks_ms()
-        self.last_keys_pressed = []
+        # Presses taken from the keypad events: * or # latch the button and
+        # are kept as the last command key, digits wait in key_presses for PIN entry
+        self.button_latch = False
+        self.command_key = None
+        self.key_presses = bytearray(8)
+        self.key_press_count = 0
 
-        # Initialize the LCD with conservative timing
-        self.lcd = RGBLCD(uart_id=1, tx_pin=5, baud_rate=9600, cols=16, rows=2)
+        # Initialize the LCD, its output queue is drained by hardware timer 0
+        self.lcd = RGBLCD(uart_id=1, tx_pin=5, baud_rate=9600, cols=16, rows=2, timer_id=0)
         self.lcd.display_on()
         print("LCD initialized")
+        boot.mark("box_lcd")
         
         # Initialize DotStar LEDs
         self.dotstar = DotStar(
@@ -121,6 +173,12 @@ class PortalBox:
             brightness=16
         )
         print("DotStar LEDs initialized")
+        boot.mark("box_dotstar")
+        
+        # Shared color table for the LCD backlight and the LEDs
+        self.palette = Palette(settings.get("display"), num_leds=15, brightness=16)
+        self.lcd_color = None
+        self.led_color = None
         
         # Initialize buzzer with optional settings
         self.buzzer = BuzzerController(
@@ -129,26 +187,51 @@ class PortalBox:
             enabled=self.buzzer_enabled
         )
         
-        # Predefined buzzer patterns
-        self.BEEP_PATTERNS = {
-            'success': {'freq': 1000, 'duration': 0.2},
-            'error':   {'freq': 500, 'duration': 0.5},
-            'warning': {'freq': 750, 'duration': 0.3},
-            'alert':   {'freq': 900, 'duration': 0.4}
-        }
         print("Buzzer controller initialized, enabled:", self.buzzer_enabled)
+        boot.mark("box_buzzer")
+        
+        # Beeps and LED effects are advanced by hardware timer 1, so they keep
+        # their timing while the main loop blocks on the network or the keypad
+        # The timer is then the only caller of keypad.service()
+        self.effects_timer = None
+        try:
+            if self.keypadEnabled:
+                self.keypad.timer_driven = True
+            self.effects_timer = Timer(1)
+            self.effects_timer.init(period=self.EFFECTS_PERIOD_MS, mode=Timer.PERIODIC, callback=self._timer_effects)
+            print("Effects timer started")
+        except Exception as e:
+            print(f"Effects timer unavailable, effects follow the main loop: {e}")
+            self.effects_timer = None
+            if self.keypadEnabled:
+                self.keypad.timer_driven = False
         
         # Power off equipment
-        self.set_equipment_power_on(False)
+        for slot in range(len(self.equipment_slots)):
+            self.set_equipment_power_on(False, slot)
         
-        # Initialize RFID
-        print("Creating RFID reader")
-        sda = Pin(self.config["RFID_SDA"], Pin.OUT)
+        # Initialize RFID, all readers share the bus and have their own chip select
+        print("Creating RFID readers")
         sck = Pin(self.config["RFID_SCK"], Pin.OUT)
         mosi = Pin(self.config["RFID_MOSI"], Pin.OUT)
         miso = Pin(self.config["RFID_MISO"], Pin.OUT)
         spi = SoftSPI(baudrate=100000, polarity=0, phase=0, sck=sck, mosi=mosi, miso=miso)
-        self.RFIDReader = MFRC522(spi=spi, cs=sda)
+        self.rfid_readers = []
+        for reader in self.reader_config:
+            sda = Pin(reader.get("sda", self.config["RFID_SDA"]), Pin.OUT)
+            self.rfid_readers.append(MFRC522(spi=spi, cs=sda))
+        self.RFIDReader = self.rfid_readers[0]
+        print(f"{len(self.rfid_readers)} RFID reader(s) created, enrollment reader: {self.enroll_reader}")
+        boot.mark("box_rfid")
+        
+        # Card identity buffers, a card that stays on a reader is returned
+        # as the same int without allocating anything
+        self._uid_buf = bytearray(4)
+        self._last_uids = [bytearray(4) for _ in self.rfid_readers]
+        self._last_card_ids = [-1] * len(self.rfid_readers)
+        
+        # All card reads go through the poll scheduler
+        self.rfid_poller = RFIDPollScheduler(self._poll_RFID_card, self.rfid_readers)
         
         # Setup state
         self.sleepMode = False
@@ -159,8 +242,6 @@ class PortalBox:
         # Check if LCD is actually connected
         try:
             self.lcd_print("Portal Box")
-            time.sleep(0.5)
-            self.lcd_print("Initialized")
             print("LCD test successful")
         except Exception as e:
             print(f"LCD test failed: {e}")
@@ -172,11 +253,29 @@ class PortalBox:
     def update(self):
         """
         Update method to be called in main loop
-        Ensures buzzer effects are processed
+        Ensures buzzer effects are processed when the effects timer is not running
         """
-        self.buzzer.update()
+        if self.effects_timer is None:
+            if self.keypadEnabled:
+                self.keypad.service()
+            else:
+                self.button_debouncer.update(self._single_button_down())
+            self.buzzer.update()
+            
+            # If DotStar animations are active, update them
+            if self.dotstar:
+                self.dotstar.update_animations()
         
-        # If DotStar animations are active, update them
+        # Send any LCD output whose pacing gap has passed
+        self.lcd.update()
+    
+    def _timer_effects(self, timer):
+        """Effects timer callback, must not allocate"""
+        if self.keypadEnabled:
+            self.keypad.service()
+        else:
+            self.button_debouncer.update(self._single_button_down())
+        self.buzzer.update()
         if self.dotstar:
             self.dotstar.update_animations()
 
@@ -186,44 +285,35 @@ class PortalBox:
         @param message - string to display
         '''
         try:
-            # Split message into lines if it contains newlines
-            lines = message.split('\n')
-            
-            # Clear the display
-            self.lcd.clear()
-            time.sleep(0.02)  # Short delay after clear
-            
-            # Print first line
-            self.lcd.home()
-            time.sleep(0.02)  # Short delay after home
-            
-            if len(lines) > 0:
-                self.lcd.print(lines[0])
-                time.sleep(0.02)  # Short delay after print
-            
-            # If there's a second line, position cursor and print it
-            if len(lines) > 1:
-                self.lcd.set_cursor(1, 2)  # Column 1, Row 2 (second line)
-                time.sleep(0.02)  # Short delay after cursor positioning
-                self.lcd.print(lines[1])
+            # Split message into lines if it contains newlines and only
+            # send what differs from the current screen
+            self.lcd.render(*message.split('\n'))
         except Exception as e:
             print(f"LCD write error: {e}")
         
-    def set_equipment_power_on(self, state):
+    def set_equipment_power_on(self, state, slot=0):
         '''
         Turn on/off power to the attached equipment by switching the relay and interlock
         @param (boolean) state - True to turn on power to equipment, False to turn off
+        @param (int) slot - index of the reader whose equipment is switched
         '''
+        pins = self.equipment_slots[slot] if slot < len(self.equipment_slots) else None
+        if pins is None:
+            return
+        relay_pin, interlock_pin = pins
+        
         if state:
-            print("Turning on equipment power and interlock")
+            print(f"Turning on equipment power and interlock (slot {slot})")
             # Set relay and interlock pins
-            self.relay_pin.on()
-            self.interlock_pin.on()
+            relay_pin.on()
+            if interlock_pin:
+                interlock_pin.on()
         else:
-            print("Turning off equipment power and interlock")
+            print(f"Turning off equipment power and interlock (slot {slot})")
             # Reset relay and interlock pins
-            self.relay_pin.off()
-            self.interlock_pin.off()
+            relay_pin.off()
+            if interlock_pin:
+                interlock_pin.off()
     
     def get_button_state(self):
         '''
@@ -232,79 +322,160 @@ class PortalBox:
         '''
         if self.keypadEnabled:
             try:
-                keys_pressed = scan_keypad()
-                return '*' in keys_pressed
+                return self.keypad.is_held('*')
             except Exception as e:
                 print(f"Keypad scan error: {e}")
                 return False
         else:
-            return self.singleButton.value()
+            return bool(self.button_debouncer.state)
+    
+    def _single_button_down(self):
+        '''Sample of the single button for its debouncer: 1 while pressed, it pulls the pulled up pin low'''
+        return 0 if self.singleButton.value() else 1
+    
+    def _on_single_button(self, code):
+        '''Debouncer sink of the single button, latches presses'''
+        if not code & EVENT_RELEASE:
+            self.button_latch = True
+    
+    def _drain_key_events(self):
+        '''
+        Move the queued keypad events to their consumers: a * or # press
+        latches the button and is kept for get_command_key(), digits are
+        kept for get_key_press()
+        '''
+        code = self.keypad.get_event()
+        while code != NO_EVENT:
+            if not code & (EVENT_RELEASE | EVENT_CHORD):
+                key = self.keypad.event_key(code)
+                if key == '*' or key == '#':
+                    self.button_latch = True
+                    self.command_key = key
+                elif self.key_press_count < len(self.key_presses):
+                    self.key_presses[self.key_press_count] = key
+                    self.key_press_count += 1
+            code = self.keypad.get_event()
     
     def has_button_been_pressed(self):
         '''
-        Check if the "*" key on the keypad has been pressed since the last call
-        Implements simple debouncing and edge detection for * key
+        Check if the "*" or "#" key on the keypad has been pressed since the last call
+        Presses come from the debounced keypad events, so a press between two
+        calls is not lost and digits stay queued for get_key_press()
         '''
         if self.keypadEnabled:
             try:
-                current_time = time.ticks_ms()
-                keys_pressed=""
-                # Only check if enough time has passed (debounce)
-                if time.ticks_diff(current_time, self.last_keypad_check) > 25:  # 25ms debounce
-                    # time.sleep(0.00001)
-                    keys_pressed = scan_keypad()
-                    
-                    # Check for "*" key press
-                    star_pressed_now = '*' in keys_pressed or "#" in keys_pressed
-                    star_pressed_before = '*' in self.last_keys_pressed or "#" in self.last_keys_pressed
-                    
-                    # Store current state for next check
-                    self.last_keys_pressed = keys_pressed
-                    self.last_keypad_check = current_time
-                    
-                    # Detect rising edge (button press)
-                    if star_pressed_now and not star_pressed_before:
-                        print("* or # key pressed")
-                        return [True, keys_pressed]
-                            
-                return [False, keys_pressed]
+                self._drain_key_events()
+                pressed = self.button_latch
+                self.button_latch = False
+                if pressed:
+                    print("* or # key pressed")
+                return [pressed, self.keypad.pressed_keys()]
             except Exception as e:
                 print(f"Button press check error: {e}")
                 return [False,""]
         else:
-            return self.singleButton.value()
+            # Presses latched by the debouncer, so one between two calls is not lost
+            pressed = self.button_latch
+            self.button_latch = False
+            return pressed
+    
+    def get_key_press(self):
+        '''
+        Get the next digit pressed on the keypad, each press is returned once
+        @return the digit as an int, or None if no digit was pressed
+        '''
+        if not self.keypadEnabled:
+            return None
+        self._drain_key_events()
+        if self.key_press_count == 0:
+            return None
+        digit = self.key_presses[0]
+        self.key_press_count -= 1
+        self.key_presses[0:self.key_press_count] = self.key_presses[1:self.key_press_count + 1]
+        return digit
+    
+    def get_command_key(self):
+        '''
+        Get the last "*" or "#" press since the previous call, for the admin modes
+        @return '*', '#' or None
+        '''
+        if not self.keypadEnabled:
+            return None
+        self._drain_key_events()
+        key = self.command_key
+        self.command_key = None
+        return key
+    
+    def clear_key_presses(self):
+        '''Drop digits pressed before now, e.g. when PIN entry starts'''
+        if self.keypadEnabled:
+            self._drain_key_events()
+        self.key_press_count = 0
+        self.button_latch = False
+        self.command_key = None
 
-    # Function to scan the keypad
-    def scan_keypad():
-        # Create an empty array to store pressed keys
-        pressed_keys = []
-        
-        for row_num, row in enumerate(self.rows):
-            row.value(0)  # Drive the row low (active)
-            for col_num, col in enumerate(self.cols):
-                if col.value() == 0:  # If the column is low, it means the key is pressed
-                    pressed_keys.append(self.keyBinds[row_num][col_num])
-            row.value(1)  # Drive the row high (inactive)
+    def read_RFID_card(self, reader=0):
+        '''
+        Get the card on a reader through the poll scheduler, which returns a
+        cached result if the reader was polled recently
+        @param reader - index of the reader, 0 is the reader of the main equipment
+        @return the card id as a positive integer (the 4 uid bytes, big endian) on a successful read, -1 otherwise
+        '''
+        return self.rfid_poller.read(reader)
+
+    def set_rfid_poll_state(self, state_name):
+        '''
+        Let the poll scheduler pick the poll rate for the current FSM state
+        @param state_name - name of the current FSM state
+        '''
+        self.rfid_poller.set_state(state_name)
 
-        return pressed_keys
-    def read_RFID_card(self):
+    def get_rfid_stats(self, reader=0):
         '''
-        @return a positive integer representing the uid from the card on a successful read, -1 otherwise
+        Read-quality statistics of an RFID reader, to tell antenna or card
+        placement problems apart from polling problems
+        @param reader - index of the reader
+        @return a dictionary of driver counters plus the scheduler poll counts
+        '''
+        stats = self.rfid_readers[reader].get_stats()
+        stats["polls"] = self.rfid_poller.poll_count
+        stats["cached_reads"] = self.rfid_poller.cached_count
+        stats["poll_interval_ms"] = self.rfid_poller.interval_ms
+        return stats
+
+    def reset_rfid_stats(self):
+        '''
+        Clear the RFID read-quality statistics
+        '''
+        for rdr in self.rfid_readers:
+            rdr.reset_stats()
+        self.rfid_poller.poll_count = 0
+        self.rfid_poller.cached_count = 0
+
+    def _poll_RFID_card(self, reader=0):
+        '''
+        Physically read a reader once, only called by the poll scheduler
+        @param reader - index of the reader
+        @return the card id as a positive integer on a successful read, -1 otherwise
         '''
-        print("READING RFID CARD")
         try:
-            maxAttempts = 0
-            while maxAttempts != 1:
-                rdr = MFRC522(spi=self.RFIDReader.spi, cs=self.RFIDReader.cs)
-                uid = ""
-                (stat, tag_type) = rdr.request(rdr.REQIDL)
-                if stat == rdr.OK:
-                    (stat, raw_uid) = rdr.anticoll()
-                    if stat == rdr.OK:
-                        uid = ("0x%02x%02x%02x%02x" % (raw_uid[0], raw_uid[1], raw_uid[2], raw_uid[3]))
-                        return uid
-                maxAttempts += 1
-            return -1
+            rdr = self.rfid_readers[reader]
+            if rdr.read_uid_into(self._uid_buf) != rdr.OK:
+                return -1
+            
+            uid = self._uid_buf
+            last = self._last_uids[reader]
+            last_card_id = self._last_card_ids[reader]
+            # Same card as last time: hand back the existing id object
+            if (last_card_id != -1 and uid[0] == last[0] and uid[1] == last[1]
+                    and uid[2] == last[2] and uid[3] == last[3]):
+                return last_card_id
+            
+            for i in range(4):
+                last[i] = uid[i]
+            last_card_id = (uid[0] << 24) | (uid[1] << 16) | (uid[2] << 8) | uid[3]
+            self._last_card_ids[reader] = last_card_id
+            return last_card_id
         except KeyboardInterrupt:
             print("Bye")
             return -1
@@ -314,9 +485,9 @@ class PortalBox:
     
     def beep_once(self, pattern='success'):
         """
-        Trigger a single beep with a predefined or custom pattern
+        Trigger a single beep with a predefined or custom pattern, without blocking
         
-        :param pattern: Either a predefined pattern name or a dict with 'freq' and 'duration'
+        :param pattern: Either a predefined pattern name (see BuzzerController.PATTERNS) or a dict with 'freq' and 'duration'
         """
         if not self.buzzer_enabled:
             print("Beep skipped - buzzer disabled")
@@ -324,15 +495,13 @@ class PortalBox:
             
         if isinstance(pattern, str):
             # Use predefined pattern
-            beep_config = self.BEEP_PATTERNS.get(pattern, self.BEEP_PATTERNS['success'])
+            self.buzzer.play_pattern(pattern)
         else:
             # Use custom pattern
-            beep_config = pattern
-        
-        self.buzzer.buzz_tone(
-            freq=beep_config.get('freq', 1000),
-            length=beep_config.get('duration', 0.2)
-        )
+            self.buzzer.buzz_tone(
+                freq=pattern.get('freq', 1000),
+                length=pattern.get('duration', 0.2)
+            )
     
     def start_beeping(self, freq=500, duration=2.0, beeps=10):
         """
@@ -371,11 +540,16 @@ class PortalBox:
         Clean up resources before shutting down
         """
         print("PortalBox.cleanup() starts")
+        if self.effects_timer:
+            self.effects_timer.deinit()
+            self.effects_timer = None
         self.buzzer.shutdown_buzzer()
         
         # Turn off all pins
         self.relay_pin.off()
         self.interlock_pin.off()
+        for slot in range(len(self.equipment_slots)):
+            self.set_equipment_power_on(False, slot)
         
         # Turn off DotStar LEDs
         if self.dotstar:
@@ -386,25 +560,60 @@ class PortalBox:
             self.lcd.clear()
             self.lcd.home()
             self.lcd.print("Shutting down...")
+            self.lcd.flush()
         except:
             pass
             
         print("Buzzer, display, and GPIO should be turned off")
     
+    def start_led_countdown(self, seconds, start_color="auth_color", end_color="unauth_color"):
+        """
+        Show the time left as a draining ring on the LEDs
+        
+        Args:
+            seconds: Time until the ring is empty
+            start_color: Palette color with the full time left
+            end_color: Palette color the ring shades to as time runs out
+        """
+        if not self.dotstar:
+            return
+        start = self.palette.get(start_color)
+        end = self.palette.get(end_color)
+        if start is None or end is None:
+            print(f"Unknown countdown colors: {start_color}, {end_color}")
+            return
+        self.dotstar.countdown(int(seconds * 1000), start[0], end[0])
+        # The strip no longer shows a palette color
+        self.led_color = None
+    
     def setScreenColor(self, color):
-        """Set the LCD backlight color"""
-        if color=="unauth_color":
-            self.lcd.set_rgb_color(RED[0], RED[1], RED[2])
-        elif color=="sleep_color":
-            self.lcd.set_rgb_color(BLUE[0], BLUE[1], BLUE[2])
-        elif color=="auth_color":
-            self.lcd.set_rgb_color(GREEN[0], GREEN[1], GREEN[2])
-        elif color=="process_color":
-            self.lcd.set_rgb_color(YELLOW[0], YELLOW[1], YELLOW[2])
-        elif color=="admin_mode":
-            self.lcd.set_rgb_color(CYAN[0], CYAN[1], CYAN[2])
-        elif color=="proxy_color":
-            self.lcd.set_rgb_color(ORANGE[0], ORANGE[1], ORANGE[2])
-        elif color==self.settings["display"]["training_color"]:
-            self.lcd.set_rgb_color(PURPLE[0], PURPLE[1], PURPLE[2])
-            
\ No newline at end of file
+        """
+        Set the LCD backlight color
+        
+        Args:
+            color: Color name from the palette
+        """
+        if color == self.lcd_color:
+            return
+        entry = self.palette.get(color)
+        if entry is None:
+            print(f"Unknown color: {color}")
+            return
+        self.lcd.write_command(entry[1])
+        self.lcd_color = color
+    
+    def set_led_color(self, color):
+        """
+        Fill the DotStar LEDs with a color
+        
+        Args:
+            color: Color name from the palette
+        """
+        if not self.dotstar or color == self.led_color:
+            return
+        entry = self.palette.get(color)
+        if entry is None:
+            print(f"Unknown color: {color}")
+            return
+        self.dotstar.show_frame(entry[2], entry[0])
+        self.led_color = color
@@ -124,8 +124,8 @@ class Setup(State):
             print("First time in setup, initializing...")
             self.setup_completed = True
             try:
-                self.service.connect_to_database()
-                self.service.get_equipment_role()
+                # Already done by on_enter(), returns at once
+                self.service.setup_backend()
                 
                 self.timeout_delta = timedelta(minutes=self.service.timeout_minutes)
                 
@@ -146,6 +146,7 @@ class Setup(State):
                 self.service.box.beep_once('success')
                 
                 print("Setup complete, transitioning to IdleNoCard...")
+                self.service.boot.mark("setup_done")
                 next_state = self.next_state(IdleNoCard, input_data)
                 return next_state
             except Exception as e:
@@ -158,6 +159,7 @@ class Setup(State):
     def on_enter(self, input_data):
         super().on_enter(input_data)
         print("Starting setup")
+        self.service.boot.mark("setup")
         
         # Update display with setup message if display controller is available
         if hasattr(self.service, 'display'):
@@ -165,15 +167,9 @@ class Setup(State):
         
         try:
             try:
-                self.service.connect_to_database()
+                self.service.setup_backend()
             except Exception as e:
-                print(f"Database connection failed: {e}")
-                raise e
-
-            try:
-                self.service.get_equipment_role()
-            except Exception as e:
-                print(f"Getting equipment role failed: {e}")
+                print(f"Backend setup failed: {e}")
                 raise e
 
             self.timeout_delta = timedelta(minutes=self.service.timeout_minutes)
@@ -0,0 +1,161 @@
+# RFIDPollScheduler.py for MicroPython on ESP32
+# Decides when the RFID readers are actually polled, based on the FSM state
+
+import time
+
+class RFIDPollScheduler:
+    """
+    Single access point for RFID reads
+
+    Every caller (the main loop, PIN entry, the admin modes) goes through
+    read(). A reader is only polled when the poll interval for the current
+    FSM state has elapsed, otherwise the cached result of its last poll is
+    returned. This keeps the bus from being read twice within one tick and
+    lets the poll rate follow the state of the box.
+
+    Several readers on one bus are scanned round-robin, each keeping its own
+    poll interval and presence state, with their polls staggered over the
+    interval so they do not all land on the same tick.
+    """
+
+    # Poll intervals in ms per FSM state name
+    DEFAULT_INTERVAL_MS = 100
+    STATE_INTERVALS_MS = {
+        "IdleNoCard": 250,             # Nothing going on, poll slowly
+        "IdleUnauthCard": 150,
+        "IdleAuthCard": 150,
+        "RunningAuthUser": 50,         # Session running, detect removal quickly
+        "RunningProxyCard": 50,
+        "RunningTrainingCard": 50,
+        "RunningTimeout": 50,
+        "RunningNoCard": 100,
+        "RunningUnauthCard": 100,
+        "AdminMode": 100,
+        "PinEntry": 100,               # Card removal aborts the PIN entry
+    }
+
+    # States in which the antenna is switched off between polls
+    ANTENNA_OFF_STATES = ("IdleNoCard",)
+
+    # Time for a card to power up after the field is switched back on
+    ANTENNA_SETTLE_MS = 5
+
+    def __init__(self, poll_func, readers=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            poll_func: Function doing one physical read of the reader at the
+                given index, returns the card id or -1
+            readers: List of MFRC522 instances, used for the round-robin and
+                to switch the antennas (optional)
+        """
+        self.poll_func = poll_func
+        self.readers = readers if readers else []
+        self.num_readers = max(1, len(self.readers))
+        self.state_name = ""
+        self.interval_ms = self.DEFAULT_INTERVAL_MS
+        self.antenna_idle = False
+        self.antenna_is_on = [True] * self.num_readers
+
+        # Per reader presence state
+        self.results = [-1] * self.num_readers
+        self.last_poll_times = [0] * self.num_readers
+        self.next_reader = 0
+        self.invalidate()
+
+        self.poll_count = 0
+        self.cached_count = 0
+
+    def set_state(self, state_name):
+        """
+        Update the poll rate for the given FSM state
+
+        Args:
+            state_name: Name of the current FSM state (or "AdminMode")
+        """
+        if state_name == self.state_name:
+            return
+
+        self.state_name = state_name
+        self.interval_ms = self.STATE_INTERVALS_MS.get(state_name, self.DEFAULT_INTERVAL_MS)
+        self.antenna_idle = state_name in self.ANTENNA_OFF_STATES
+        print(f"RFID poll interval set to {self.interval_ms}ms for {state_name}")
+
+        # Make sure the field is up when leaving an idle state
+        if not self.antenna_idle:
+            for index in range(self.num_readers):
+                self._set_antenna(index, True)
+
+    def read(self, index=0):
+        """
+        Get the card currently on a reader
+
+        Args:
+            index: Index of the reader
+
+        Returns:
+            The card id of the reader's last poll, polling the readers that are due first
+        """
+        if not self.service():
+            self.cached_count += 1
+        return self.results[index]
+
+    def service(self):
+        """
+        Poll every reader whose interval has elapsed, in round-robin order
+
+        Returns:
+            True if at least one reader was polled
+        """
+        now = time.ticks_ms()
+        polled = False
+        for _ in range(self.num_readers):
+            index = self.next_reader
+            self.next_reader = (index + 1) % self.num_readers
+            if time.ticks_diff(now, self.last_poll_times[index]) >= self.interval_ms:
+                self.poll(index)
+                polled = True
+        return polled
+
+    def poll(self, index=0):
+        """
+        Poll a reader now, regardless of the interval
+
+        Args:
+            index: Index of the reader
+
+        Returns:
+            The card id of the card on the reader or -1
+        """
+        if not self.antenna_is_on[index]:
+            self._set_antenna(index, True)
+            time.sleep_ms(self.ANTENNA_SETTLE_MS)
+
+        result = self.poll_func(index)
+        self.results[index] = result
+        self.last_poll_times[index] = time.ticks_ms()
+        self.poll_count += 1
+
+        # Only drop the field while idle and nothing was found
+        if self.antenna_idle and result == -1:
+            self._set_antenna(index, False)
+
+        return result
+
+    def invalidate(self):
+        """Force the next read() to poll every reader, staggered over one interval"""
+        now = time.ticks_ms()
+        step = self.interval_ms // self.num_readers
+        for index in range(self.num_readers):
+            self.last_poll_times[index] = time.ticks_add(now, -self.interval_ms + index * step)
+
+    def _set_antenna(self, index, on):
+        """Switch a reader's antenna, skipping redundant register writes"""
+        if index >= len(self.readers) or on == self.antenna_is_on[index]:
+            return
+        try:
+            self.readers[index].antenna_on(on)
+            self.antenna_is_on[index] = on
+        except Exception as e:
+            print(f"RFID antenna error on reader {index}: {e}")
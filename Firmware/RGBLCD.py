@@ -6,7 +6,9 @@ through TTL serial connection.
 Compatible with 16x2 and 20x4 displays with appropriate configuration.
 """
 import time
-from machine import UART # type: ignore
+import json
+from array import array
+from machine import UART, Timer # type: ignore
 
 class RGBLCD:
     """Class for controlling RGB LCD displays via serial connection"""
@@ -33,11 +35,47 @@ class RGBLCD:
     BLOCK_CURSOR_ON = 0x53
     BLOCK_CURSOR_OFF = 0x54
     
+    # Custom character commands
+    CREATE_CUSTOM_CHAR = 0x4E
+    
     # Scrolling commands
     AUTOSCROLL_ON = 0x51
     AUTOSCROLL_OFF = 0x52
     
-    def __init__(self, uart_id=1, tx_pin=5, baud_rate=9600, cols=16, rows=2):
+    # Baud rate commands
+    SET_BAUD_RATE = 0x39
+    BAUD_CODES = {
+        1200: 0x53, 2400: 0x29, 4800: 0xCF, 9600: 0x67, 19200: 0x33,
+        28800: 0x22, 38400: 0x19, 57600: 0x10, 115200: 0x08,
+    }
+    
+    # Output queue size
+    QUEUE_BYTES = 256
+    QUEUE_ENTRIES = 32
+    DRAIN_PERIOD_MS = 10    # Period of the drain timer
+    
+    # Pacing table: minimum gap in ms after each command class, written by
+    # LCDCalibration.py from measurements on the actual display. These
+    # defaults are the conservative values used before calibration.
+    PACING_FILE = "lcd_pacing.json"
+    DEFAULT_PACING = {
+        "power_up": 500,    # Time the display needs after power-up
+        "init": 150,        # Gap after each command of the init sequence
+        "clear": 50,        # Clear screen and home
+        "cursor": 50,       # Cursor positioning and movement
+        "color": 50,        # Backlight color, brightness and contrast
+        "other": 50,        # Every other command
+        "text": 0,          # Text and rendered frames
+        "baud": 9600,       # Baud rate stored in the display
+    }
+    COMMAND_CLASSES = {
+        CLEAR_SCREEN: "clear", GO_HOME: "clear",
+        SET_CURSOR_POS: "cursor", CURSOR_BACK: "cursor", CURSOR_FORWARD: "cursor",
+        SET_RGB_COLOR: "color", SET_BRIGHTNESS: "color", SET_CONTRAST: "color",
+    }
+    
+    def __init__(self, uart_id=1, tx_pin=5, baud_rate=9600, cols=16, rows=2, timer_id=None,
+                 pacing_file=PACING_FILE):
         """
         Initialize the LCD controller
         
@@ -48,40 +86,77 @@ class RGBLCD:
             baud_rate: Serial baud rate (default 9600)
             cols: Number of display columns (default 16)
             rows: Number of display rows (default 2)
+            timer_id: Hardware timer used to drain the output queue, None to
+                only drain from update() and when queueing
+            pacing_file: Calibrated pacing table, the baud rate stored in it
+                overrides baud_rate since the display keeps it across resets
         """
         self.cols = cols
         self.rows = rows
         
+        # Per command gaps, looked up by command byte when queueing
+        self.pacing = dict(self.DEFAULT_PACING)
+        self.pacing["baud"] = baud_rate
+        self._gap_by_cmd = array('H', [0] * 256)
+        self.load_pacing(pacing_file)
+        self._init_phase = True
+        baud_rate = self.pacing["baud"]
+        self.baud_rate = baud_rate
+        
+        # Shadow of what is on the glass, used by render() to only send changes
+        self._alloc_buffers()
+        
+        # Bounded output queue: a byte ring plus per-entry length and gap
+        self._qbuf = bytearray(self.QUEUE_BYTES)
+        self._qbuf_mv = memoryview(self._qbuf)
+        self._qlen = array('H', [0] * self.QUEUE_ENTRIES)
+        self._qgap = array('H', [0] * self.QUEUE_ENTRIES)
+        self._qhead = self._qtail = self._qcount = 0
+        self._bhead = self._btail = self._bcount = 0
+        self._busy = False
+        
+        # Queue statistics
+        self.bytes_sent = 0
+        self.max_depth = 0
+        self.overflow_count = 0
+        self.drain_rate = 0
+        self._rate_bytes = 0
+        self._rate_start = time.ticks_ms()
+        
         # Initialize UART with a larger buffer
         self.uart = UART(uart_id, baud_rate)
         self.uart.init(baud_rate, bits=8, parity=None, stop=1, tx=tx_pin, timeout=50)
+        self._has_txdone = hasattr(self.uart, 'txdone')
         
-        # Longer delay to ensure LCD is fully ready
-        time.sleep(0.5)
+        # Nothing goes out before the LCD is ready, without blocking here
+        self._next_send = time.ticks_add(time.ticks_ms(), self.pacing["power_up"])
         
-        # Initial setup with delays between each command
+        # Initial setup, queued with a longer gap between each command
         self.set_display_size(cols, rows)
-        time.sleep(0.1)
         self.clear()
-        time.sleep(0.1)
         self.display_on()
-        time.sleep(0.1)
         self.cursor_off()
-        time.sleep(0.1)
         self.autoscroll_on()
-        time.sleep(0.1)
         
         # Set reasonable defaults for contrast and brightness
         self.set_contrast(200)
-        time.sleep(0.1)
         self.set_brightness(255)
-        time.sleep(0.1)
         self.set_rgb_color(255, 255, 255)  # White backlight by default
-        time.sleep(0.1)
+        self._init_phase = False
+        
+        # Drain from a timer so queued output keeps moving during blocking code
+        self.timer = None
+        if timer_id is not None:
+            try:
+                self.timer = Timer(timer_id)
+                self.timer.init(period=self.DRAIN_PERIOD_MS, mode=Timer.PERIODIC, callback=self._timer_drain)
+            except Exception as e:
+                print(f"LCD drain timer unavailable: {e}")
+                self.timer = None
     
     def _send_command(self, command, *args):
         """
-        Send a command to the LCD
+        Queue a command for the LCD
         
         Args:
             command: Command byte
@@ -95,11 +170,222 @@ class RGBLCD:
             else:
                 data.append(int(arg) & 0xFF)  # Convert to int and ensure it's a byte
         
-        # Write command and flush
-        self.uart.write(data)
+        # The display needs time to process a command before the next bytes arrive
+        self._enqueue(data, self.pacing["init"] if self._init_phase else self._gap_by_cmd[command])
+    
+    def _enqueue(self, data, gap_ms=0):
+        """
+        Add bytes to the output queue and send what can go out right away
+        
+        Args:
+            data: Bytes to send
+            gap_ms: Minimum time between these bytes leaving the UART and the next entry
+        """
+        n = len(data)
+        if n > self.QUEUE_BYTES:
+            # Larger than the whole ring, send it in pieces
+            for i in range(0, n, self.QUEUE_BYTES):
+                self._enqueue(data[i:i + self.QUEUE_BYTES], gap_ms if i + self.QUEUE_BYTES >= n else 0)
+            return
+        
+        if self._qcount >= self.QUEUE_ENTRIES or self.QUEUE_BYTES - self._bcount < n:
+            # Queue full, wait for the oldest entries to go out
+            self.overflow_count += 1
+            while self._qcount >= self.QUEUE_ENTRIES or self.QUEUE_BYTES - self._bcount < n:
+                if not self.update():
+                    time.sleep_ms(1)
+        
+        self._busy = True
+        head = self._bhead
+        first = min(n, self.QUEUE_BYTES - head)
+        self._qbuf[head:head + first] = data[:first]
+        if first < n:
+            self._qbuf[0:n - first] = data[first:]
+        self._bhead = (head + n) % self.QUEUE_BYTES
+        self._bcount += n
+        
+        self._qlen[self._qtail] = n
+        self._qgap[self._qtail] = gap_ms
+        self._qtail = (self._qtail + 1) % self.QUEUE_ENTRIES
+        self._qcount += 1
+        if self._qcount > self.max_depth:
+            self.max_depth = self._qcount
+        self._busy = False
+        
+        self.update()
+    
+    def update(self):
+        """
+        Send queued output whose minimum gap has passed, call this regularly
+        
+        Entries without a gap go out back to back, an entry with a gap holds
+        back the rest of the queue until its bytes have left the UART and the
+        gap has elapsed.
+        
+        Returns:
+            Number of bytes sent
+        """
+        if self._busy or not self._qcount:
+            return 0
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._next_send) < 0:
+            return 0
+        if self._has_txdone and not self.uart.txdone():
+            return 0
+        
+        self._busy = True
+        sent = 0
+        while self._qcount:
+            n = self._qlen[self._qhead]
+            gap = self._qgap[self._qhead]
+            tail = self._btail
+            first = min(n, self.QUEUE_BYTES - tail)
+            self.uart.write(self._qbuf_mv[tail:tail + first])
+            if first < n:
+                self.uart.write(self._qbuf_mv[0:n - first])
+            self._btail = (tail + n) % self.QUEUE_BYTES
+            self._bcount -= n
+            self._qhead = (self._qhead + 1) % self.QUEUE_ENTRIES
+            self._qcount -= 1
+            sent += n
+            if gap:
+                # The gap starts once everything written so far is on the wire
+                self._next_send = time.ticks_add(now, gap + self._tx_ms(sent))
+                break
         
-        # Increased delay for command processing - this is critical for reliable operation
-        time.sleep(0.05)  # 50ms delay between commands
+        self.bytes_sent += sent
+        self._rate_bytes += sent
+        elapsed = time.ticks_diff(now, self._rate_start)
+        if elapsed >= 1000:
+            self.drain_rate = self._rate_bytes * 1000 // elapsed
+            self._rate_bytes = 0
+            self._rate_start = now
+        self._busy = False
+        return sent
+    
+    def _tx_ms(self, n):
+        """Time in ms for n bytes to clock out at the current baud rate (10 bits per byte)"""
+        return (n * 10000 + self.baud_rate - 1) // self.baud_rate
+    
+    def set_pacing(self, pacing):
+        """
+        Update the pacing table and rebuild the per command gap lookup
+        
+        Args:
+            pacing: Dictionary with any of the DEFAULT_PACING keys
+        """
+        for key in pacing:
+            if key in self.DEFAULT_PACING:
+                self.pacing[key] = int(pacing[key])
+        other = self.pacing["other"]
+        for cmd in range(256):
+            self._gap_by_cmd[cmd] = other
+        for cmd, cls in self.COMMAND_CLASSES.items():
+            self._gap_by_cmd[cmd] = self.pacing[cls]
+    
+    def load_pacing(self, path=PACING_FILE):
+        """
+        Load a calibrated pacing table, keeping the defaults if there is none
+        
+        Args:
+            path: JSON file written by save_pacing()
+        """
+        try:
+            with open(path, 'r') as f:
+                pacing = json.load(f)
+            print(f"Loaded LCD pacing from {path}: {pacing}")
+        except (OSError, ValueError):
+            pacing = {}
+        self.set_pacing(pacing)
+    
+    def save_pacing(self, path=PACING_FILE):
+        """
+        Store the current pacing table and baud rate
+        
+        Args:
+            path: JSON file to write
+        """
+        with open(path, 'w') as f:
+            json.dump(self.pacing, f)
+        print(f"Saved LCD pacing to {path}: {self.pacing}")
+    
+    def set_baud_rate(self, baud_rate):
+        """
+        Switch the display and the UART to another baud rate
+        
+        The display stores the new rate in its EEPROM, so it has to be saved
+        with save_pacing() for the next boot to talk to it.
+        
+        Args:
+            baud_rate: One of BAUD_CODES
+        """
+        if baud_rate not in self.BAUD_CODES:
+            raise ValueError(f"Unsupported LCD baud rate: {baud_rate}")
+        
+        # The command goes out at the old rate, the UART follows once it has left
+        self._enqueue(bytes((self.CMD_PREFIX, self.SET_BAUD_RATE, self.BAUD_CODES[baud_rate])), self.pacing["init"])
+        self.flush()
+        while self._has_txdone and not self.uart.txdone():
+            time.sleep_ms(1)
+        self.uart.init(baudrate=baud_rate)
+        self.baud_rate = baud_rate
+        self.pacing["baud"] = baud_rate
+    
+    def _timer_drain(self, timer):
+        """Drain timer callback"""
+        self.update()
+    
+    def flush(self, timeout_ms=3000):
+        """
+        Block until the output queue is empty
+        
+        Args:
+            timeout_ms: Give up after this long
+            
+        Returns:
+            True if the queue was emptied
+        """
+        start = time.ticks_ms()
+        while self._qcount:
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                return False
+            if not self.update():
+                time.sleep_ms(1)
+        return True
+    
+    def queue_depth(self):
+        """Number of entries waiting in the output queue"""
+        return self._qcount
+    
+    def get_queue_stats(self):
+        """
+        Output queue statistics
+        
+        Returns:
+            Dictionary with the current and maximum depth, queued bytes,
+            total bytes sent, drain rate in bytes/s and the number of times
+            a caller had to wait for space
+        """
+        return {
+            "depth": self._qcount,
+            "queued_bytes": self._bcount,
+            "max_depth": self.max_depth,
+            "bytes_sent": self.bytes_sent,
+            "drain_rate": self.drain_rate,
+            "overflows": self.overflow_count,
+        }
+    
+    def _alloc_buffers(self):
+        """Allocate the shadow, frame and output buffers for the current size"""
+        size = self.cols * self.rows
+        self.shadow = bytearray(b' ' * size)
+        self.shadow_valid = False
+        self._frame = bytearray(size)
+        # Worst case: one cursor command (4 bytes) plus a full line per row
+        self._out = bytearray(self.rows * (self.cols + 4))
+        self._out_mv = memoryview(self._out)
+        self.cursor_col = 0
+        self.cursor_row = 0
     
     def display_on(self, timeout_minutes=0):
         """Turn the display on with optional timeout"""
@@ -112,10 +398,17 @@ class RGBLCD:
     def clear(self):
         """Clear the display"""
         self._send_command(self.CLEAR_SCREEN)
+        for i in range(len(self.shadow)):
+            self.shadow[i] = 0x20
+        self.shadow_valid = True
+        self.cursor_col = 0
+        self.cursor_row = 0
     
     def home(self):
         """Move cursor to home position (1,1)"""
         self._send_command(self.GO_HOME)
+        self.cursor_col = 0
+        self.cursor_row = 0
     
     def set_cursor(self, col, row):
         """
@@ -132,9 +425,8 @@ class RGBLCD:
         # The command reference shows cursor position is 1-based,
         # but we'll add a debug print to check what's sent
         self._send_command(self.SET_CURSOR_POS, col, row)
-        
-        # Additional small delay after cursor positioning
-        time.sleep(0.02)
+        self.cursor_col = col - 1
+        self.cursor_row = row - 1
     
     def cursor_on(self, block=False):
         """
@@ -195,6 +487,15 @@ class RGBLCD:
         b = max(0, min(255, b))
         self._send_command(self.SET_RGB_COLOR, r, g, b)
     
+    def write_command(self, data):
+        """
+        Queue a complete pre-encoded command, such as a palette color
+        
+        Args:
+            data: Command bytes starting with CMD_PREFIX and the command byte
+        """
+        self._enqueue(data, self.pacing["init"] if self._init_phase else self._gap_by_cmd[data[1]])
+    
     def set_display_size(self, cols, rows):
         """
         Set the LCD display size
@@ -205,6 +506,7 @@ class RGBLCD:
         """
         self.cols = cols
         self.rows = rows
+        self._alloc_buffers()
         self._send_command(self.SET_LCD_SIZE, cols, rows)
     
     def print(self, text):
@@ -214,7 +516,89 @@ class RGBLCD:
         Args:
             text: Text to display
         """
-        self.uart.write(text.encode())
+        data = text.encode()
+        self._enqueue(data, self.pacing["text"])
+        self._track_write(data)
+    
+    def _track_write(self, data):
+        """Mirror raw text written at the cursor into the shadow buffer"""
+        start = self.cursor_row * self.cols + self.cursor_col
+        if self.cursor_col + len(data) > self.cols:
+            # Wrapped or autoscrolled, the shadow no longer matches the glass
+            self.shadow_valid = False
+            return
+        self.shadow[start:start + len(data)] = data
+        self.cursor_col += len(data)
+    
+    def render(self, *lines):
+        """
+        Show the given lines, sending only the characters that differ from
+        what is already displayed
+        
+        All changes are queued as one entry of cursor-position commands and
+        text runs, sent in a single UART write, without clearing the screen. Lines are padded with spaces
+        and truncated to the display width, missing lines are blanked.
+        
+        Args:
+            *lines: Text for each row, starting at the top, as str or bytes
+                (bytes can carry custom character codes 0-7)
+            
+        Returns:
+            Number of bytes sent
+        """
+        cols = self.cols
+        frame = self._frame
+        for row in range(self.rows):
+            base = row * cols
+            data = lines[row] if row < len(lines) else b''
+            if isinstance(data, str):
+                data = data.encode()
+            n = min(len(data), cols)
+            # Lines that already fit, like pre-encoded templates, are copied without slicing
+            frame[base:base + n] = data if n == len(data) else data[:n]
+            for i in range(base + n, base + cols):
+                frame[i] = 0x20
+        
+        shadow = self.shadow
+        full = not self.shadow_valid
+        out = self._out
+        pos = 0
+        for row in range(self.rows):
+            base = row * cols
+            col = 0
+            while col < cols:
+                if not full and frame[base + col] == shadow[base + col]:
+                    col += 1
+                    continue
+                # Start of a changed run, position the cursor once for it
+                out[pos] = self.CMD_PREFIX
+                out[pos + 1] = self.SET_CURSOR_POS
+                out[pos + 2] = col + 1
+                out[pos + 3] = row + 1
+                pos += 4
+                while col < cols:
+                    # Unchanged gaps shorter than a cursor command are cheaper to resend
+                    if not full and frame[base + col] == shadow[base + col]:
+                        gap = col
+                        while gap < cols and gap - col < 4 and frame[base + gap] == shadow[base + gap]:
+                            gap += 1
+                        if gap == cols or gap - col >= 4:
+                            break
+                    out[pos] = frame[base + col]
+                    pos += 1
+                    col += 1
+        
+        if pos:
+            self._enqueue(self._out_mv[:pos], self.pacing["text"])
+            shadow[:] = frame
+            self.shadow_valid = True
+            self.cursor_col = cols
+            self.cursor_row = self.rows - 1
+        return pos
+    
+    def invalidate(self):
+        """Forget the shadow, the next render() rewrites every character"""
+        self.shadow_valid = False
     
     def print_at(self, text, col, row):
         """
@@ -227,7 +611,8 @@ class RGBLCD:
         """
         # Explicitly send cursor position command instead of using self.set_cursor
         self._send_command(self.SET_CURSOR_POS, col, row)
-        time.sleep(0.02)  # Small delay to ensure cursor is positioned
+        self.cursor_col = col - 1
+        self.cursor_row = row - 1
         self.print(text)
     
     def create_char(self, slot, bitmap):
@@ -244,4 +629,4 @@ class RGBLCD:
         if len(bitmap) != 8:
             raise ValueError("Bitmap must contain exactly 8 bytes")
         
-        self._send_command(0x4E, slot, *bitmap)
\ No newline at end of file
+        self._send_command(self.CREATE_CUSTOM_CHAR, slot, *bitmap)
\ No newline at end of file
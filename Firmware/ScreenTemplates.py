@@ -0,0 +1,101 @@
+# ScreenTemplates.py - Precomputed LCD screens for PortalBox
+"""
+Registry of the fixed screens the box shows, built once at startup.
+
+Every screen is stored ready to render: both lines already centered or
+padded to the display width and encoded to bytes, plus the name of its
+color. Showing a screen is then a dictionary lookup followed by the LCD's
+diff render, without formatting or allocating anything.
+"""
+
+class ScreenTemplates:
+    """
+    Pre-encoded screens, looked up by FSM state name or message name
+    """
+
+    # Screens per FSM state: (line 1, line 2, color name)
+    # A line 2 of None shows line 1 centered on its own, like display_message
+    STATE_SCREENS = {
+        "IdleNoCard": ("Welcome!", "Scan Card to Use", "sleep_color"),
+        "IdleUnauthCard": ("Unauthorized", "Access Denied", "unauth_color"),
+        "RunningAuthUser": ("Authorized", "Machine On", "auth_color"),
+        "RunningTrainingCard": ("Training Mode", "Machine On", "training_color"),
+        "RunningProxyCard": ("Proxy Access", "Machine On", "proxy_color"),
+        "Setup": ("Setting Up...", None, "process_color"),
+        "Shutdown": ("Shutting Down...", None, "unauth_color"),
+    }
+
+    # Upper bound on cached one-off messages, so odd texts cannot grow the cache forever
+    MESSAGE_CACHE_SIZE = 32
+
+    def __init__(self, cols=16, screens=None):
+        """
+        Build the templates
+
+        Args:
+            cols: Display width in characters
+            screens: Extra or replacement screens, same format as STATE_SCREENS
+        """
+        self.cols = cols
+        self.blank = b' ' * cols
+        self.screens = {}
+        self.messages = {}
+
+        definitions = dict(self.STATE_SCREENS)
+        if screens:
+            definitions.update(screens)
+        for name, (line1, line2, color) in definitions.items():
+            self.add(name, line1, line2, color)
+
+    def add(self, name, line1, line2=None, color=None):
+        """
+        Add or replace a screen
+
+        Args:
+            name: Name the screen is looked up by
+            line1: Top line text
+            line2: Bottom line text, None to center line1 alone
+            color: Color name for the screen, or None to keep the current one
+
+        Returns:
+            The template tuple (line 1 bytes, line 2 bytes, color)
+        """
+        if line2 is None:
+            screen = (self.center(line1), self.blank, color)
+        else:
+            screen = (self.pad(line1), self.pad(line2), color)
+        self.screens[name] = screen
+        return screen
+
+    def get(self, name):
+        """Get the screen for a name, or None if there is no template for it"""
+        return self.screens.get(name)
+
+    def message(self, text):
+        """
+        Get the centered, encoded line for a one-off message, cached by text
+
+        Args:
+            text: Message text
+
+        Returns:
+            The encoded line, padded to the display width
+        """
+        line = self.messages.get(text)
+        if line is None:
+            if len(self.messages) >= self.MESSAGE_CACHE_SIZE:
+                self.messages.clear()
+            line = self.center(text)
+            self.messages[text] = line
+        return line
+
+    def pad(self, text):
+        """Encode text truncated or space padded to the display width"""
+        data = text.encode()[:self.cols]
+        return data + self.blank[len(data):]
+
+    def center(self, text):
+        """Encode text centered on the display width, truncated if too long"""
+        data = text.encode()[:self.cols]
+        left = (self.cols - len(data)) // 2
+        return self.blank[:left] + data + self.blank[left + len(data):]
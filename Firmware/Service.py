@@ -12,7 +12,10 @@ from PortalBox import PortalBox
 from Database import Database
 from Database import CardType as CardType
 from DisplayController import DisplayController
-import Keypad
+from PinEntry import PinEntry
+from PinVerifier import PinVerifier
+from AdminModes import AdminModes
+from BootSequence import get_boot_sequence
 
 # Definitions aka constants
 DEFAULT_CONFIG_FILE_PATH = "config.json"
@@ -56,9 +59,13 @@ class PortalBoxApplication():
                 
         print(f"Using WiFi SSID: {self.WIFI_SSID}")
         
+        # Start the WiFi association first, the hardware is set up while it runs
+        self.boot = get_boot_sequence()
+        self.boot.run("wifi_start", self.start_wifi)
+        
         # Initialize the box hardware
         print("Initializing PortalBox hardware...")
-        self.box = PortalBox(settings)
+        self.box = self.boot.run("hardware", PortalBox, settings)
         
         # Store reference to service in box for user lookups
         self.box.set_service(self)
@@ -70,50 +77,79 @@ class PortalBoxApplication():
         self.in_card_reader_mode = False
         self.in_certification_mode= False
         
-        # Connect to WiFi
-        self.connect_wifi()
+        # PIN verification sub-state, stepped by get_inputs() while active.
+        # The card's input data waits in pending_input until the PIN is checked
+        self.pins = PinVerifier()
+        self.pin_entry = PinEntry(self.box, self.display, self.pins)
+        self.pending_input = None
+        
+        # Card reader and certification modes, stepped by get_inputs() while active
+        self.admin = AdminModes(self)
+        
+        # Set by setup_backend(), which the Setup state runs
+        self.backend_ready = False
         
-    def connect_wifi(self):
-        """Connects to WiFi and prints the IP and MAC address."""
+    def start_wifi(self):
+        """Starts the WiFi association, without waiting for it to complete"""
         print("Connecting to WiFi...")
+        self.wlan = network.WLAN(network.STA_IF)
+        try:
+            self.wlan.active(True)
+            if not self.wlan.isconnected():
+                self.wlan.connect(self.WIFI_SSID, self.WIFI_PASSWORD)
+        except Exception as e:
+            print(f"WiFi connection failed: {e}")
+    
+    def wait_for_wifi(self, timeout_ms=10000):
+        """Waits for the association started by start_wifi() and prints the IP and MAC address."""
         self.display.display_two_line_message("Connecting to", "WiFi...", "process_color")
         
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
-    
         try:
-            wlan.connect(self.WIFI_SSID, self.WIFI_PASSWORD)
-        
-            # Wait for connection with timeout
-            max_wait = 10
-            while max_wait > 0:
-                if wlan.isconnected():
-                    break
-                max_wait -= 1
-                print("Waiting for connection...")
-                time.sleep(1)
-            
-            if wlan.isconnected():
-                ip_address = wlan.ifconfig()[0]
+            # Wait for connection with timeout, keeping the display and effects running
+            deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+            while not self.wlan.isconnected() and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+                self.box.update()
+                time.sleep_ms(50)
+            
+            if self.wlan.isconnected():
+                ip_address = self.wlan.ifconfig()[0]
                 print(f"Connected! IP: {ip_address}")
                 self.display.display_two_line_message("WiFi Connected", f"IP: {ip_address}", "auth_color")
-                time.sleep(1)
                 
-                mac_bytes = wlan.config('mac')
+                mac_bytes = self.wlan.config('mac')
                 mac_hex = ''.join(['{:02x}'.format(b) for b in mac_bytes])
                 print(f"Device MAC address: {mac_hex}")
                 return True
             else:
                 print("Could not connect to WiFi")
                 self.display.display_two_line_message("WiFi Failed!", "Check Settings", "unauth_color")
-                time.sleep(1)
                 return False
         except Exception as e:
             print(f"WiFi connection failed: {e}")
             self.display.display_two_line_message("WiFi Error!", f"{e}", "unauth_color")
-            time.sleep(1)
             return False
 
+    def setup_backend(self):
+        """
+        Joins the network and the backend, once: waits for WiFi, connects to
+        the database and gets the equipment role, then records the IP and logs
+        the start in the background while the box is already ready
+        """
+        if self.backend_ready:
+            return
+        
+        self.boot.run("wifi_wait", self.wait_for_wifi)
+        self.boot.run("database", self.connect_to_database)
+        self.boot.run("profile", self.get_equipment_role)
+        
+        # Nothing waits for these two
+        self.boot.start_task("record_ip", self.record_ip)
+        self.boot.start_task("started_status", self.db.log_started_status, self.equipment_id)
+        
+        self.backend_ready = True
+        self.display.display_message("Ready!", "auth_color")
+        self.boot.mark_ready()
+
     def connect_to_database(self):
         '''
         Connects to the database
@@ -125,7 +161,6 @@ class PortalBoxApplication():
         try:
             self.db = Database(self.settings["db"])
             self.display.display_message("DB Connected!", "auth_color")
-            time.sleep(0.5)
         except Exception as e:
             print(f"Unable to connect to database exception raised: {e}")
             self.display.display_message("DB Failed!", "unauth_color")
@@ -155,6 +190,7 @@ class PortalBoxApplication():
         # Determine what we are
         profile = (-1,)
         self.display.display_message("Getting Role...", "process_color")
+        retry_ms = 1000
         
         while profile[0] < 0:
             try:
@@ -166,9 +202,12 @@ class PortalBoxApplication():
                 profile = self.db.get_equipment_profile(mac_address)
             except Exception as e:
                 print(f"Error: {e}")
-                print("Didn't get profile, trying again in 5 seconds")
+                print(f"Didn't get profile, trying again in {retry_ms} ms")
+                # Leaves a trace in flash if the box never gets its role
+                self.boot.mark("profile_retry", persist=True)
                 self.display.display_two_line_message("Role Failed!", "Retrying...", "unauth_color")
-                time.sleep(5)
+                time.sleep_ms(retry_ms)
+                retry_ms = min(retry_ms * 2, 5000)
 
         # only run if we have role, which we might not if we were asked to
         # shutdown before we discovered a role
@@ -191,13 +230,6 @@ class PortalBoxApplication():
         else:
             self.display.display_two_line_message(f"No", 
                                                 f"Timeout", "admin_mode")
-        time.sleep(1)
-        
-        # Log that we're started
-        self.db.log_started_status(self.equipment_id)
-        
-        self.display.display_message("Ready!", "auth_color")
-        time.sleep(0.5)
 
     def get_inputs(self, old_input_data):
         """
@@ -220,11 +252,26 @@ class PortalBoxApplication():
             self.lastUser = 0
             print("Reset lastUser due to AccessComplete state transition")
         
-        # Rest of the method remains unchanged...
+        # Take the * or # press of this iteration, so none is left over for later
+        command_key = self.box.get_command_key()
+        
+        # A running admin mode owns the inputs until it ends, including the
+        # PIN entries it starts and steps itself
+        if self.admin.active:
+            if not self.admin.step(command_key):
+                self.in_card_reader_mode = False
+                self.in_certification_mode = False
+                # Update display after leaving the mode
+                self.update_display_for_state(self.current_state_name)
+            return self.held_inputs(old_input_data)
+        
+        # A PIN entry for a newly read card owns the inputs until it has a result
+        if self.pin_entry.active and self.pending_input is not None:
+            return self.continue_pin_entry(old_input_data)
         
         # Check for entering card reader mode specifically from IdleNoCard state
         if (self.current_state_name == "IdleNoCard" and 
-            "*" in Keypad.scan_keypad() and 
+            command_key == '*' and 
             not self.in_card_reader_mode):
             
             print("*** Entering card reader mode ***")
@@ -240,37 +287,21 @@ class PortalBoxApplication():
             return new_input_data
         
         elif (self.current_state_name == "IdleNoCard" and 
-            "#" in Keypad.scan_keypad() and 
+            command_key == '#' and 
             not self.in_certification_mode):
             
             print("*** Entering certification mode ***")
             # Enter certification mode
             self.in_card_reader_mode = False
             self.in_certification_mode = True
-            self.cert_mode_state = 'init'  # Initialize state machine
             self.display.display_two_line_message("Admin Mode", "Starting...", "admin_mode")
             self.box.beep_once('success')
+            self.admin.start_certification()
             
             # Create a copy and reset button pressed to avoid side effects
             new_input_data = dict(old_input_data)
             new_input_data["button_pressed"] = False
             return new_input_data
-                
-        if self.in_certification_mode:
-            # Run card reader mode, exit if it returns False
-            still_in_mode = self.handle_certification_mode()
-            if not still_in_mode:
-                self.in_certification_mode= False
-                # Update display after exiting card Certification mode
-                self.update_display_for_state(self.current_state_name)
-                time.sleep(1)
-                new_input_data = dict(old_input_data)
-                return new_input_data
-                
-            # Create a copy and reset button pressed to avoid side effects
-            new_input_data = dict(old_input_data)
-            new_input_data["button_pressed"] = False
-            return new_input_data
         
         # Normal input handling
         # Check for a card and get its ID
@@ -278,9 +309,6 @@ class PortalBoxApplication():
         print("Tried to read card")
         print(card_id)
         
-        # Convert hex string to int if card was read
-        card_id = int(card_id, 16) if card_id != -1 else -1
-        
         # Check if this is a card removal event (old card present, new card not present)
         card_removal = (old_input_data["card_id"] > 0 and card_id <= 0)
         
@@ -317,6 +345,9 @@ class PortalBoxApplication():
                     time.sleep(1)
                     if prev_display:
                         self.display.display_message(prev_display)
+            
+            # Keep only the PIN's hash
+            self.pins.remember(card_id, details)
                     
             new_input_data = {
                 "card_id": card_id,
@@ -324,26 +355,9 @@ class PortalBoxApplication():
                 "card_type": details["card_type"],
                 "user_authority_level": details["user_authority_level"],
                 "button_pressed": self.box.has_button_been_pressed()[0],
-                "pin": details['pin'],
                 "card_removal": card_removal
             }
             
-            # Only verify PIN if not in grace period to avoid interfering with training mode
-            if self.current_state_name!="RunningNoCard":
-                new_input_data["user_is_authorized"]=self.verifyPin(new_input_data["user_is_authorized"],new_input_data["pin"])
-                self.lastUser=new_input_data["card_id"]
-            
-            # Handle card reader mode if active
-            if self.in_card_reader_mode and new_input_data["user_is_authorized"]:
-                # Run card reader mode, exit if it returns False
-                self.in_card_reader_mode=self.handle_card_reader_mode(old_input_data['card_id'])
-                new_input_data = dict(old_input_data)
-                new_input_data["button_pressed"] = False
-                return new_input_data
-            else:
-                self.in_card_reader_mode=False
-                return new_input_data
-                    
             # Log the card reading with the card type and ID
             print(f"Card of type: {new_input_data['card_type']} with ID: {new_input_data['card_id']} was read")
             
@@ -358,6 +372,18 @@ class PortalBoxApplication():
             elif new_input_data['card_type'] == CardType.SHUTDOWN_CARD:
                 card_type_str = "Shutdown"
             print(f"Card type: {card_type_str}")
+            
+            # Only verify PIN if not in grace period to avoid interfering with training mode
+            if self.current_state_name!="RunningNoCard":
+                self.lastUser=new_input_data["card_id"]
+                if self.pin_required(new_input_data["user_is_authorized"]):
+                    # Hold the card's inputs back until the PIN entry has a result
+                    self.pending_input = new_input_data
+                    self.pin_entry.start(card_id)
+                    return self.held_inputs(old_input_data)
+                new_input_data["user_is_authorized"] = False
+            
+            return self.finish_card_inputs(new_input_data, old_input_data)
 
         # If no card is present, just update the button
         elif(card_id <= 0):
@@ -367,7 +393,6 @@ class PortalBoxApplication():
                 "card_type": CardType.INVALID_CARD,
                 "user_authority_level": 0,
                 "button_pressed": self.box.has_button_been_pressed()[0],
-                "pin": -1,
                 "card_removal": card_removal
             }
         # Else just use the old data and update the button
@@ -402,9 +427,6 @@ class PortalBoxApplication():
         print("Tried to read card")
         print(card_id)
         
-        # Convert hex string to int if card was read
-        card_id = int(card_id, 16) if card_id != -1 else -1
-        
         # If a card is present, and old_input_data showed either no card present, or a different card present
         if(card_id > 0 and card_id != old_input_data["card_id"] and self.lastUser!=old_input_data["card_id"]):
             print(f"Card with ID: {card_id} read, Getting info from DB")
@@ -428,14 +450,16 @@ class PortalBoxApplication():
                     time.sleep(1)
                     if prev_display:
                         self.display.display_message(prev_display)
+            
+            # Keep only the PIN's hash
+            self.pins.remember(card_id, details)
                     
             new_input_data = {
                 "card_id": card_id,
                 "user_is_authorized": details["user_is_authorized"],              
                 "card_type": details["card_type"],
                 "user_authority_level": details["user_authority_level"],
-                "button_pressed": self.box.has_button_been_pressed(),
-                "pin": details['pin']
+                "button_pressed": self.box.has_button_been_pressed()
             }
                     
             # Log the card reading with the card type and ID
@@ -460,8 +484,7 @@ class PortalBoxApplication():
                 "user_is_authorized": False,
                 "card_type": CardType.INVALID_CARD,
                 "user_authority_level": 0,
-                "button_pressed": self.box.has_button_been_pressed(),
-                "pin": -1
+                "button_pressed": self.box.has_button_been_pressed()
             }
         # Else just use the old data and update the button
         # i.e., if there is a card, but it's the same as before
@@ -472,422 +495,96 @@ class PortalBoxApplication():
         print(f"New input data: {new_input_data}")
         return new_input_data
     
-    def loopRainbowCycle(self):
+    def held_inputs(self, old_input_data):
         """
-        Displays a rainbow cycle on the LCD until a card is detected
-        Fixed to handle type conversions properly
+        Inputs for the FSM while a sub-state (PIN entry, admin mode) holds the new ones back
+        
+        Returns:
+            Copy of the old inputs with no button press or card removal
         """
-        try:
-            # Initial card read
-            curr_card = self.box.read_RFID_card()
-            
-            # Loop until a card is detected
-            while curr_card == -1:  # No card detected
-                self.display.set_color("sleep_color")
-                # Get new card state
-                curr_card = self.box.read_RFID_card()
-                time.sleep(0.1)  # Small delay to avoid excessive CPU usage
-                
-            # When card is detected, convert to int if it's a hex string
-            if curr_card != -1:
-                try:
-                    # Only try to convert if it's a string (hex ID)
-                    if isinstance(curr_card, str):
-                        return int(curr_card, 16)
-                    return curr_card
-                except (ValueError, TypeError) as e:
-                    print(f"Error converting card ID: {e}")
-                    return -1
-            
-            return -1
-        except Exception as e:
-            print(f"Error in loopRainbowCycle: {e}")
-            return -1
-            
-    def verifyPin(self, isAuthorized, userPin):
+        new_input_data = dict(old_input_data)
+        new_input_data["button_pressed"] = False
+        new_input_data["card_removal"] = False
+        return new_input_data
+    
+    def continue_pin_entry(self, old_input_data):
+        """
+        Step the PIN entry, releasing the held card inputs once it has a result
+        
+        Returns:
+            The inputs for the FSM
+        """
+        result = self.pin_entry.step()
+        if result is None:
+            return self.held_inputs(old_input_data)
+        
+        new_input_data = self.pending_input
+        self.pending_input = None
+        new_input_data["user_is_authorized"] = result
+        return self.finish_card_inputs(new_input_data, old_input_data)
+    
+    def finish_card_inputs(self, new_input_data, old_input_data):
+        """
+        Last step for the inputs of a newly read card, once its PIN is settled
+        
+        Returns:
+            The inputs for the FSM
+        """
+        # Handle card reader mode if active
+        if self.in_card_reader_mode and new_input_data["user_is_authorized"]:
+            # The admin card is accepted, run card reader mode until * is pressed
+            self.admin.start_card_reader(old_input_data['card_id'])
+            return self.held_inputs(old_input_data)
+        else:
+            self.in_card_reader_mode=False
+            return new_input_data
+    
+    def pin_required(self, isAuthorized):
         """
-        Verify user's PIN for authorized access
+        Check whether a card has to be confirmed with a PIN
         
         Args:
             isAuthorized: Whether the user is initially authorized
-            userPin: The PIN associated with the user
             
         Returns:
-            bool: True if PIN is verified, False otherwise
+            bool: True if the PIN must be entered
         """
         # Important: If we're coming from AccessComplete, always require PIN verification
         # This prevents security issues when grace period expires
         force_verify = self.current_state_name in ["AccessComplete", "IdleUnknownCard"]
-        
-        # CRITICAL: If we're coming from AccessComplete or IdleUnknownCard, always verify PIN
-        # regardless of isAuthorized status (force verification)
-        if force_verify or isAuthorized == True:
-            # Show clear message when forced verification is happening
-            if force_verify:
-                print("FORCED PIN VERIFICATION due to state:", self.current_state_name)
-                
-            # Ensure userPin is converted to string for comparison
-            if userPin is None or userPin == -1:
-                print("No PIN available for this user, denying access")
-                self.display.display_two_line_message("Invalid PIN", "Access Denied", "unauth_color")
-                time.sleep(1.5)
-                return False
-                    
-            # Convert userPin to string if it's an integer
-            userPin = str(userPin) if isinstance(userPin, int) else userPin
-            
-            attempts = 3  # Start with 3 attempts
-            self.display.display_two_line_message("Please Enter Pin", "Attempts:" + str(attempts), "sleep_color")
-            
-            while attempts > 0:  # Run while attempts are greater than 0
-                currPin = ""
-                while len(currPin) < 4:  # Ensure the PIN is 4 digits long
-                    # Check for card removal during PIN entry
-                    card_id = self.box.read_RFID_card()
-                    if card_id == -1:  # Card was removed
-                        print("Card removed during PIN verification")
-                        self.display.display_message("Card Removed", "unauth_color")
-                        time.sleep(1)
-                        return False
-                    
-                    # Convert card_id from hex string to integer if it's valid
-                    try:
-                        card_id = int(card_id, 16) if card_id != -1 else -1
-                    except (ValueError, TypeError):
-                        # Handle case where card_id is already an integer or invalid
-                        if not isinstance(card_id, int):
-                            card_id = -1
-                    
-                    # Check if card is still present
-                    if card_id == -1:
-                        print("Card removed during PIN verification")
-                        self.display.display_message("Card Removed", "unauth_color")
-                        time.sleep(1)
-                        return False
-                    
-                    # Get the pressed button
-                    button_pressed = self.box.has_button_been_pressed()[1]
-                    
-                    # Check if a button was pressed and it contains a digit
-                    if button_pressed and len(button_pressed) > 0:
-                        # Ensure we have a valid integer in the button_pressed list
-                        try:
-                            if isinstance(button_pressed[0], int):
-                                digit = str(button_pressed[0])  # Convert the number to a string
-                                print(digit)
-                                currPin += digit  # Append the digit to the PIN
-                                
-                                # Display PIN with masking
-                                pinStar = "*" * len(currPin)  # Shows masked PIN
-                                
-                                self.display.display_two_line_message(
-                                    "Pin:" + pinStar, 
-                                    "Attempts:" + str(attempts), 
-                                    "sleep_color"
-                                )
-                        except (IndexError, TypeError) as e:
-                            print(f"Button press error: {e}")
-                    
-                    time.sleep(0.1)  # Small delay to avoid excessive CPU usage
-                
-                # Check if the entered PIN matches the user's PIN
-                print(f"Comparing PINs: entered={currPin}, user={userPin}")
-                if currPin == userPin:
-                    print("PIN verified successfully")
-                    self.display.display_message("PIN Correct", "auth_color")
-                    time.sleep(0.5)
-                    return True
-                elif len(currPin) == 4 and attempts > 1:
-                    self.display.display_message("Incorrect Pin", "unauth_color")
-                    time.sleep(0.5)
-                    self.display.display_two_line_message("Pin:", "Attempts:" + str(attempts-1), "sleep_color")
-                
-                # Decrement attempts after a failed attempt
-                attempts -= 1
-                
-                if attempts == 0:
-                    self.display.display_message("Incorrect Pin", "unauth_color")
-                    time.sleep(1)
-                    self.display.display_message("Please Retry!", "unauth_color")
-                    return False
-        
-        # If we get here, the user is not authorized or something went wrong
-        return False
-                
-    def handle_card_reader_mode(self, old_input):
-        """
-        Handles the card reader mode, showing card IDs when cards are detected
-        Fixed to properly handle type conversions and avoid crashes
+        if force_verify:
+            print("FORCED PIN VERIFICATION due to state:", self.current_state_name)
+        return force_verify or isAuthorized == True
+    
+    def report_boot_timelines(self, timelines):
         """
-        try:
-            time.sleep(1)
-            old_card_id = old_input
-            
-            while True:
-                # Check for exit command (* key)
-                if "*" in Keypad.scan_keypad() and not self.box.has_button_been_pressed()[0]:
-                    print("Exiting card reader mode")
-                    self.display.display_two_line_message("Exiting", "Card Reader Mode", "sleep_color")
-                    time.sleep(1)
-                    self.cert_mode_state = 'init'  # Reset state for next time
-                    self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
-                    
-                    # Don't call loopRainbowCycle on exit to avoid potential crashes
-                    # Just return False to exit the mode
-                    return False
-                
-                # Read card
-                card_id = self.box.read_RFID_card()
-                
-                # Handle animation and display
-                if card_id == -1 and old_card_id == -1:
-                    # No card detected, show animation
-                    self.display.animate_scanning("Card ID Reader")
-                elif card_id == old_card_id:
-                    # Same card still present, no update needed
-                    pass
-                else:
-                    # New card detected, display ID
-                    try:
-                        # Only convert to int if card_id is a string (hex ID)
-                        if card_id != -1 and isinstance(card_id, str):
-                            decimal_val = int(card_id, 16)
-                            self.display.display_two_line_message("Card ID:", f"{decimal_val}", "admin_mode")
-                    except (ValueError, TypeError) as e:
-                        print(f"Error converting card ID: {e}")
-                        # Show error but continue
-                        self.display.display_two_line_message("Card Error", "Try Again", "unauth_color")
-                        time.sleep(1)
-                
-                # Update old card ID for next iteration
-                old_card_id = card_id
-                
-                # Small delay to avoid excessive CPU usage
-                time.sleep(0.1)
+        Sends the stored boot timelines to the backend in one request
         
-        except Exception as e:
-            print(f"Error in card reader mode: {e}")
-            self.display.display_two_line_message("Error", "Exiting Mode", "unauth_color")
-            time.sleep(1)
-            return False
+        Args:
+            timelines: List of timelines from the BootSequence ring
             
-        # Should never reach here due to while True loop, but added for completeness
-        return True
-    
-    def handle_certification_mode(self):
-        """
-        Admin mode for granting machine access authorization to new users
-        This mode requires an admin/trainer card followed by the user card to be authorized
-        Returns True if still in this mode, False if exiting
+        Returns:
+            bool: True if the backend took them
         """
-        try:
-            time.sleep(1)
-            # Step 1: Initial state - waiting for admin card
-            if not hasattr(self, 'cert_mode_state') or self.cert_mode_state == 'init':
-                self.cert_mode_state = 'waiting_admin'
-                self.admin_card_id = None
-                self.user_card_id = None
-                self.display.display_two_line_message("Admin Mode", "Scan Admin Card", "admin_mode")
-            
-            # Check for exit button press (# key)
-            if "#" in Keypad.scan_keypad():
-                print("Exiting admin certification mode")
-                self.display.display_two_line_message("Exiting", "Admin Mode", "sleep_color")
-                time.sleep(1)
-                self.cert_mode_state = 'init'  # Reset state for next time
-                self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
-                self.loopRainbowCycle()
-                return False
-            
-            # Step 2: Waiting for admin card
-            if self.cert_mode_state == 'waiting_admin':
-                # Show scanning animation
-                self.display.animate_scanning("Scan Admin Card")
-                
-                # Try reading a card
-                card_id = self.box.read_RFID_card()
-                
-                # If card read successful
-                if card_id != -1:
-                    try:
-                        decimal_id = int(card_id, 16)
-                        
-                        # Verify this is an admin/trainer card
-                        details = self.db.get_card_details(decimal_id, self.equipment_type_id)
-                        details["user_is_authorized"]=self.verifyPin(details["user_is_authorized"],details["pin"])
-                        
-                        if details["user_authority_level"] >= 3 and details["user_is_authorized"]:  # Admin or trainer level
-                            # Admin card accepted
-                            self.admin_card_id = decimal_id
-                            self.cert_mode_state = 'waiting_user'
-                            self.display.display_two_line_message("Admin Verified", "Remove Card", "auth_color")
-                            self.box.beep_once('success')
-                            time.sleep(1)
-                            
-                            # Wait for admin to remove card
-                            self.display.display_two_line_message("Admin Mode", "Remove Card", "process_color")
-                            
-                            # Wait for card removal
-                            waiting_removal = True
-                            start_time = time.time()
-                            while waiting_removal and (time.time() - start_time < 10):  # 10 second timeout
-                                if self.box.read_RFID_card() == -1:  # No card detected
-                                    waiting_removal = False
-                                time.sleep(0.2)
-                            
-                            self.display.display_two_line_message("Admin Mode", "Scan User Card", "process_color")
-                        else:
-                            # Not an admin card
-                            self.display.display_two_line_message("Not Admin Card", "Need Admin Card", "unauth_color")
-                            self.box.beep_once('error')
-                            time.sleep(1)
-                            self.display.display_two_line_message("Admin Mode", "Scan Admin Card", "admin_mode")
-                    except Exception as e:
-                        print(f"Error processing admin card: {e}")
-                        self.display.display_two_line_message("Card Error", "Try Again", "unauth_color")
-                        self.box.beep_once('error')
-                        time.sleep(1)
-            
-            # Step 3: Waiting for user card
-            elif self.cert_mode_state == 'waiting_user':
-                # Show scanning animation
-                self.display.animate_scanning("Scan User Card")
-                
-                # Try reading a card
-                card_id = self.box.read_RFID_card()
-                
-                # If card read successful
-                if card_id != -1:
-                    try:
-                        decimal_id = int(card_id, 16)
-                        
-                        # Verify this is a user card and not already authorized
-                        details = self.db.get_card_details(decimal_id, self.equipment_type_id)
-                        
-                        if details["card_type"] == CardType.USER_CARD:
-                            if details["user_is_authorized"]:
-                                # Already authorized
-                                self.display.display_two_line_message("Already Auth", "No Change Needed", "process_color")
-                                self.box.beep_once('warning')
-                                time.sleep(1)
-                                self.cert_mode_state = 'init'
-                                # self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
-                                self.display.display_message("Press # to Exit", "process_color")
-                                while "#" not in Keypad.scan_keypad():
-                                    time.sleep(0.5)
-                                print("Exiting admin certification mode")
-                                self.display.display_two_line_message("Exiting", "Admin Mode", "sleep_color")
-                                time.sleep(1)
-                                self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
-                                self.cert_mode_state = 'init'  # Reset state for next time
-                                self.loopRainbowCycle()
-                                return False
-                            else:
-                                # User needs authorization - proceed to update
-                                self.user_card_id = decimal_id
-                                self.cert_mode_state = 'updating'
-                                self.display.display_two_line_message("User Card OK", "Authorizing...", "sleep_color")
-                        else:
-                            # Not a user card
-                            self.display.display_two_line_message("Not User Card", "Need User Card", "unauth_color")
-                            self.box.beep_once('error')
-                            time.sleep(1)
-                            self.display.display_two_line_message("Admin Mode", "Scan User Card", "process_color")
-                    except Exception as e:
-                        print(f"Error processing user card: {e}")
-                        self.display.display_two_line_message("Card Error", "Try Again", "unauth_color")
-                        self.box.beep_once('error')
-                        time.sleep(1)
-            
-            # Step 4: Updating authorization
-            elif self.cert_mode_state == 'updating':
-                try:
-                    # Make API call to update user authorization
-                    success = self.update_user_authorization(self.user_card_id)
-                    
-                    if success:
-                        self.display.display_two_line_message("Authorization", "Successful!", "auth_color")
-                        self.box.beep_once('success')
-                        time.sleep(1.5)
-                        self.display.display_message("Press # to Exit", "process_color")
-                        while "#" not in Keypad.scan_keypad():
-                            time.sleep(0.5)
-                        print("Exiting admin certification mode")
-                        self.display.display_two_line_message("Exiting", "Admin Mode", "sleep_color")
-                        time.sleep(1)
-                        self.display.display_two_line_message("Welcome!", "Scan Card to Use", "sleep_color")
-                        self.cert_mode_state = 'init'
-                    else:
-                        self.display.display_two_line_message("Auth Failed", "DB Error", "unauth_color")
-                        self.box.beep_once('error')
-                    
-                    time.sleep(2)
-                    self.cert_mode_state = 'init'  # Reset for next time
-                    return False
-                except Exception as e:
-                    print(f"Error updating authorization: {e}")
-                    self.display.display_two_line_message("Update Error", "Try Again Later", "unauth_color")
-                    self.box.beep_once('error')
-                    time.sleep(2)
-                    self.cert_mode_state = 'init'  # Reset for next time
-                    return False
-            
-            # Continue in certification mode
-            return True
-        except Exception as e:
-            print(f"Error in certification mode: {e}")
-            # Exit certification mode on error
-            return False
-        
-    def update_user_authorization(self, user_card_id):
+        return self.db.log_boot_timelines(self.equipment_id, timelines)
+    
+    def update_user_authorizations(self, card_ids):
         """
-        Updates a user's authorization for the current equipment type
+        Authorizes users for the current equipment type in one bulk request
         
         Args:
-            user_card_id: The card ID of the user to authorize
+            card_ids: The card IDs of the users to authorize
             
         Returns:
-            bool: True if successful, False otherwise
+            dict: card ID to result ("success", "already_authorized",
+            "not_user_card" or "failed"), every card included
         """
+        print(f"Updating authorization for {len(card_ids)} user cards on equipment type {self.equipment_type_id}")
         try:
-            print(f"Updating authorization for user card {user_card_id} on equipment type {self.equipment_type_id}")
-            
-            # First, get the user ID associated with this card
-            user_info = self.db.get_user(user_card_id)
-            if not user_info or len(user_info) < 2 or not user_info[0]:
-                print("Failed to retrieve user info from card")
-                return False
-                
-            # Get user ID from card if possible
-            user_id = None
-            try:
-                # Fetch user details from the card - this is implementation-dependent
-                # This might require an additional API call to get the user ID
-                # For now, we'll simulate this by getting the user's info from the card
-                
-                # Try to get existing authorizations
-                current_details = self.db.get_card_details(user_card_id, self.equipment_type_id)
-                
-                # We need to add our current equipment type to the user's authorizations
-                # Make API call to update authorizations using our Database class method
-                response = self.db.add_user_authorization(user_card_id, self.equipment_type_id)
-                
-                # Check for success
-                if response is True or (isinstance(response, str) and "success" in response.lower()):
-                    print(f"Successfully authorized user for equipment type {self.equipment_type_id}")
-                    return True
-                else:
-                    print(f"Authorization failed with response: {response}")
-                    return False
-                    
-            except Exception as e:
-                print(f"Error updating authorization: {e}")
-                return False
-                
-            return False
+            return self.db.add_user_authorizations(card_ids, self.equipment_type_id)
         except Exception as e:
-            print(f"Exception in update_user_authorization: {e}")
-            return False
+            print(f"Exception in update_user_authorizations: {e}")
+            return {card_id: "failed" for card_id in card_ids}
 
     def update_display_for_state(self, state_name, card_id=-1):
         """Update the display based on current state and context"""
@@ -900,24 +597,10 @@ class PortalBoxApplication():
         self.last_displayed_state = state_name
         print(f"Updating display for state: {state_name}")
         
-        if state_name == "IdleNoCard":
-            self.display.display_idle_instructions()
-            
-        elif state_name == "RunningAuthUser":
+        # Screens that depend on more than the state name
+        if state_name == "RunningAuthUser" and card_id > 0:
             # Display personalized welcome if possible
-            if card_id > 0:
-                self.display.display_welcome(card_id)
-            else:
-                self.display.display_two_line_message("Authorized", "Machine On", "auth_color")
-                
-        elif state_name == "RunningTrainingCard":
-            self.display.display_two_line_message("Training Mode", "Machine On", self.settings["display"]["training_color"])
-            
-        elif state_name == "RunningProxyCard":
-            self.display.display_two_line_message("Proxy Access", "Machine On", "proxy_color")
-            
-        elif state_name == "IdleUnauthCard":
-            self.display.display_unauthorized()
+            self.display.display_welcome(card_id)
             
         elif state_name == "RunningNoCard":
             # Start grace timer if not already started
@@ -925,33 +608,27 @@ class PortalBoxApplication():
                 self.display.start_grace_timer(self.settings["user_exp"]["grace_period"])
                 self.grace_timer_started = True
             
-        elif state_name == "Setup":
-            self.display.display_message("Setting Up...", "process_color")
-            
-        elif state_name == "Shutdown":
-            self.display.display_message("Shutting Down...", "unauth_color")
+        elif state_name == "RunningTimeout":
+            # Same countdown for the time left to remove the card
+            if not hasattr(self, 'grace_timer_started') or not self.grace_timer_started:
+                self.display.start_grace_timer(self.settings["user_exp"]["grace_period"], "Time Expired!", "orange")
+                self.grace_timer_started = True
             
-        # Other states use default display from their on_enter methods
+        # Everything else is a precomputed screen; states without one keep
+        # the display from their on_enter methods
         else:
-            # Center the state name on the display
-            if len(state_name) > 16:
-                # Truncate if too long
-                display_name = state_name[:16]
-            else:
-                # Center the text
-                padding = (16 - len(state_name)) // 2
-                display_name = " " * padding + state_name
-                
-            # self.display.display_message(display_name)
+            self.display.show_screen(state_name)
 
     def update_grace_display_if_needed(self):
-        """Update grace period countdown if in RunningNoCard state"""
-        if self.current_state_name == "RunningNoCard" and hasattr(self, 'grace_timer_started') and self.grace_timer_started:
+        """Update grace period countdown if in RunningNoCard or RunningTimeout state"""
+        if self.current_state_name in ("RunningNoCard", "RunningTimeout") and hasattr(self, 'grace_timer_started') and self.grace_timer_started:
             remaining = self.display.update_grace_display()
             if remaining <= 0:
                 # Grace period ended, reset flag
                 self.grace_timer_started = False
-                return True  # Indicate grace period has ended
+                # Only the no card grace period ends through the display timer,
+                # RunningTimeout leaves on its own grace check
+                return self.current_state_name == "RunningNoCard"
         return False  # Grace period still running or not in grace period
 
     def get_user_auths(self, card_id):
@@ -1009,7 +686,8 @@ def load_config(config_file_path=DEFAULT_CONFIG_FILE_PATH):
             "timeout_color":       [0, 0, 255],       
             "unauth_card_grace_color": [128, 0, 255],
             "flash_rate": 3,
-            "led_type": "DOTSTAR"
+            "led_type": "DOTSTAR",
+            "countdown": "leds"
         },
         "user_exp": {
             "grace_period": 10
@@ -1109,10 +787,20 @@ def main():
     try:
         while service.running:
             print("\n---- New loop iteration ----")
+            # Stores and reports the boot timeline once the background boot calls are done
+            service.boot.service(service.report_boot_timelines)
             current_state_name = fsm_state.__class__.__name__
             print(f"CURRENT FSM STATE: {current_state_name}")
             service.current_state_name = current_state_name
-            
+
+            # Let the RFID poll rate follow the state (admin modes poll like a running session)
+            if service.in_card_reader_mode or service.in_certification_mode:
+                service.box.set_rfid_poll_state("AdminMode")
+            elif service.pin_entry.active:
+                service.box.set_rfid_poll_state("PinEntry")
+            else:
+                service.box.set_rfid_poll_state(current_state_name)
+
             # Update display for current state if changed
             if fsm_state.__class__ != last_state_class:
                 service.update_display_for_state(current_state_name, input_data["card_id"])
@@ -1168,6 +856,12 @@ def main():
                 service.box.update()
                 time.sleep(0.1)
                 continue
+            
+            # The FSM waits for the PIN entry's result, the rest keeps running
+            if service.pin_entry.active:
+                service.box.update()
+                time.sleep(0.05)
+                continue
 
             # ADD THIS CODE HERE: Check if grace period has ended naturally
             # Update grace period display and check if it has ended
@@ -0,0 +1,152 @@
+# Runs certification mode through an admin PIN entry on the board, with the
+# Firmware modules copied over and scripted stand-ins for the box, display
+# and database, so no card, keypad or backend is needed:
+#
+#     import AdminPinTest
+#
+# Drives Service.get_inputs() the way the main loop does: * / # and digits
+# arrive through the keypad queue, cards through read_RFID_card().
+from Service import PortalBoxApplication, input_data
+from PinEntry import PinEntry
+from PinVerifier import PinVerifier
+from AdminModes import AdminModes
+from Database import CardType
+import time
+
+ADMIN_CARD = 1001
+TRAINEE_CARD = 2002
+ADMIN_PIN = "1234"
+
+# Seconds a step may take before the test fails
+STEP_TIMEOUT = 15
+
+class FakeBox:
+    """Keypad queue and card presence set by the script"""
+    def __init__(self):
+        self.card = -1
+        self.keys = []
+        self.enroll_reader = 0
+
+    def get_command_key(self):
+        if self.keys and self.keys[0] in ('*', '#'):
+            return self.keys.pop(0)
+        return None
+
+    def get_key_press(self):
+        if self.keys and self.keys[0] not in ('*', '#'):
+            return self.keys.pop(0)
+        return None
+
+    def clear_key_presses(self):
+        pass
+
+    def read_RFID_card(self, reader=0):
+        return self.card
+
+    def has_button_been_pressed(self):
+        return (False, 0)
+
+    def beep_once(self, pattern='success'):
+        pass
+
+    def update(self):
+        pass
+
+class FakeDisplay:
+    """Remembers the last message"""
+    def __init__(self):
+        self.text = ""
+
+    def display_two_line_message(self, line1, line2, color=None):
+        self.text = f"{line1}|{line2}"
+        print(f"LCD: {self.text}")
+
+    def display_message(self, message, color=None):
+        self.text = message
+        print(f"LCD: {self.text}")
+
+    def animate_scanning(self, message):
+        pass
+
+    def show_screen(self, state_name):
+        self.text = state_name
+
+class FakeDatabase:
+    """Card details with a plaintext PIN, as the backend delivers them today"""
+    def __init__(self):
+        self.authorized = []
+
+    def get_card_details(self, card_id, equipment_type_id):
+        admin = card_id == ADMIN_CARD
+        return {
+            "user_is_authorized": True,
+            "card_type": CardType.USER_CARD,
+            "user_authority_level": 3 if admin else 1,
+            "pin": ADMIN_PIN if admin else -1,
+            "pin_hash": None,
+        }
+
+    def add_user_authorizations(self, card_ids, equipment_type_id):
+        self.authorized.extend(card_ids)
+        return {card_id: "success" for card_id in card_ids}
+
+def make_service():
+    """A PortalBoxApplication wired to the stand-ins, without its hardware setup"""
+    service = PortalBoxApplication.__new__(PortalBoxApplication)
+    service.settings = {}
+    service.current_state_name = "IdleNoCard"
+    service.last_displayed_state = ""
+    service.lastUser = 0
+    service.in_card_reader_mode = False
+    service.in_certification_mode = False
+    service.equipment_type_id = 1
+    service.box = FakeBox()
+    service.display = FakeDisplay()
+    service.db = FakeDatabase()
+    service.pins = PinVerifier(path="admin_pin_test.json", iterations=10)
+    service.pin_entry = PinEntry(service.box, service.display, service.pins)
+    service.pending_input = None
+    service.admin = AdminModes(service)
+    return service
+
+def run_until(service, inputs, check, what):
+    """Run main loop iterations until check() holds, returns the inputs"""
+    deadline = time.ticks_add(time.ticks_ms(), STEP_TIMEOUT * 1000)
+    while not check():
+        if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+            raise AssertionError(f"Timed out waiting for {what}, display: {service.display.text}")
+        inputs = service.get_inputs(inputs)
+        time.sleep_ms(20)
+    print(f"OK: {what}")
+    return inputs
+
+def main():
+    service = make_service()
+    box = service.box
+    display = service.display
+    inputs = dict(input_data)
+
+    box.keys.append('#')
+    inputs = run_until(service, inputs, lambda: service.admin.active, "certification mode started")
+
+    box.card = ADMIN_CARD
+    inputs = run_until(service, inputs, lambda: display.text.startswith("Please Enter Pin"), "admin PIN prompt")
+    box.keys.extend(list(ADMIN_PIN))
+    inputs = run_until(service, inputs, lambda: display.text.startswith("Admin Verified"), "admin PIN accepted")
+    assert service.pending_input is None, "the admin PIN went to the card inputs"
+
+    box.card = -1
+    inputs = run_until(service, inputs, lambda: display.text.startswith("Scan Trainee"), "trainee prompt")
+    box.card = TRAINEE_CARD
+    inputs = run_until(service, inputs, lambda: display.text.startswith("Queued: 1"), "trainee queued")
+    box.card = -1
+    box.keys.append('#')
+    inputs = run_until(service, inputs, lambda: display.text.startswith("Enrolled"), "batch enrolled")
+    assert service.db.authorized == [TRAINEE_CARD], f"authorized {service.db.authorized}"
+
+    box.keys.append('#')
+    run_until(service, inputs, lambda: not service.admin.active, "certification mode ended")
+    assert not service.pin_entry.active
+    print("Admin PIN test passed")
+
+main()
@@ -0,0 +1,71 @@
+# Stand-in for the backend's authorization endpoints, runs on a PC with CPython
+#
+# Point the box's "website" setting at this machine to try batch enrollment
+# before the real backend has the bulk endpoint:
+#
+#     python EnrollmentServerStub.py [port]
+#
+# Answers mode=add_authorizations (bulk, one result per card) and
+# mode=add_authorization (single card) for any /api/... path; every other
+# mode gets a 404, so the box falls back the same way as against an old backend.
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+import json
+import sys
+
+# Cards that are not user cards (proxy, training, shutdown)
+NOT_USER_CARDS = {1000, 1001}
+
+# (card id, equipment type id) pairs already authorized
+authorizations = set()
+
+def authorize(card_id, equipment_type_id):
+    """Authorize one card, returns the per-card result the box expects"""
+    if card_id in NOT_USER_CARDS:
+        return "not_user_card"
+    if (card_id, equipment_type_id) in authorizations:
+        return "already_authorized"
+    authorizations.add((card_id, equipment_type_id))
+    return "success"
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        query = parse_qs(urlparse(self.path).query)
+        mode = query.get("mode", [""])[0]
+        try:
+            equipment_type_id = int(query.get("equipment_type_id", ["0"])[0])
+            if mode == "add_authorizations":
+                card_ids = [int(x) for x in query.get("card_ids", [""])[0].split(",") if x]
+                body = [{"card_id": card_id, "result": authorize(card_id, equipment_type_id)}
+                        for card_id in card_ids]
+                self.reply(200, json.dumps(body))
+            elif mode == "add_authorization":
+                result = authorize(int(query["card_id"][0]), equipment_type_id)
+                self.reply(200, "success" if result == "success" else "failed")
+            else:
+                self.reply(404, "unknown mode")
+        except (KeyError, ValueError) as e:
+            self.reply(400, f"bad request: {e}")
+        print(f"Authorizations: {sorted(authorizations)}")
+
+    def reply(self, status, body):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if body.startswith("[") else "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    print(f"Enrollment stand-in listening on port {port}")
+    HTTPServer(("", port), Handler).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from Keypad import Keypad, DEFAULT_ROW_PINS, DEFAULT_COL_PINS, SCAN_MODES
+import time
+
+# Scans timed per mode
+ITERATIONS = 2000
+
+def benchmark(keypad, mode):
+    """Time ITERATIONS scans in one mode, returns (microseconds per scan, last mask) or None"""
+    if keypad.set_scan_mode(mode, DEFAULT_ROW_PINS + DEFAULT_COL_PINS) != mode:
+        print(f"{mode}: not available on this board")
+        return None
+    mask = keypad.scan()  # Warm up (imports, caches)
+    start = time.ticks_us()
+    for _ in range(ITERATIONS):
+        mask = keypad.scan()
+    elapsed = time.ticks_diff(time.ticks_us(), start)
+    return elapsed / ITERATIONS, mask
+
+def main():
+    print("Keypad Scan Benchmark")
+    print(f"Rows: {DEFAULT_ROW_PINS}, columns: {DEFAULT_COL_PINS}")
+    keypad = Keypad(DEFAULT_ROW_PINS, DEFAULT_COL_PINS, scan_mode="pin")
+
+    print("\nHold a key to check that all modes agree, or leave the keypad alone\n")
+    results = {}
+    for mode in SCAN_MODES:
+        result = benchmark(keypad, mode)
+        if result is None:
+            continue
+        results[mode] = result
+        us, mask = result
+        print(f"{mode:>6}: {us:8.1f} us per scan, {1000000 / us:9.0f} scans/s, mask {mask:#06x}")
+
+    if "pin" in results:
+        base = results["pin"][0]
+        for mode, (us, mask) in results.items():
+            if mode != "pin":
+                print(f"{mode} is {base / us:.1f}x faster than pin")
+        masks = set(mask for us, mask in results.values())
+        if len(masks) > 1:
+            print("WARNING: scan modes disagree, a key moved or the register scan is wrong")
+
+    # Cost of sampling at the keypad's default 5 ms rate while a key is down
+    for mode, (us, mask) in results.items():
+        print(f"{mode}: {us / 5000 * 100:.2f}% CPU at 200 samples/s")
+
+if __name__ == "__main__":
+    main()